@@ -3,9 +3,12 @@
 from __future__ import annotations
 
 import _io  # type: ignore
+import hashlib
 import json
 import os
 import re
+import threading
+import time
 from contextlib import suppress
 from datetime import date
 from typing import TYPE_CHECKING, Any, Literal
@@ -14,7 +17,10 @@ import frappe
 import frappe.utils
 import requests
 from frappe.utils.password import get_decrypted_password
+from requests.adapters import HTTPAdapter
 from requests.exceptions import HTTPError
+from urllib3.connection import HTTPSConnection
+from urllib3.connectionpool import HTTPSConnectionPool
 
 from press.utils import (
 	get_mariadb_root_password,
@@ -39,6 +45,105 @@ if TYPE_CHECKING:
 
 APPS_LIST_REGEX = re.compile(r"\[.*\]")
 
+AGENT_SESSION_POOL_MAXSIZE = 4
+AGENT_CREDENTIALS_TTL = 300  # seconds
+AGENT_CREDENTIALS_VERSION_KEY = "agent_credentials_version"
+IN_FLIGHT_AGENT_JOB_STATUSES = ("Undelivered", "Pending", "Running")
+
+# Process wide, shared by every Agent instance in this worker
+_agent_sessions: dict[tuple[str, int], requests.Session] = {}
+_agent_credentials: dict[tuple[str, str, str], AgentCredentials] = {}
+_agent_sessions_lock = threading.Lock()
+_agent_session_stats = {"hits": 0, "misses": 0, "connections": 0, "handshake_time": 0.0}
+
+
+class AgentCredentials:
+	def __init__(self, password: str, verify: str | bool, version: str | None):
+		self.password = password
+		self.verify = verify
+		self.version = version
+		self.fetched_at = time.monotonic()
+
+	def is_stale(self, version: str | None) -> bool:
+		return version != self.version or (time.monotonic() - self.fetched_at) > AGENT_CREDENTIALS_TTL
+
+
+class TimedHTTPSConnection(HTTPSConnection):
+	"""Records time spent in TCP connect + TLS handshake for new connections"""
+
+	def connect(self):
+		start = time.monotonic()
+		super().connect()
+		_agent_session_stats["connections"] += 1
+		_agent_session_stats["handshake_time"] += time.monotonic() - start
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+	ConnectionCls = TimedHTTPSConnection
+
+
+class AgentHTTPAdapter(HTTPAdapter):
+	def init_poolmanager(self, *args, **kwargs):
+		super().init_poolmanager(*args, **kwargs)
+		self.poolmanager.pool_classes_by_scheme = {
+			**self.poolmanager.pool_classes_by_scheme,
+			"https": TimedHTTPSConnectionPool,
+		}
+
+
+def get_agent_session(server: str, port: int) -> requests.Session:
+	"""Keep-alive session per (server, port) so that TLS handshakes are reused across requests"""
+	key = (server, port)
+	if session := _agent_sessions.get(key):
+		_agent_session_stats["hits"] += 1
+		return session
+
+	with _agent_sessions_lock:
+		if not (session := _agent_sessions.get(key)):
+			session = requests.Session()
+			adapter = AgentHTTPAdapter(pool_connections=1, pool_maxsize=AGENT_SESSION_POOL_MAXSIZE)
+			session.mount("https://", adapter)
+			_agent_sessions[key] = session
+			_agent_session_stats["misses"] += 1
+	return session
+
+
+def get_agent_session_stats() -> dict:
+	return {**_agent_session_stats, "sessions": len(_agent_sessions)}
+
+
+def close_agent_sessions():
+	with _agent_sessions_lock:
+		for session in _agent_sessions.values():
+			session.close()
+		_agent_sessions.clear()
+		_agent_credentials.clear()
+		# Stats describe the sessions opened since, start them over too
+		_agent_session_stats.update(hits=0, misses=0, connections=0, handshake_time=0.0)
+
+
+def invalidate_agent_credentials(doc, method=None):
+	"""Called from doc_events of server doctypes, bumps the version so every worker refetches"""
+	frappe.cache.hset(AGENT_CREDENTIALS_VERSION_KEY, doc.name, frappe.generate_hash(length=8))
+	_agent_credentials.pop((frappe.local.site, doc.doctype, doc.name), None)
+
+
+def get_dedup_key(
+	server_type,
+	server,
+	job_type,
+	method,
+	path,
+	bench=None,
+	site=None,
+	code_server=None,
+	upstream=None,
+	host=None,
+) -> str:
+	"""Identifies agent jobs doing the same thing, in flight jobs with the same key are deduplicated"""
+	fields = (server_type, server, job_type, method, path, bench, site, code_server, upstream, host)
+	return hashlib.sha256(json.dumps([field or None for field in fields]).encode()).hexdigest()
+
 
 class Agent:
 	if TYPE_CHECKING:
@@ -48,9 +153,11 @@ class Agent:
 
 		response: Response | None
 
-	def __init__(self, server, server_type="Server"):
+	def __init__(self, server, server_type="Server", server_state=None):
 		self.server_type = server_type
 		self.server = server
+		# Snapshot from agent_job.server_state, used instead of querying halt flag and failures
+		self.server_state = server_state
 		self.port = 443 if self.server not in servers_using_alternative_port_for_communication() else 8443
 
 	def new_bench(self, bench: "Bench"):
@@ -902,16 +1009,35 @@ class Agent:
 	def delete(self, path, data=None, raises=True):
 		return self.request("DELETE", path, data, raises=raises)
 
-	def _make_req(self, method, path, data, files, agent_job_id):
+	@property
+	def session(self) -> requests.Session:
+		return get_agent_session(self.server, self.port)
+
+	def get_credentials(self) -> AgentCredentials:
+		"""Decrypted agent password and TLS verification, cached per process until the server changes"""
+		key = (frappe.local.site, self.server_type, self.server)
+		version = frappe.cache.hget(AGENT_CREDENTIALS_VERSION_KEY, self.server)
+		credentials = _agent_credentials.get(key)
+		if credentials and not credentials.is_stale(version):
+			return credentials
+
 		password = get_decrypted_password(self.server_type, self.server, "agent_password")
-		headers = {"Authorization": f"bearer {password}", "X-Agent-Job-Id": agent_job_id}
-		url = f"https://{self.server}:{self.port}/agent/{path}"
+		credentials = AgentCredentials(password, self._get_verify(), version)
+		_agent_credentials[key] = credentials
+		return credentials
+
+	def _get_verify(self) -> str | bool:
 		intermediate_ca = frappe.db.get_value("Press Settings", "Press Settings", "backbone_intermediate_ca")
 		if frappe.conf.developer_mode and intermediate_ca:
 			root_ca = frappe.db.get_value("Certificate Authority", intermediate_ca, "parent_authority")
-			verify = frappe.get_doc("Certificate Authority", root_ca).certificate_file
-		else:
-			verify = True
+			return frappe.get_doc("Certificate Authority", root_ca).certificate_file
+		return True
+
+	def _make_req(self, method, path, data, files, agent_job_id):
+		credentials = self.get_credentials()
+		headers = {"Authorization": f"bearer {credentials.password}", "X-Agent-Job-Id": agent_job_id}
+		url = f"https://{self.server}:{self.port}/agent/{path}"
+		verify = credentials.verify
 		if files:
 			file_objects = {
 				key: value
@@ -920,8 +1046,8 @@ class Agent:
 				for key, value in files.items()
 			}
 			file_objects["json"] = json.dumps(data).encode()
-			return requests.request(method, url, headers=headers, files=file_objects, verify=verify)
-		return requests.request(method, url, headers=headers, json=data, verify=verify, timeout=(10, 30))
+			return self.session.request(method, url, headers=headers, files=file_objects, verify=verify)
+		return self.session.request(method, url, headers=headers, json=data, verify=verify, timeout=(10, 30))
 
 	def request(self, method, path, data=None, files=None, agent_job=None, raises=True):
 		self.raise_if_past_requests_have_failed()
@@ -960,11 +1086,17 @@ class Agent:
 			)
 
 	def raise_if_past_requests_have_failed(self):
-		failures = frappe.db.get_value("Agent Request Failure", {"server": self.server}, "failure_count")
+		if self.server_state is not None:
+			failures = self.server_state.failure_count
+		else:
+			failures = frappe.db.get_value("Agent Request Failure", {"server": self.server}, "failure_count")
 		if failures:
 			raise AgentRequestSkippedException(f"Previous {failures} requests have failed. Try again later.")
 
 	def log_request_failure(self, exc):
+		if self.server_state is not None:
+			self.server_state.failure_count += 1
+
 		filters = {
 			"server": self.server,
 		}
@@ -995,16 +1127,18 @@ class Agent:
 
 	def raw_request(self, method, path, data=None, raises=True, timeout=None):
 		url = f"https://{self.server}:{self.port}/agent/{path}"
-		password = get_decrypted_password(self.server_type, self.server, "agent_password")
-		headers = {"Authorization": f"bearer {password}"}
+		headers = {"Authorization": f"bearer {self.get_credentials().password}"}
 		timeout = timeout or (10, 30)
-		response = requests.request(method, url, headers=headers, json=data, timeout=timeout)
+		response = self.session.request(method, url, headers=headers, json=data, timeout=timeout)
 		json_response = response.json()
 		if raises:
 			response.raise_for_status()
 		return json_response
 
 	def should_skip_requests(self):
+		if self.server_state is not None:
+			return bool(self.server_state.halt_agent_jobs or self.server_state.failure_count)
+
 		if self.server_type in ("Server", "Database Server", "Proxy Server") and frappe.db.get_value(
 			self.server_type, self.server, "halt_agent_jobs"
 		):
@@ -1103,22 +1237,34 @@ Response: {reason or getattr(result, "text", "Unknown")}
 		method="POST",
 	):
 		"""Deduplicate jobs in execution state"""
+		if isinstance(site, list):
+			# Jobs spanning several sites have no single key to look up
+			return self._get_similar_in_execution_job(
+				job_type, path, bench, site, code_server, upstream, host, method
+			)
 
+		dedup_key = get_dedup_key(
+			self.server_type, self.server, job_type, method, path, bench, site, code_server, upstream, host
+		)
+		job = frappe.db.get_value(
+			"Agent Job", {"dedup_key": dedup_key, "status": ("in", IN_FLIGHT_AGENT_JOB_STATUSES)}, "name"
+		)
+		return frappe.get_doc("Agent Job", job) if job else False
+
+	def _get_similar_in_execution_job(self, job_type, path, bench, site, code_server, upstream, host, method):
 		filters = {
 			"server_type": self.server_type,
 			"server": self.server,
 			"job_type": job_type,
-			"status": ("not in", ("Success", "Failure", "Delivery Failure")),
+			"status": ("in", IN_FLIGHT_AGENT_JOB_STATUSES),
 			"request_method": method,
 			"request_path": path,
+			"site": ("in", site),
 		}
 
 		if bench:
 			filters["bench"] = bench
 
-		if site:
-			filters["site"] = site if not isinstance(site, list) else ("IN", site)
-
 		if code_server:
 			filters["code_server"] = code_server
 
@@ -1128,8 +1274,7 @@ Response: {reason or getattr(result, "text", "Unknown")}
 		if host:
 			filters["host"] = host
 
-		job = frappe.db.get_value("Agent Job", filters, "name", debug=1)
-
+		job = frappe.db.get_value("Agent Job", filters, "name")
 		return frappe.get_doc("Agent Job", job) if job else False
 
 	def update_monitor_rules(self, rules, routes):
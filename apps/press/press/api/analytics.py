@@ -6,6 +6,7 @@ from __future__ import annotations
 from contextlib import suppress
 from datetime import datetime, timedelta
 from enum import Enum
+from time import monotonic
 from typing import TYPE_CHECKING, ClassVar, Final, TypedDict
 
 import frappe
@@ -13,7 +14,7 @@ import frappe.utils
 import requests
 import sqlparse
 from elasticsearch import Elasticsearch
-from elasticsearch_dsl import A, Search
+from elasticsearch_dsl import A, MultiSearch, Search
 from frappe import auth
 from frappe.utils import (
 	convert_utc_to_timezone,
@@ -36,7 +37,7 @@ from press.press.report.mariadb_slow_queries.mariadb_slow_queries import execute
 if TYPE_CHECKING:
 	from collections.abc import Callable
 
-	from elasticsearch_dsl.response import AggResponse
+	from elasticsearch_dsl.response import AggResponse, Response
 	from elasticsearch_dsl.response.aggs import FieldBucket, FieldBucketData
 
 	from press.press.doctype.press_settings.press_settings import PressSettings
@@ -88,6 +89,34 @@ TIMESPAN_TIMEGRAIN_MAP: Final[dict[str, tuple[int, int]]] = {
 
 MAX_NO_OF_PATHS: Final[int] = 10
 MAX_MAX_NO_OF_PATHS: Final[int] = 50
+LOG_SERVER_CLIENT_TTL: Final[int] = 5 * 60
+CPU_USAGE_PAGE_SIZE: Final[int] = 1000
+SITE_LOAD_PAGE_SIZE: Final[int] = 1000
+
+_log_server_clients: dict[str, tuple[float, Elasticsearch]] = {}
+
+
+def get_log_server_client(log_server: str) -> Elasticsearch:
+	"""
+	Returns an Elasticsearch client for the log server, shared by all charts in this process.
+
+	Reusing the client keeps its connection pool alive and avoids decrypting the kibana
+	password for every query. Clients are recreated every LOG_SERVER_CLIENT_TTL seconds
+	to pick up password changes.
+	"""
+	expires_at, client = _log_server_clients.get(log_server, (0, None))
+	if client is not None and expires_at > monotonic():
+		return client
+
+	if client is not None:
+		client.close()
+
+	password = str(get_decrypted_password("Log Server", log_server, "kibana_password"))
+	client = Elasticsearch(
+		f"https://{log_server}/elasticsearch", basic_auth=("frappe", password), request_timeout=120
+	)
+	_log_server_clients[log_server] = (monotonic() + LOG_SERVER_CLIENT_TTL, client)
+	return client
 
 
 class StackedGroupByChart:
@@ -111,9 +140,6 @@ class StackedGroupByChart:
 		if not self.log_server:
 			return
 
-		self.url = f"https://{self.log_server}/elasticsearch"
-		self.password = str(get_decrypted_password("Log Server", self.log_server, "kibana_password"))
-
 		self.name = name
 		self.agg_type = agg_type
 		self.resource_type = resource_type
@@ -121,12 +147,14 @@ class StackedGroupByChart:
 		self.timespan = timespan
 		self.timegrain = timegrain
 		self.max_no_of_paths = min(max_no_of_paths, MAX_MAX_NO_OF_PATHS)
+		self.datasets: list[Dataset] | None = None
+		self.result: dict | None = None
 
 		self.setup_search_filters()
 		self.setup_search_aggs()
 
 	def setup_search_filters(self):
-		es = Elasticsearch(self.url, basic_auth=("frappe", self.password), request_timeout=120)
+		es = get_log_server_client(self.log_server)
 		self.start, self.end = get_rounded_boundaries(
 			self.timespan, self.timegrain, self.timezone
 		)  # we pass timezone to ES query in get_histogram_chart
@@ -202,10 +230,11 @@ class StackedGroupByChart:
 	def exclude_top_k_data(self, datasets: list[Dataset]):
 		raise NotImplementedError
 
-	def get_other_bucket(self, datasets: list[Dataset], labels):
+	def setup_other_bucket_search(self, datasets: list[Dataset]):
 		# filters present in search already, clear out aggs and response
 		self.search.aggs._params = {}
-		del self.search._response
+		with suppress(AttributeError):
+			del self.search._response
 
 		self.exclude_top_k_data(datasets)
 		self.search.aggs.bucket("histogram_of_method", self.histogram_of_method())
@@ -217,8 +246,7 @@ class StackedGroupByChart:
 		elif AggType(self.agg_type) is AggType.AVERAGE_DURATION:
 			self.search.aggs["histogram_of_method"].bucket("avg_of_duration", self.avg_of_duration())
 
-		aggs = self.search.execute().aggregations
-
+	def get_other_bucket(self, aggs: AggResponse, labels):
 		aggs.key = "Other"  # Set custom key Other bucket
 		return self.get_histogram_chart(aggs, labels)
 
@@ -250,28 +278,46 @@ class StackedGroupByChart:
 			)
 		return path_data
 
-	def get_stacked_histogram_chart(self):
-		aggs: AggResponse = self.search.execute().aggregations
-
+	def get_labels(self) -> list[datetime]:
 		timegrain_delta = timedelta(seconds=self.timegrain)
-		labels = [
+		return [
 			self.start + i * timegrain_delta for i in range((self.end - self.start) // timegrain_delta + 1)
 		]
-		# method_path has buckets of timestamps with method(eg: avg) of that duration
-		datasets = []
-
-		path_bucket: PathBucket
-		for path_bucket in aggs.method_path.buckets:
-			datasets.append(self.get_histogram_chart(path_bucket, labels))
 
-		if len(datasets) >= self.max_no_of_paths:
-			datasets.append(self.get_other_bucket(datasets, labels))
+	def next_search(self) -> Search | None:
+		"""Returns the search to execute next, top paths first and then the Other bucket if needed"""
+		if self.result is not None:
+			return None
+		return self.search
+
+	def handle_response(self, response: Response):
+		aggs: AggResponse = response.aggregations
+		labels = self.get_labels()
+
+		if self.datasets is None:
+			# method_path has buckets of timestamps with method(eg: avg) of that duration
+			self.datasets = []
+			path_bucket: PathBucket
+			for path_bucket in aggs.method_path.buckets:
+				self.datasets.append(self.get_histogram_chart(path_bucket, labels))
+
+			if len(self.datasets) >= self.max_no_of_paths:
+				self.setup_other_bucket_search(self.datasets)
+				return
+		else:
+			self.datasets.append(self.get_other_bucket(aggs, labels))
 
+		datasets = self.datasets
 		if self.normalize_slow_logs:
 			datasets = normalize_datasets(datasets)
 
 		labels = [label.replace(tzinfo=None) for label in labels]
-		return {"datasets": datasets, "labels": labels, "allow_drill_down": self.allow_drill_down}
+		self.result = {"datasets": datasets, "labels": labels, "allow_drill_down": self.allow_drill_down}
+
+	def get_stacked_histogram_chart(self):
+		while (search := self.next_search()) is not None:
+			self.handle_response(search.execute())
+		return self.result
 
 	@property
 	def allow_drill_down(self):
@@ -629,89 +675,43 @@ def get(name, timezone, duration="7d"):
 	}
 
 
-def add_commonly_slow_path_to_reports(
-	reports: dict, path: str, name: str, timezone, timespan, timegrain, max_no_of_paths
-):
-	for slow_path in COMMONLY_SLOW_PATHS + COMMONLY_SLOW_JOBS:
-		if slow_path["path"] == path:
-			reports[slow_path["id"]] = slow_path["function"](
-				name, "duration", timezone, timespan, timegrain, ResourceType.SITE, max_no_of_paths
-			)
-			break
-
-
-def get_additional_duration_reports(
-	request_duration_by_path, name: str, timezone, timespan, timegrain, max_no_of_paths
-):
-	"""Get additional reports for the request duration by path"""
-	reports = {}
-	for path_data in request_duration_by_path["datasets"][:4]:  # top 4 paths
-		add_commonly_slow_path_to_reports(
-			reports,
-			path_data["path"],
-			name,
-			timezone,
-			timespan,
-			timegrain,
-			max_no_of_paths,
-		)
-
-	return reports
-
-
 @frappe.whitelist()
+@redis_cache(ttl=10 * 60)
 def get_advanced_analytics(name, timezone, duration="7d", max_no_of_paths=MAX_NO_OF_PATHS):
 	timespan, timegrain = TIMESPAN_TIMEGRAIN_MAP[duration]
-
-	job_data = get_usage(name, "job", timezone, timespan, timegrain)
-
-	request_duration_by_path = get_request_by_(
-		name, "duration", timezone, timespan, timegrain, ResourceType.SITE, max_no_of_paths
+	log_server = frappe.db.get_single_value("Press Settings", "log_server")
+	if not log_server:
+		empty_chart = {"datasets": [], "labels": []}
+		return {key: empty_chart for key in ADVANCED_ANALYTICS_CHARTS} | {"job_count": [], "job_cpu_time": []}
+
+	# All charts and additional reports for commonly slow paths are sent as one _msearch per round
+	planner = ChartQueryPlanner(log_server)
+	chart_args = (timezone, timespan, timegrain, ResourceType.SITE, max_no_of_paths)
+
+	def add_additional_duration_reports(datasets: list[Dataset]):
+		for path_data in datasets[:4]:  # top 4 paths
+			for slow_path in COMMONLY_SLOW_PATHS + COMMONLY_SLOW_JOBS:
+				if slow_path["path"] == path_data["path"]:
+					chart = SLOW_PATH_CHARTS[slow_path["id"]](name, "duration", *chart_args)
+					planner.add_chart(slow_path["id"], chart)
+					break
+
+	for key, (chart_class, agg_type) in ADVANCED_ANALYTICS_CHARTS.items():
+		on_datasets = add_additional_duration_reports if key in ADDITIONAL_REPORTS_OF else None
+		planner.add_chart(key, chart_class(name, agg_type, *chart_args), on_datasets)
+
+	planner.add_search(
+		"job_data",
+		Search(index="filebeat-*").update_from_dict(get_usage_query(name, "job", timespan, timegrain)),
 	)
 
-	background_job_duration_by_method = get_background_job_by_(
-		name, "duration", timezone, timespan, timegrain, ResourceType.SITE, max_no_of_paths
-	)
+	charts, responses = planner.execute()
+	job_data = get_usage_buckets(responses["job_data"].to_dict(), timezone)
 
-	return (
-		{
-			"request_count_by_path": get_request_by_(
-				name, "count", timezone, timespan, timegrain, ResourceType.SITE, max_no_of_paths
-			),
-			"request_duration_by_path": request_duration_by_path,
-			"average_request_duration_by_path": get_request_by_(
-				name, "average_duration", timezone, timespan, timegrain, ResourceType.SITE, max_no_of_paths
-			),
-			"request_count_by_ip": get_nginx_request_by_(
-				name, "count", timezone, timespan, timegrain, max_no_of_paths
-			),
-			"background_job_count_by_method": get_background_job_by_(
-				name, "count", timezone, timespan, timegrain, ResourceType.SITE, max_no_of_paths
-			),
-			"background_job_duration_by_method": background_job_duration_by_method,
-			"average_background_job_duration_by_method": get_background_job_by_(
-				name, "average_duration", timezone, timespan, timegrain, ResourceType.SITE, max_no_of_paths
-			),
-			"job_count": [{"value": r.count, "date": r.date} for r in job_data],
-			"job_cpu_time": [{"value": r.duration, "date": r.date} for r in job_data],
-		}
-		| get_additional_duration_reports(
-			request_duration_by_path,
-			name,
-			timezone,
-			timespan,
-			timegrain,
-			max_no_of_paths,
-		)
-		| get_additional_duration_reports(
-			background_job_duration_by_method,
-			name,
-			timezone,
-			timespan,
-			timegrain,
-			max_no_of_paths,
-		)
-	)
+	return charts | {
+		"job_count": [{"value": r.count, "date": r.date} for r in job_data],
+		"job_cpu_time": [{"value": r.duration, "date": r.date} for r in job_data],
+	}
 
 
 @frappe.whitelist()
@@ -989,6 +989,90 @@ class GenerateReportReports(BackgroundJobGroupByChart):
 				self.search = self.search.exclude("match_phrase", json__site=path)
 
 
+SLOW_PATH_CHARTS: dict[str, type[StackedGroupByChart]] = {
+	"run_doc_method_methodnames": RunDocMethodMethodNames,
+	"query_report_run_reports": QueryReportRunReports,
+	"generate_report_reports": GenerateReportReports,
+}
+
+
+ADVANCED_ANALYTICS_CHARTS: dict[str, tuple[type[StackedGroupByChart], str]] = {
+	"request_count_by_path": (RequestGroupByChart, "count"),
+	"request_duration_by_path": (RequestGroupByChart, "duration"),
+	"average_request_duration_by_path": (RequestGroupByChart, "average_duration"),
+	"request_count_by_ip": (NginxRequestGroupByChart, "count"),
+	"background_job_count_by_method": (BackgroundJobGroupByChart, "count"),
+	"background_job_duration_by_method": (BackgroundJobGroupByChart, "duration"),
+	"average_background_job_duration_by_method": (BackgroundJobGroupByChart, "average_duration"),
+}
+
+# Charts whose top paths decide which additional duration reports are fetched
+ADDITIONAL_REPORTS_OF: Final[tuple[str, ...]] = (
+	"request_duration_by_path",
+	"background_job_duration_by_method",
+)
+
+
+class ChartQueryPlanner:
+	"""
+	Runs several charts and searches against the log server together.
+
+	Every round sends the next search of each unfinished chart (top paths, then the Other
+	bucket) and all pending searches in a single _msearch. A dashboard load takes as many
+	round trips as its longest chain of dependent queries instead of one per query.
+	"""
+
+	def __init__(self, log_server: str):
+		self.client = get_log_server_client(log_server)
+		self.charts: dict[str, StackedGroupByChart] = {}
+		self.searches: dict[str, Search] = {}
+		self.responses: dict[str, Response] = {}
+		self.on_datasets: dict[str, Callable[[list[Dataset]], None]] = {}
+
+	def add_chart(
+		self,
+		key: str,
+		chart: StackedGroupByChart,
+		on_datasets: Callable[[list[Dataset]], None] | None = None,
+	):
+		"""on_datasets is called with the top paths of the chart, and can add more charts"""
+		self.charts[key] = chart
+		if on_datasets:
+			self.on_datasets[key] = on_datasets
+
+	def add_search(self, key: str, search: Search):
+		self.searches[key] = search
+
+	def execute(self) -> tuple[dict[str, dict], dict[str, Response]]:
+		"""Returns results of charts and responses of searches by key"""
+		while pending := self.get_pending_searches():
+			multi_search = MultiSearch(using=self.client)
+			for search in pending.values():
+				multi_search = multi_search.add(search)
+
+			for key, response in zip(pending, multi_search.execute(), strict=True):
+				if key in self.searches:
+					self.responses[key] = response
+					continue
+
+				chart = self.charts[key]
+				chart.handle_response(response)
+				if callback := self.on_datasets.pop(key, None):
+					callback(chart.datasets)
+
+		return {key: chart.result for key, chart in self.charts.items()}, self.responses
+
+	def get_pending_searches(self) -> dict[str, Search]:
+		pending = {}
+		for key, chart in self.charts.items():
+			if (search := chart.next_search()) is not None:
+				pending[key] = search
+		for key, search in self.searches.items():
+			if key not in self.responses:
+				pending[key] = search
+		return pending
+
+
 def get_usage(site, type, timezone, timespan, timegrain):
 	log_server = frappe.db.get_single_value("Press Settings", "log_server")
 	if not log_server:
@@ -997,7 +1081,13 @@ def get_usage(site, type, timezone, timespan, timegrain):
 	url = f"https://{log_server}/elasticsearch/filebeat-*/_search"
 	password = get_decrypted_password("Log Server", log_server, "kibana_password")
 
-	query = {
+	query = get_usage_query(site, type, timespan, timegrain)
+	response = requests.post(url, json=query, auth=("frappe", password)).json()
+	return get_usage_buckets(response, timezone)
+
+
+def get_usage_query(site, type, timespan, timegrain) -> dict:
+	return {
 		"aggs": {
 			"date_histogram": {
 				"date_histogram": {
@@ -1023,8 +1113,8 @@ def get_usage(site, type, timezone, timespan, timegrain):
 		},
 	}
 
-	response = requests.post(url, json=query, auth=("frappe", password)).json()
 
+def get_usage_buckets(response: dict, timezone):
 	buckets = []
 
 	if not response.get("aggregations"):
@@ -1078,72 +1168,136 @@ def get_current_cpu_usage(site):
 		return 0
 
 
-def get_current_cpu_usage_for_sites_on_server(server):
+def get_cpu_usage_counters_for_sites_on_server(server: str, since: int) -> dict[str, tuple[int, int]]:
+	"""
+	Returns latest request counter of sites on server logged after since (epoch ms)
+
+	Result is {site: (timestamp in epoch ms, counter)}. Sites are paginated with a composite
+	aggregation, so servers with any number of sites are covered.
+	"""
+	log_server = frappe.db.get_single_value("Press Settings", "log_server")
+	if not log_server:
+		return {}
+
+	client = get_log_server_client(log_server)
+	query = {
+		"bool": {
+			"filter": [
+				{"term": {"json.transaction_type": {"value": "request"}}},
+				{"term": {"agent.name": {"value": server}}},
+				{"exists": {"field": "json.request.counter"}},
+				{"range": {"@timestamp": {"gt": since, "format": "epoch_millis"}}},
+			]
+		}
+	}
+	composite = {"size": CPU_USAGE_PAGE_SIZE, "sources": [{"site": {"terms": {"field": "json.site"}}}]}
+	aggs = {
+		"sites": {
+			"composite": composite,
+			"aggs": {
+				"counter": {
+					"top_metrics": {
+						"metrics": {"field": "json.request.counter"},
+						"size": 1,
+						"sort": {"@timestamp": "desc"},
+					}
+				},
+				# Sort values of top_metrics are formatted dates, max gives epoch ms
+				"timestamp": {"max": {"field": "@timestamp"}},
+			},
+		}
+	}
+
 	result = {}
-	with suppress(Exception):
-		log_server = frappe.db.get_single_value("Press Settings", "log_server")
-		if not log_server:
-			return result
+	while True:
+		response = client.search(index="filebeat-*", size=0, query=query, aggs=aggs)
+		sites = response["aggregations"]["sites"]
+		for bucket in sites["buckets"]:
+			if top := bucket["counter"]["top"]:
+				result[bucket["key"]["site"]] = (
+					int(bucket["timestamp"]["value"]),
+					top[0]["metrics"]["json.request.counter"],
+				)
 
-		url = f"https://{log_server}/elasticsearch/filebeat-*/_search"
-		password = get_decrypted_password("Log Server", log_server, "kibana_password")
+		if "after_key" not in sites or len(sites["buckets"]) < CPU_USAGE_PAGE_SIZE:
+			break
+		composite["after"] = sites["after_key"]
+	return result
 
-		query = {
+
+def get_site_loads_on_server(
+	server: str, start: datetime, end: datetime, interval: int | None = None
+) -> dict[int, dict[str, frappe._dict]]:
+	"""
+	Returns load of sites on server measured from request and job logs between start and end
+
+	Result is {bucket start (epoch ms): {site: {request_time, request_p95, job_time}}}, times
+	in seconds. Buckets are interval seconds wide, or a single bucket keyed 0 if interval isn't
+	given.
+	"""
+	log_server = frappe.db.get_single_value("Press Settings", "log_server")
+	if not log_server:
+		return {}
+
+	client = get_log_server_client(log_server)
+	query = {
+		"bool": {
+			"filter": [
+				{"terms": {"json.transaction_type": ["request", "job"]}},
+				{"term": {"agent.name": {"value": server}}},
+				{
+					"range": {
+						"@timestamp": {
+							"gte": int(start.timestamp() * 1000),
+							"lt": int(end.timestamp() * 1000),
+							"format": "epoch_millis",
+						}
+					}
+				},
+			]
+		}
+	}
+	sources = [{"site": {"terms": {"field": "json.site"}}}]
+	if interval:
+		sources.insert(
+			0, {"time": {"date_histogram": {"field": "@timestamp", "fixed_interval": f"{interval}s"}}}
+		)
+	composite = {"size": SITE_LOAD_PAGE_SIZE, "sources": sources}
+	aggs = {
+		"loads": {
+			"composite": composite,
 			"aggs": {
-				"0": {
-					"terms": {"field": "json.site", "size": 1000},
+				"requests": {
+					"filter": {"term": {"json.transaction_type": {"value": "request"}}},
 					"aggs": {
-						"usage": {
-							"filter": {"exists": {"field": "json.request.counter"}},
-							"aggs": {
-								"counter": {
-									"top_metrics": {
-										"metrics": {"field": "json.request.counter"},
-										"size": 1,
-										"sort": {"@timestamp": "desc"},
-									}
-								}
-							},
-						}
+						"time": {"sum": {"field": "json.duration"}},
+						"latency": {"percentiles": {"field": "json.duration", "percents": [95]}},
 					},
-				}
-			},
-			"size": 0,
-			"query": {
-				"bool": {
-					"filter": [
-						{
-							"bool": {
-								"filter": [
-									{
-										"bool": {
-											"should": [
-												{"term": {"json.transaction_type": {"value": "request"}}}
-											],
-											"minimum_should_match": 1,
-										}
-									},
-									{
-										"bool": {
-											"should": [{"term": {"agent.name": {"value": server}}}],
-											"minimum_should_match": 1,
-										}
-									},
-								]
-							}
-						},
-						{"range": {"@timestamp": {"gte": "now-1d"}}},
-					]
-				}
+				},
+				"jobs": {
+					"filter": {"term": {"json.transaction_type": {"value": "job"}}},
+					"aggs": {"time": {"sum": {"field": "json.duration"}}},
+				},
 			},
 		}
+	}
 
-		response = requests.post(url, json=query, auth=("frappe", password)).json()
-		for row in response["aggregations"]["0"]["buckets"]:
-			site = row["key"]
-			metric = row["usage"]["counter"]["top"]
-			if metric:
-				result[site] = metric[0]["metrics"]["json.request.counter"]
+	to_s_divisor = 1e6
+	result = {}
+	while True:
+		response = client.search(index="filebeat-*", size=0, query=query, aggs=aggs)
+		loads = response["aggregations"]["loads"]
+		for bucket in loads["buckets"]:
+			request_aggs = bucket["requests"]
+			result.setdefault(bucket["key"].get("time", 0), {})[bucket["key"]["site"]] = frappe._dict(
+				request_time=flt(request_aggs["time"]["value"]) / to_s_divisor,
+				request_p95=flt(request_aggs["latency"]["values"].get("95.0")) / to_s_divisor,
+				job_time=flt(bucket["jobs"]["time"]["value"]) / to_s_divisor,
+			)
+
+		if "after_key" not in loads or len(loads["buckets"]) < SITE_LOAD_PAGE_SIZE:
+			break
+		composite["after"] = loads["after_key"]
 	return result
 
 
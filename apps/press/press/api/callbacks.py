@@ -3,11 +3,12 @@
 from __future__ import annotations
 
 import ipaddress
+import json
 
 import frappe
 
 from press.agent import Agent
-from press.press.doctype.agent_job.agent_job import handle_polled_job
+from press.press.doctype.agent_job.agent_job import handle_polled_job, queue_pushed_job_updates
 from press.utils import log_error
 
 
@@ -114,3 +115,25 @@ def callback(job_id: str):
 		frappe.throw("Invalid Job Id", frappe.ValidationError)
 
 	frappe.enqueue(handle_job_updates, server=server, job_identifier=job_id)
+
+
+@frappe.whitelist(allow_guest=True, methods=["POST"])
+def job_updates(job_ids: list[int] | str):
+	"""
+	Handle job updates pushed from agent.
+	Only ids of changed jobs are accepted, their state is polled from agent in the background.
+	"""
+	if not frappe.db.get_single_value("Press Settings", "use_agent_job_push_updates", cache=True):
+		frappe.throw("Push updates are disabled", frappe.ValidationError)
+
+	remote_addr = frappe.request.environ.get("HTTP_X_FORWARDED_FOR")
+	server = validate_server_request(remote_addr)
+
+	# Request origin not authorized to update job status.
+	if not server:
+		frappe.throw("Not permitted", frappe.ValidationError)
+
+	if isinstance(job_ids, str):
+		job_ids = json.loads(job_ids)
+
+	queue_pushed_job_updates(server, job_ids)
@@ -0,0 +1,221 @@
+# Copyright (c) 2026, Frappe and Contributors
+# See license.txt
+
+from __future__ import annotations
+
+import json
+import zlib
+from datetime import timedelta
+from unittest.mock import Mock, patch
+
+import frappe
+from elasticsearch_dsl import MultiSearch, Search
+from elasticsearch_dsl.response import Response
+from frappe.tests.utils import FrappeTestCase
+
+from press.api.analytics import (
+	ADDITIONAL_REPORTS_OF,
+	ADVANCED_ANALYTICS_CHARTS,
+	COMMONLY_SLOW_JOBS,
+	COMMONLY_SLOW_PATHS,
+	TIMESPAN_TIMEGRAIN_MAP,
+	ResourceType,
+	get_advanced_analytics,
+	get_cpu_usage_counters_for_sites_on_server,
+	get_rounded_boundaries,
+	get_usage_buckets,
+	get_usage_query,
+)
+
+# Top paths returned for each group by field, slow ones first so additional reports are fetched
+TOP_PATHS = {
+	"json.request.path": [
+		"/api/method/run_doc_method",
+		"/api/method/frappe.desk.query_report.run",
+		"/api/method/frappe.desk.reportview.get",
+	],
+	"json.job.method": ["generate_report", "frappe.email.queue.flush"],
+	"json.methodname": ["make_sales_invoice"],
+	"json.report": ["General Ledger", "Stock Balance"],
+	"source.ip": ["10.0.0.2"],
+}
+
+
+def site_counter_bucket(site: str, timestamp: int, counter: int) -> dict:
+	"""Composite bucket with top_metrics and max sub aggregations, as returned by Elasticsearch"""
+	return {
+		"key": {"site": site},
+		"doc_count": 10,
+		"counter": {
+			"top": [
+				{
+					"sort": ["2026-10-17T00:00:00.000Z"],
+					"metrics": {"json.request.counter": counter},
+				}
+			]
+		},
+		"timestamp": {"value": float(timestamp), "value_as_string": "2026-10-17T00:00:00.000Z"},
+	}
+
+
+def search_response(body: dict, labels: list) -> dict:
+	"""
+	Aggregations Elasticsearch would return for a chart search body
+
+	Values are derived from the whole body, so searches only get the same response when they
+	are the same search, e.g. the Other bucket search excludes exactly the same paths.
+	"""
+	seed = zlib.crc32(json.dumps(body, sort_keys=True, default=str).encode())
+
+	def histogram(offset: int) -> dict:
+		return {
+			"buckets": [
+				{
+					"key_as_string": label.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+					"key": int(label.timestamp() * 1000),
+					"doc_count": (seed + offset + i) % 97,
+					"sum_of_duration": {"value": float((seed + offset * i) % 10_000)},
+					"avg_of_duration": {"value": float((seed + offset + i) % 1_000)},
+					"path_count": {"value": (seed + offset + i) % 97},
+				}
+				for i, label in enumerate(labels[:3])
+			]
+		}
+
+	aggs = body.get("aggs", {})
+	if "method_path" in aggs:
+		terms = aggs["method_path"]["terms"]
+		paths = TOP_PATHS.get(terms["field"], [])
+		paths = (paths + [f"{terms['field']}-{i}" for i in range(terms["size"])])[: terms["size"]]
+		buckets = [
+			{"key": path, "doc_count": 10, "histogram_of_method": histogram(offset)}
+			for offset, path in enumerate(paths)
+		]
+		return {"method_path": {"buckets": buckets}}
+	if "histogram_of_method" in aggs:
+		return {"histogram_of_method": histogram(0)}
+	return {
+		"date_histogram": {
+			"buckets": [
+				{
+					"key_as_string": label.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+					"count": {"value": 1},
+					"duration": {"value": 2.0},
+					"max": {"value": 3},
+				}
+				for label in labels[:3]
+			]
+		}
+	}
+
+
+class TestAnalytics(FrappeTestCase):
+	def setUp(self):
+		frappe.db.set_single_value("Press Settings", "log_server", "log.example.com")
+
+	def tearDown(self):
+		frappe.db.rollback()
+
+	@patch("press.api.analytics.CPU_USAGE_PAGE_SIZE", new=2)
+	def test_cpu_usage_counters_are_read_across_pages(self):
+		client = Mock()
+		client.search.side_effect = [
+			{
+				"aggregations": {
+					"sites": {
+						"after_key": {"site": "b.example.com"},
+						"buckets": [
+							site_counter_bucket("a.example.com", 1_792_195_200_000, 100),
+							site_counter_bucket("b.example.com", 1_792_195_260_000, 200),
+						],
+					}
+				}
+			},
+			{
+				"aggregations": {
+					"sites": {
+						"buckets": [
+							site_counter_bucket("c.example.com", 1_792_195_320_000, 300),
+							{"key": {"site": "d.example.com"}, "doc_count": 0, "counter": {"top": []}},
+						],
+						"after_key": {"site": "d.example.com"},
+					}
+				}
+			},
+			{"aggregations": {"sites": {"buckets": []}}},
+		]
+
+		with patch("press.api.analytics.get_log_server_client", return_value=client):
+			counters = get_cpu_usage_counters_for_sites_on_server("f1.example.com", 0)
+
+		self.assertEqual(
+			counters,
+			{
+				"a.example.com": (1_792_195_200_000, 100),
+				"b.example.com": (1_792_195_260_000, 200),
+				"c.example.com": (1_792_195_320_000, 300),
+			},
+		)
+		self.assertEqual(client.search.call_count, 3)
+
+	def test_advanced_analytics_match_charts_run_one_by_one(self):
+		name, timezone, duration, max_no_of_paths = "analytics.example.com", "UTC", "1h", 5
+		timespan, timegrain = TIMESPAN_TIMEGRAIN_MAP[duration]
+		start, end = get_rounded_boundaries(timespan, timegrain, timezone)
+		labels = [
+			start + i * timedelta(seconds=timegrain)
+			for i in range((end - start) // timedelta(seconds=timegrain) + 1)
+		]
+		frappe.db.set_single_value("Press Settings", "monitor_server", "monitor.example.com")
+		get_value = frappe.db.get_value
+
+		def execute(search, ignore_cache=False):
+			return Response(search, {"aggregations": search_response(search.to_dict(), labels)})
+
+		def msearch(multi_search, ignore_cache=False, raise_on_error=True):
+			return [execute(search) for search in multi_search._searches]
+
+		with (
+			patch("press.api.analytics.get_log_server_client", return_value=Mock()),
+			patch.object(
+				frappe.db,
+				"get_value",
+				side_effect=lambda doctype, *args, **kwargs: (
+					"10.0.0.1" if doctype == "Monitor Server" else get_value(doctype, *args, **kwargs)
+				),
+			),
+			patch.object(Search, "execute", new=execute),
+			patch.object(MultiSearch, "execute", autospec=True, side_effect=msearch) as multi_search_execute,
+		):
+			get_advanced_analytics.clear_cache()
+			analytics = get_advanced_analytics(name, timezone, duration, max_no_of_paths)
+
+			chart_args = (timezone, timespan, timegrain, ResourceType.SITE, max_no_of_paths)
+			expected = {
+				key: chart_class(name, agg_type, *chart_args).get_stacked_histogram_chart()
+				for key, (chart_class, agg_type) in ADVANCED_ANALYTICS_CHARTS.items()
+			}
+			for key in ADDITIONAL_REPORTS_OF:
+				for path_data in expected[key]["datasets"][:4]:
+					for slow_path in COMMONLY_SLOW_PATHS + COMMONLY_SLOW_JOBS:
+						if slow_path["path"] == path_data["path"]:
+							expected[slow_path["id"]] = slow_path["function"](name, "duration", *chart_args)
+							break
+
+		job_data = get_usage_buckets(
+			{"aggregations": search_response(get_usage_query(name, "job", timespan, timegrain), labels)},
+			timezone,
+		)
+		expected["job_count"] = [{"value": r.count, "date": r.date} for r in job_data]
+		expected["job_cpu_time"] = [{"value": r.duration, "date": r.date} for r in job_data]
+
+		self.assertEqual(analytics, expected)
+		# Every chart got an Other bucket, and the slow path reports were fetched too
+		for key in ADVANCED_ANALYTICS_CHARTS:
+			self.assertEqual(analytics[key]["datasets"][-1]["path"], "Other", key)
+		self.assertTrue(
+			{"run_doc_method_methodnames", "query_report_run_reports", "generate_report_reports"}
+			<= set(analytics)
+		)
+		# Top paths, then Other buckets and slow path charts, then their Other buckets
+		self.assertEqual(multi_search_execute.call_count, 3)
@@ -1,14 +1,13 @@
 # Copyright (c) 2022, Frappe and contributors
 # For license information, please see license.txt
 
-import json
-import os
-import traceback
-
 import frappe
 
+from press.utils.log_sink import LogSink
+
 PRESS_AUTH_KEY = "press-auth-logs"
 PRESS_AUTH_MAX_ENTRIES = 1000000
+PRESS_AUTH_LOG = LogSink(PRESS_AUTH_KEY, "press.auth.json.log", max_entries=PRESS_AUTH_MAX_ENTRIES)
 
 
 ALLOWED_PATHS = [
@@ -109,23 +108,8 @@ def log(path, user_type):
 		"referer": frappe.request.headers.get("Referer", ""),
 	}
 
-	if frappe.cache().llen(PRESS_AUTH_KEY) > PRESS_AUTH_MAX_ENTRIES:
-		frappe.cache().ltrim(PRESS_AUTH_KEY, 1, -1)
-	serialized = json.dumps(data, sort_keys=True, default=str)
-	frappe.cache().rpush(PRESS_AUTH_KEY, serialized)
+	PRESS_AUTH_LOG.push(data)
 
 
 def flush():
-	log_file = os.path.join(frappe.utils.get_bench_path(), "logs", "press.auth.json.log")
-	try:
-		# Fetch all entries without removing from cache
-		logs = frappe.cache().lrange(PRESS_AUTH_KEY, 0, -1)
-		if logs:
-			logs = list(map(frappe.safe_decode, logs))
-			with open(log_file, "a", os.O_NONBLOCK) as f:
-				f.write("\n".join(logs))
-				f.write("\n")
-			# Remove fetched entries from cache
-			frappe.cache().ltrim(PRESS_AUTH_KEY, len(logs) - 1, -1)
-	except Exception:
-		traceback.print_exc()
+	PRESS_AUTH_LOG.flush()
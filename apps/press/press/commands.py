@@ -46,6 +46,35 @@ def start_ngrok_and_set_webhook(context):
 		ngrok.kill()
 
 
+LOG_SINKS = {
+	"agent-jobs": "press.press.doctype.agent_job.agent_job.AGENT_JOB_LOG",
+	"press-auth": "press.auth.PRESS_AUTH_LOG",
+}
+
+
+@click.command("press-logs")
+@click.argument("log", type=click.Choice(list(LOG_SINKS)))
+@click.option("--job-type", help="Only events of this Agent Job Type")
+@click.option("--server", help="Only events of this server")
+@click.option("--min-duration", type=float, help="Only events that took at least these many seconds")
+@click.option("--limit", type=int, help="Stop after these many events")
+@pass_context
+def query_logs(context, log, job_type=None, server=None, min_duration=None, limit=None):
+	"""Print events of a press log, oldest first, as JSON lines"""
+	import json
+
+	from press.utils.log_sink import query
+
+	frappe.init(site=get_site(context))
+	try:
+		sink = frappe.get_attr(LOG_SINKS[log])
+		for event in query(sink, job_type, server, min_duration, limit):
+			click.echo(json.dumps(event, sort_keys=True, default=str))
+	finally:
+		frappe.destroy()
+
+
 commands = [
 	start_ngrok_and_set_webhook,
+	query_logs,
 ]
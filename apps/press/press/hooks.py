@@ -173,6 +173,129 @@ doc_events = {
 	"Marketplace App Subscription": {
 		"on_update": "press.press.doctype.storage_integration_subscription.storage_integration_subscription.create_after_insert",
 	},
+	"Server": {
+		"on_update": "press.agent.invalidate_agent_credentials",
+		"on_change": "press.press.doctype.agent_job.server_state.on_server_change",
+	},
+	"Database Server": {
+		"on_update": "press.agent.invalidate_agent_credentials",
+		"on_change": "press.press.doctype.agent_job.server_state.on_server_change",
+	},
+	"Proxy Server": {
+		"on_update": "press.agent.invalidate_agent_credentials",
+		"on_change": "press.press.doctype.agent_job.server_state.on_server_change",
+	},
+	"Bench": {"on_change": "press.press.doctype.site_update.upgrade_graph.on_bench_change"},
+	"Deploy Candidate Difference": {
+		"after_insert": "press.press.doctype.site_update.upgrade_graph.on_deploy_candidate_difference_change",
+		"on_trash": "press.press.doctype.site_update.upgrade_graph.on_deploy_candidate_difference_change",
+	},
+	"Frappe Version": {
+		"on_change": "press.press.doctype.site.dashboard.invalidate_reference_data",
+		"on_trash": "press.press.doctype.site.dashboard.invalidate_reference_data",
+	},
+	"Site Plan": {
+		"on_change": "press.press.doctype.site.dashboard.invalidate_reference_data",
+		"on_trash": "press.press.doctype.site.dashboard.invalidate_reference_data",
+	},
+	"Cluster": {
+		"on_change": "press.press.doctype.site.dashboard.invalidate_reference_data",
+		"on_trash": "press.press.doctype.site.dashboard.invalidate_reference_data",
+	},
+	"Registry Server": {"on_update": "press.agent.invalidate_agent_credentials"},
+	"Log Server": {"on_update": "press.agent.invalidate_agent_credentials"},
+	"Monitor Server": {"on_update": "press.agent.invalidate_agent_credentials"},
+	"Analytics Server": {"on_update": "press.agent.invalidate_agent_credentials"},
+	"Trace Server": {"on_update": "press.agent.invalidate_agent_credentials"},
+	"NFS Server": {"on_update": "press.agent.invalidate_agent_credentials"},
+	"Agent Request Failure": {
+		"after_insert": "press.press.doctype.agent_job.server_state.on_request_failure_change",
+		"on_trash": "press.press.doctype.agent_job.server_state.on_request_failure_change",
+	},
+}
+
+# Agent Job Callbacks
+# -------------------
+# Called with the Agent Job on every update of jobs of the type, or of the type
+# and reference doctype. Handlers taking response_data also get the update.
+
+agent_job_callbacks = {
+	"Add Upstream to Proxy": "press.press.doctype.server.server.process_new_server_job_update",
+	"New Bench": "press.press.doctype.bench.bench.process_new_bench_job_update",
+	"Archive Bench": "press.press.doctype.bench.bench.process_archive_bench_job_update",
+	"New Site": "press.press.doctype.site.site.process_new_site_job_update",
+	"New Site from Backup": [
+		"press.press.doctype.site.site.process_new_site_job_update",
+		"press.press.doctype.site.site.process_restore_from_backup_job_update",
+	],
+	"Restore Site": "press.press.doctype.site.site.process_restore_job_update",
+	"Reinstall Site": "press.press.doctype.site.site.process_reinstall_site_job_update",
+	"Migrate Site": "press.press.doctype.site.site.process_migrate_site_job_update",
+	"Install App on Site": "press.press.doctype.site.site.process_install_app_site_job_update",
+	"Uninstall App from Site": "press.press.doctype.site.site.process_uninstall_app_site_job_update",
+	"Add Site to Upstream": "press.press.doctype.site.site.process_new_site_job_update",
+	"Add Code Server to Upstream": "press.press.doctype.code_server.code_server.process_new_code_server_job_update",
+	"Setup Code Server": "press.press.doctype.code_server.code_server.process_new_code_server_job_update",
+	"Start Code Server": "press.press.doctype.code_server.code_server.process_start_code_server_job_update",
+	"Stop Code Server": "press.press.doctype.code_server.code_server.process_stop_code_server_job_update",
+	"Archive Code Server": "press.press.doctype.code_server.code_server.process_archive_code_server_job_update",
+	"Remove Code Server from Upstream": "press.press.doctype.code_server.code_server.process_archive_code_server_job_update",
+	"Backup Site": "press.press.doctype.site_backup.site_backup.process_backup_site_job_update",
+	"Physical Backup Database": "press.press.doctype.site_backup.site_backup.process_backup_site_job_update",
+	"Archive Site": "press.press.doctype.site.site.process_archive_site_job_update",
+	"Remove Site from Upstream": "press.press.doctype.site.site.process_archive_site_job_update",
+	"Add Host to Proxy": "press.press.doctype.site_domain.site_domain.process_new_host_job_update",
+	"Add Domain to Upstream": "press.press.doctype.site_domain.site_domain.process_add_domain_to_upstream_job_update",
+	"Update Site Migrate": "press.press.doctype.site_update.site_update.process_update_site_job_update",
+	"Update Site Pull": "press.press.doctype.site_update.site_update.process_update_site_job_update",
+	"Recover Failed Site Migrate": "press.press.doctype.site_update.site_update.process_update_site_recover_job_update",
+	"Recover Failed Site Pull": "press.press.doctype.site_update.site_update.process_update_site_recover_job_update",
+	"Recover Failed Site Update": "press.press.doctype.site_update.site_update.process_update_site_recover_job_update",
+	"Rename Site": "press.press.doctype.site.site.process_rename_site_job_update",
+	"Rename Site on Upstream": "press.press.doctype.site.site.process_rename_site_job_update",
+	"Setup ERPNext": "press.press.doctype.site.erpnext_site.process_setup_erpnext_site_job_update",
+	"Restore Site Tables": "press.press.doctype.site.site.process_restore_tables_job_update",
+	"Add User to Proxy": "press.press.doctype.bench.bench.process_add_ssh_user_job_update",
+	"Remove User from Proxy": "press.press.doctype.bench.bench.process_remove_ssh_user_job_update",
+	"Add User to ProxySQL": {
+		"Site Database User": "press.press.doctype.site_database_user.site_database_user.SiteDatabaseUser.process_job_update",
+	},
+	"Remove User from ProxySQL": {
+		"Site Database User": "press.press.doctype.site_database_user.site_database_user.SiteDatabaseUser.process_job_update",
+	},
+	"Reload NGINX": "press.press.doctype.proxy_server.proxy_server.process_update_nginx_job_update",
+	"Move Site to Bench": "press.press.doctype.site.site.process_move_site_to_bench_job_update",
+	"Patch App": "press.press.doctype.app_patch.app_patch.AppPatch.process_patch_app",
+	"Run Remote Builder": "press.press.doctype.deploy_candidate_build.deploy_candidate_build.DeployCandidateBuild.process_run_build",
+	"Create User": "press.press.doctype.site.site.process_create_user_job_update",
+	"Complete Setup Wizard": "press.press.doctype.site.site.process_complete_setup_wizard_job_update",
+	"Update Bench In Place": "press.press.doctype.bench.bench.Bench.process_update_inplace",
+	"Recover Update In Place": "press.press.doctype.bench.bench.Bench.process_recover_update_inplace",
+	"Fetch Database Table Schema": "press.press.doctype.site.site.process_fetch_database_table_schema_job_update",
+	"Create Database User": "press.press.doctype.site_database_user.site_database_user.SiteDatabaseUser.process_job_update",
+	"Remove Database User": "press.press.doctype.site_database_user.site_database_user.SiteDatabaseUser.process_job_update",
+	"Modify Database User Permissions": "press.press.doctype.site_database_user.site_database_user.SiteDatabaseUser.process_job_update",
+	"Physical Restore Database": "press.press.doctype.physical_backup_restoration.physical_backup_restoration.process_job_update",
+	"Deactivate Site": {
+		"Site Update": "press.press.doctype.site_update.site_update.process_deactivate_site_job_update",
+		"Site Backup": "press.press.doctype.site_backup.site_backup.process_deactivate_site_job_update",
+		"Physical Backup Restoration": "press.press.doctype.physical_backup_restoration.physical_backup_restoration.process_physical_backup_restoration_deactivate_site_job_update",
+		"Logical Replication Backup": "press.press.doctype.logical_replication_backup.logical_replication_backup.process_logical_replication_backup_deactivate_site_job_update",
+	},
+	"Activate Site": {
+		"Site Update": "press.press.doctype.site_update.site_update.process_activate_site_job_update",
+		"Logical Replication Backup": "press.press.doctype.logical_replication_backup.logical_replication_backup.process_logical_replication_backup_activate_site_job_update",
+	},
+	"Update Database Host": {
+		"Logical Replication Backup": "press.press.doctype.logical_replication_backup.logical_replication_backup.process_logical_replication_backup_update_database_host_job_update",
+	},
+	"Add Domain": "press.press.doctype.site.site.process_add_domain_job_update",
+	"Add Binlogs To Indexer": "press.press.doctype.database_server.database_server.process_add_binlogs_to_indexer_agent_job_update",
+	"Remove Binlogs From Indexer": "press.press.doctype.database_server.database_server.process_remove_binlogs_from_indexer_agent_job_update",
+	"Upload Binlogs To S3": "press.press.doctype.mariadb_binlog.mariadb_binlog.process_upload_binlogs_to_s3_job_update",
+	"Search Sites In Snapshot": "press.press.doctype.server_snapshot_recovery.server_snapshot_recovery.process_search_sites_in_snapshot_job_callback",
+	"Backup Database From Snapshot": "press.press.doctype.server_snapshot_recovery.server_snapshot_recovery.process_backup_database_from_snapshot_job_callback",
+	"Backup Files From Snapshot": "press.press.doctype.server_snapshot_recovery.server_snapshot_recovery.process_backup_files_from_snapshot_job_callback",
 }
 
 # Scheduled Tasks
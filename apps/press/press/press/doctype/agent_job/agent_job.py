@@ -3,9 +3,10 @@
 from __future__ import annotations
 
 import json
-import os
+import pickle
 import random
 import traceback
+from datetime import datetime, timedelta
 from typing import TYPE_CHECKING
 
 import frappe
@@ -22,21 +23,52 @@ from frappe.utils import (
 )
 
 from press.access.support_access import has_support_access
-from press.agent import Agent, AgentCallbackException, AgentRequestSkippedException
+from press.agent import (
+	Agent,
+	AgentCallbackException,
+	AgentRequestSkippedException,
+	get_agent_session_stats,
+	get_dedup_key,
+)
 from press.api.client import is_owned_by_team
+from press.press.doctype.agent_job.callbacks import run_callbacks
+from press.press.doctype.agent_job.delivery import get_queued_jobs, queue_delivery, resume_delivery
+from press.press.doctype.agent_job.server_state import get_server_state, get_server_states, is_pollable
 from press.press.doctype.agent_job_type.agent_job_type import (
 	get_retryable_job_types_and_max_retry_count,
 )
-from press.press.doctype.site_database_user.site_database_user import SiteDatabaseUser
 from press.press.doctype.site_migration.site_migration import (
 	get_ongoing_migration,
 	process_site_migration_job_update,
 )
 from press.press.doctype.telegram_message.telegram_message import TelegramMessage
-from press.utils import log_error, timer
+from press.utils import chunk, log_error, timer
+from press.utils.log_sink import LogSink
 
 AGENT_LOG_KEY = "agent-jobs"
+AGENT_JOB_LOG = LogSink(AGENT_LOG_KEY, f"{AGENT_LOG_KEY}.json.log")
 AGENT_JOB_TIMEOUT_HOURS = 4
+AGENT_POLL_CYCLE_KEY = "agent_job_poll_cycle"
+AGENT_JOB_UPDATES_KEY = "agent_job_updates"
+
+POLL_BATCH_SIZE = 100
+
+# Long running job types, polled once every N poll cycles
+SLOW_POLL_JOB_TYPES = {"Backup Site": 10}
+
+# With push updates, pending jobs are only polled once every N poll cycles to reconcile missed updates
+RECONCILIATION_POLL_EVERY = 12
+MAX_PUSHED_UPDATE_DRAINS = 10
+
+# Typical durations (in seconds), used to order jobs within a poll
+EXPECTED_JOB_DURATION = {
+	"Backup Site": 15 * 60,
+	"New Bench": 10 * 60,
+	"Run Remote Builder": 10 * 60,
+	"Update Site Migrate": 5 * 60,
+	"Restore Site": 5 * 60,
+	"New Site from Backup": 5 * 60,
+}
 
 BYPASS_AGENT_JOB_HALT = ["Change Bench Directory", "Remove Redis Localhost Bind"]
 
@@ -52,6 +84,7 @@ class AgentJob(Document):
 		callback_failure_count: DF.Int
 		code_server: DF.Link | None
 		data: DF.Code | None
+		dedup_key: DF.Data | None
 		duration: DF.Time | None
 		end: DF.Datetime | None
 		host: DF.Link | None
@@ -149,38 +182,46 @@ class AgentJob(Document):
 
 		return doc
 
+	def before_insert(self):
+		self.dedup_key = get_dedup_key(
+			self.server_type,
+			self.server,
+			self.job_type,
+			self.request_method,
+			self.request_path,
+			self.bench,
+			self.site,
+			self.code_server,
+			self.upstream,
+			self.host,
+		)
+
 	def after_insert(self):
 		self.create_agent_job_steps()
 		self.log_creation()
 		self.enqueue_http_request()
 
 	def enqueue_http_request(self):
-		frappe.enqueue_doc(
-			self.doctype,
-			self.name,
-			"create_http_request",
-			timeout=600,
-			queue="short",
-			enqueue_after_commit=True,
-		)
+		queue_delivery(self)
 
 	def create_http_request(self):
+		if job_id := self.deliver(Agent(self.server, server_type=self.server_type)):
+			self.job_id = job_id
+			self.status = "Pending"
+			self.save()
+
+	def deliver(self, agent: Agent) -> int | None:
+		"""Sends the job to agent and returns its id there, failed deliveries are set up for a retry"""
 		try:
-			agent = Agent(self.server, server_type=self.server_type)
 			if agent.should_skip_requests() and self.job_type not in BYPASS_AGENT_JOB_HALT:
 				self.retry_count = 0
 				self.set_status_and_next_retry_at()
-				return
+				return None
 
 			data = json.loads(self.request_data)
 			files = json.loads(self.request_files)
 
-			self.job_id = agent.request(self.request_method, self.request_path, data, files, agent_job=self)[
-				"job"
-			]
-
-			self.status = "Pending"
-			self.save()
+			return agent.request(self.request_method, self.request_path, data, files, agent_job=self)["job"]
 		except AgentRequestSkippedException:
 			self.retry_count = 0
 			self.set_status_and_next_retry_at()
@@ -196,6 +237,8 @@ class AgentJob(Document):
 			else:
 				self.set_status_and_next_retry_at()
 
+		return None
+
 	def log_creation(self):
 		try:
 			if hasattr(frappe.local, "monitor"):
@@ -208,8 +251,7 @@ class AgentJob(Document):
 				"timestamp": frappe.utils.now(),
 				"job": self.as_dict(),
 			}
-			serialized = json.dumps(data, sort_keys=True, default=str, separators=(",", ":"))
-			frappe.cache().rpush(AGENT_LOG_KEY, serialized)
+			AGENT_JOB_LOG.push(data)
 		except Exception:
 			traceback.print_exc()
 
@@ -446,69 +488,132 @@ def publish_update(job):
 		)
 
 
+def get_expected_completion(job) -> datetime:
+	"""Jobs that are expected to have finished the earliest are polled first"""
+	expected_duration = EXPECTED_JOB_DURATION.get(job.job_type, 0)
+	return get_datetime(job.creation) + timedelta(seconds=expected_duration)
+
+
+def get_poll_batches(pending_jobs) -> list[list]:
+	pending_jobs = sorted(pending_jobs, key=get_expected_completion)
+	return list(chunk(pending_jobs, POLL_BATCH_SIZE))
+
+
 @timer
-def poll_random_jobs(agent, pending_ids):
-	random_pending_ids = random.sample(pending_ids, k=min(100, len(pending_ids)))
-	return agent.get_jobs_status(random_pending_ids)
+def poll_jobs(agent, pending_ids):
+	return agent.get_jobs_status(pending_ids)
 
 
 @timer
 def handle_polled_jobs(polled_jobs, pending_jobs):
+	jobs_by_id = {job.job_id: job for job in pending_jobs}
+	steps_by_job = get_steps_of_jobs([job.name for job in pending_jobs])
 	for polled_job in polled_jobs:
-		if not polled_job:
+		if not polled_job or not (job := jobs_by_id.get(polled_job["id"])):
 			continue
-		handle_polled_job(pending_jobs=pending_jobs, polled_job=polled_job)
+		record_completion_lag(polled_job)
+		handle_polled_job(polled_job=polled_job, job=job, steps=steps_by_job.get(job.name, {}))
+
+
+def get_steps_of_jobs(job_names: list[str]) -> dict[str, dict[str, frappe._dict]]:
+	"""Steps of all given jobs in a single query, as {job: {step_name: step}}"""
+	steps_by_job = {}
+	if not job_names:
+		return steps_by_job
+
+	for step in frappe.get_all(
+		"Agent Job Step",
+		fields=["name", "agent_job", "status", "step_name"],
+		filters={"agent_job": ("in", job_names)},
+	):
+		steps_by_job.setdefault(step.agent_job, {})[step.step_name] = step
+	return steps_by_job
+
+
+def record_completion_lag(polled_job):
+	"""Track time between a job finishing on agent and press processing it"""
+	if polled_job["status"] not in ("Success", "Failure") or not polled_job.get("end"):
+		return
+
+	# agent job end is in utc
+	lag = (datetime.utcnow() - get_datetime(polled_job["end"])).total_seconds()
+	stats = get_poll_stats()
+	stats["completed"] += 1
+	stats["max_completion_lag"] = max(stats["max_completion_lag"], frappe.utils.rounded(lag, precision=3))
+
+
+def get_poll_stats() -> dict:
+	if not hasattr(frappe.local, "agent_job_poll_stats"):
+		frappe.local.agent_job_poll_stats = {
+			"pending": 0,
+			"batches": 0,
+			"completed": 0,
+			"max_completion_lag": 0,
+		}
+	return frappe.local.agent_job_poll_stats
 
 
 def add_timer_data_to_monitor(server):
 	if not hasattr(frappe.local, "timers"):
 		frappe.local.timers = {}
 
-	add_data_to_monitor(server=server, timing=frappe.local.timers)
+	add_data_to_monitor(
+		server=server,
+		timing=frappe.local.timers,
+		poll=get_poll_stats(),
+		agent_sessions=get_agent_session_stats(),
+	)
 
 
-def poll_pending_jobs_server(server):
-	if frappe.db.get_value(server.server_type, server.server, "status") != "Active":
+def poll_pending_jobs_server(server, skip_job_types=None, retry_only=False):
+	state = get_server_state(server.server_type, server.server)
+	if not is_pollable(state):
 		return
 
-	agent = Agent(server.server, server_type=server.server_type)
-	if agent.should_skip_requests():
+	agent = Agent(server.server, server_type=server.server_type, server_state=state)
+
+	if retry_only:
+		retry_undelivered_jobs(server, agent)
+		add_timer_data_to_monitor(server.server)
 		return
 
+	filters = {
+		"status": ("in", ["Pending", "Running"]),
+		"job_id": ("!=", 0),
+		"server": server.server,
+	}
+	if skip_job_types:
+		filters["job_type"] = ("not in", skip_job_types)
+
 	pending_jobs = frappe.get_all(
 		"Agent Job",
-		fields=["name", "job_id", "status", "callback_failure_count"],
-		filters={
-			"status": ("in", ["Pending", "Running"]),
-			"job_id": ("!=", 0),
-			"server": server.server,
-		},
+		fields=["name", "job_id", "status", "callback_failure_count", "job_type", "creation"],
+		filters=filters,
 		order_by="job_id",
 		ignore_ifnull=True,
 	)
 
-	if not pending_jobs:
-		retry_undelivered_jobs(server)
-		add_timer_data_to_monitor(server.server)
-		return
+	stats = get_poll_stats()
+	stats["pending"] = len(pending_jobs)
+	for batch in get_poll_batches(pending_jobs):
+		stats["batches"] += 1
+		polled_jobs = poll_jobs(agent, [job.job_id for job in batch])
+		if not polled_jobs:
+			# Agent didn't respond, don't bother with the rest of the batches
+			break
 
-	pending_ids = [j.job_id for j in pending_jobs]
-	polled_jobs = poll_random_jobs(agent, pending_ids)
+		handle_polled_jobs(polled_jobs, batch)
 
-	if not polled_jobs:
-		retry_undelivered_jobs(server)
-		add_timer_data_to_monitor(server.server)
-		return
-
-	handle_polled_jobs(polled_jobs, pending_jobs)
-
-	retry_undelivered_jobs(server)
+	retry_undelivered_jobs(server, agent)
 	add_timer_data_to_monitor(server.server)
 
 
-def handle_polled_job(polled_job, pending_jobs=None, job=None):
+def handle_polled_job(polled_job, pending_jobs=None, job=None, steps=None):
 	job = job or find(pending_jobs, lambda x: x.job_id == polled_job["id"])
 	try:
+		if steps is None:
+			steps = get_steps_of_jobs([job.name]).get(job.name, {})
+
 		# Update Job Status
 		# If it is worthy of an update
 		if job.status != polled_job["status"]:
@@ -516,8 +621,8 @@ def handle_polled_job(polled_job, pending_jobs=None, job=None):
 			update_job(job.name, polled_job)
 
 		# Update Steps' Status
-		update_steps(job.name, polled_job)
-		populate_output_cache(polled_job, job)
+		update_steps(job.name, polled_job, steps)
+		populate_output_cache(polled_job, job, steps)
 
 		# Some callbacks rely on step statuses, e.g. archive_site
 		# so update step status before callbacks are processed
@@ -550,62 +655,59 @@ def handle_polled_job(polled_job, pending_jobs=None, job=None):
 		frappe.db.rollback()
 
 
-def populate_output_cache(polled_job, job):
+def populate_output_cache(polled_job, job, steps=None):
 	if not cint(frappe.get_cached_value("Press Settings", None, "realtime_job_updates")):
 		return
-	steps = frappe.get_all(
-		"Agent Job Step",
-		filters={"agent_job": job.name, "status": "Running"},
-		fields=["name", "step_name"],
-	)
-	for step in steps:
-		polled_step = find(polled_job["steps"], lambda x: x["name"] == step.step_name)
-		if polled_step:
-			lines = []
-			for command in polled_step.get("commands", []):
-				output = command.get("output", "").strip()
-				if output:
-					lines.append(output)
-			frappe.cache.hset("agent_job_step_output", step.name, "\n".join(lines))
-
-
-def filter_active_servers(servers):
-	# Prepare list of all_active_servers for each server_type
-	# Return servers that are in all_active_servers
-	server_types = [server.server_type for server in servers]
-	all_active_servers = {}
-	for server_type in server_types:
-		all_active_servers[server_type] = set(frappe.get_all(server_type, {"status": "Active"}, pluck="name"))
-
-	active_servers = []
-	for server in servers:
-		if server.server in all_active_servers[server.server_type]:
-			active_servers.append(server)
 
-	return active_servers
+	if steps is None:
+		steps = get_steps_of_jobs([job.name]).get(job.name, {})
 
+	outputs = {}
+	for polled_step in polled_job["steps"]:
+		step = steps.get(polled_step["name"])
+		if not step or polled_step["status"] != "Running":
+			continue
 
-def filter_request_failures(servers):
-	request_failures = set(frappe.get_all("Agent Request Failure", pluck="server"))
+		lines = []
+		for command in polled_step.get("commands", []):
+			output = command.get("output", "").strip()
+			if output:
+				lines.append(output)
+		outputs[step.name] = pickle.dumps("\n".join(lines))
 
-	alive_servers = []
-	for server in servers:
-		if server.server not in request_failures:
-			alive_servers.append(server)
+	if outputs:
+		# Single HSET for all running steps, values are pickled like frappe.cache.hset
+		pipe = frappe.cache.pipeline()
+		pipe.hset(frappe.cache.make_key("agent_job_step_output"), mapping=outputs)
+		pipe.execute()
+
+
+def get_job_types_to_skip_polling(cycle: int) -> list[str]:
+	"""Long running job types are polled once every few cycles instead of every cycle"""
+	return [job_type for job_type, every in SLOW_POLL_JOB_TYPES.items() if cycle % every]
 
-	return alive_servers
+
+def is_reconciliation_cycle(cycle: int) -> bool:
+	if not frappe.db.get_single_value("Press Settings", "use_agent_job_push_updates", cache=True):
+		return True
+	return cycle % RECONCILIATION_POLL_EVERY == 0
 
 
 def poll_pending_jobs():
 	"""
 	Poll pending job fetches the status of Pending Jobs from all servers.
+
+	With push updates enabled, pending jobs are only polled on reconciliation
+	cycles, other cycles only retry undelivered jobs.
 	"""
+	cycle = frappe.cache.incr(frappe.cache.make_key(AGENT_POLL_CYCLE_KEY))
+	retry_only = not is_reconciliation_cycle(cycle)
 	filters = {"status": ("in", ["Pending", "Running", "Undelivered"])}
-	if random.random() > 0.1:
-		# Experimenting with fewer polls (only for backup jobs)
-		# Reduce poll frequency for Backup Site jobs
-		# TODO: Replace this with something deterministic
-		filters["job_type"] = ("!=", "Backup Site")
+	if retry_only:
+		filters["status"] = "Undelivered"
+	skip_job_types = get_job_types_to_skip_polling(cycle)
+	if skip_job_types:
+		filters["job_type"] = ("not in", skip_job_types)
 	servers = frappe.get_all(
 		"Agent Job",
 		fields=["server", "server_type"],
@@ -615,19 +717,84 @@ def poll_pending_jobs():
 		ignore_ifnull=True,
 	)
 
-	active_servers = filter_active_servers(servers)
-	alive_servers = filter_request_failures(active_servers)
+	states = get_server_states()
+	for server in servers:
+		if not is_pollable(get_server_state(server.server_type, server.server, states)):
+			continue
 
-	for server in alive_servers:
 		frappe.enqueue(
 			"press.press.doctype.agent_job.agent_job.poll_pending_jobs_server",
 			queue="short",
 			server=server,
+			skip_job_types=skip_job_types,
+			retry_only=retry_only,
 			job_id=f"poll_pending_jobs:{server.server}",
 			deduplicate=True,
 		)
 
 
+def queue_pushed_job_updates(server: str, job_ids: list[int]):
+	"""
+	Store ids of jobs agent reported as changed
+
+	Only ids are taken from agent, their state is polled from agent when the
+	updates are processed. Ids are coalesced, if a job changes multiple times
+	before the updates are processed it's only polled once
+	"""
+	job_ids = [cint(job_id) for job_id in job_ids if cint(job_id)]
+	if not job_ids:
+		return
+
+	frappe.cache.sadd(f"{AGENT_JOB_UPDATES_KEY}:{server}", *job_ids)
+	frappe.enqueue(
+		"press.press.doctype.agent_job.agent_job.process_pushed_job_updates",
+		queue="short",
+		server=server,
+		job_id=f"process_pushed_job_updates:{server}",
+		deduplicate=True,
+	)
+
+
+def drain_pushed_job_updates(server: str) -> list[int]:
+	key = frappe.cache.make_key(f"{AGENT_JOB_UPDATES_KEY}:{server}")
+	pipe = frappe.cache.pipeline()
+	pipe.smembers(key)
+	pipe.delete(key)
+	job_ids, _ = pipe.execute()
+	return [int(job_id) for job_id in job_ids]
+
+
+def process_pushed_job_updates(server: str):
+	# Updates pushed while this job is running won't enqueue another job
+	# so keep draining until there's nothing left
+	state = get_server_state("Server", server)
+	if not is_pollable(state):
+		return
+
+	agent = Agent(server, server_type="Server", server_state=state)
+	for _ in range(MAX_PUSHED_UPDATE_DRAINS):
+		job_ids = drain_pushed_job_updates(server)
+		if not job_ids:
+			break
+
+		pending_jobs = frappe.get_all(
+			"Agent Job",
+			fields=["name", "job_id", "status", "callback_failure_count", "job_type", "creation"],
+			filters={
+				"status": ("in", ["Pending", "Running"]),
+				"job_id": ("in", job_ids),
+				"server": server,
+			},
+			ignore_ifnull=True,
+		)
+		for batch in get_poll_batches(pending_jobs):
+			polled_jobs = poll_jobs(agent, [job.job_id for job in batch])
+			if not polled_jobs:
+				# Agent didn't respond, reconciliation polls pick these up
+				return
+			handle_polled_jobs(polled_jobs, batch)
+
+
 def fail_old_jobs():
 	def update_status(jobs: list[str], status: str):
 		for job in jobs:
@@ -727,30 +894,27 @@ def update_job(job_name, job):
 	)
 
 
-def update_steps(job_name, job):
-	step_names = [polled_step["name"] for polled_step in job["steps"]]
-	steps = frappe.db.get_all(
-		"Agent Job Step",
-		fields=["name", "status", "step_name"],
-		filters={
-			"agent_job": job_name,
-			"status": ("in", ["Pending", "Running"]),
-			"step_name": ("in", step_names),
-		},
-	)
+def update_steps(job_name, job, steps=None):
+	if steps is None:
+		steps = get_steps_of_jobs([job_name]).get(job_name, {})
+
+	step_updates = {}
 	for polled_step in job["steps"]:
-		step = find(steps, lambda x: x.step_name == polled_step["name"])
-		if not step:
+		step = steps.get(polled_step["name"])
+		if not step or step.status not in ("Pending", "Running"):
 			continue
 
 		if step.status == polled_step["status"]:
 			continue
 
+		step_updates[step.name] = get_step_update(polled_step)
+
+	if step_updates:
 		lock_doc_updated_by_job(job_name)
-		update_step(step.name, polled_step)
+		frappe.db.bulk_update("Agent Job Step", step_updates)
 
 
-def update_step(step_name, step):
+def get_step_update(step) -> dict:
 	step_data = json.dumps(step["data"], indent=4, sort_keys=True)
 
 	output = None
@@ -759,19 +923,15 @@ def update_step(step_name, step):
 		traceback = to_str(step["data"].get("traceback", ""))
 		output = to_str(step["data"].get("output", ""))
 
-	frappe.db.set_value(
-		"Agent Job Step",
-		step_name,
-		{
-			"start": step["start"],
-			"end": step["end"],
-			"duration": step["duration"],
-			"status": step["status"],
-			"data": step_data,
-			"output": output,
-			"traceback": traceback,
-		},
-	)
+	return {
+		"start": step["start"],
+		"end": step["end"],
+		"duration": step["duration"],
+		"status": step["status"],
+		"data": step_data,
+		"output": output,
+		"traceback": traceback,
+	}
 
 
 def skip_pending_steps(job_name):
@@ -792,18 +952,20 @@ def get_next_retry_at(job_retry_count):
 
 
 @timer
-def retry_undelivered_jobs(server):
+def retry_undelivered_jobs(server, agent=None):
 	"""Retry undelivered jobs and update job status if max retry count is reached"""
 
+	resume_delivery(server.server_type, server.server)
 	if is_auto_retry_disabled(server):
 		return
 
 	job_types, max_retry_per_job_type = get_retryable_job_types_and_max_retry_count()
 	server_jobs = get_undelivered_jobs_for_server(server, job_types)
+	queued_jobs = get_queued_jobs(server.server_type, server.server)
 	nowtime = now_datetime()
 
 	for server in server_jobs:
-		delivered_jobs = get_jobs_delivered_to_server(server, server_jobs[server])
+		delivered_jobs = get_jobs_delivered_to_server(server, server_jobs[server], agent)
 
 		if delivered_jobs:
 			update_job_ids_for_delivered_jobs(delivered_jobs)
@@ -814,7 +976,7 @@ def retry_undelivered_jobs(server):
 			job = AgentJob("Agent Job", job_name)
 			max_retry_count = max_retry_per_job_type[job.job_type] or 0
 
-			if not job.next_retry_at and job.name not in queued_jobs():
+			if not job.next_retry_at and job.name not in queued_jobs:
 				job.set_status_and_next_retry_at()
 				continue
 
@@ -830,12 +992,6 @@ def retry_undelivered_jobs(server):
 				process_job_updates(job_name)
 
 
-def queued_jobs():
-	from frappe.utils.background_jobs import get_jobs
-
-	return get_jobs(site=frappe.local.site, queue="default", key="name")[frappe.local.site]
-
-
 def is_auto_retry_disabled(server):
 	"""Check if auto retry is disabled for the server"""
 	_auto_retry_disabled = False
@@ -916,8 +1072,8 @@ def get_server_wise_undelivered_jobs(job_types):
 	return jobs
 
 
-def get_jobs_delivered_to_server(server, jobs):
-	agent = Agent(server[0], server_type=server[1])
+def get_jobs_delivered_to_server(server, jobs, agent=None):
+	agent = agent or Agent(server[0], server_type=server[1])
 
 	random_undelivered_ids = random.sample(jobs, k=min(100, len(jobs)))
 	delivered_jobs = agent.get_jobs_id(random_undelivered_ids)
@@ -940,213 +1096,27 @@ def update_job_ids_for_delivered_jobs(delivered_jobs):
 		)
 
 
-def process_job_updates(job_name: str, response_data: dict | None = None):  # noqa: C901
+def process_job_updates(job_name: str, response_data: dict | None = None):
 	job: "AgentJob" = frappe.get_doc("Agent Job", job_name)
 	start = now_datetime()
+	timings = {}
 
 	try:
 		from press.press.doctype.agent_job.agent_job_notifications import (
 			send_job_failure_notification,
 		)
-		from press.press.doctype.app_patch.app_patch import AppPatch
-		from press.press.doctype.bench.bench import (
-			Bench,
-			process_add_ssh_user_job_update,
-			process_archive_bench_job_update,
-			process_new_bench_job_update,
-			process_remove_ssh_user_job_update,
-		)
-		from press.press.doctype.code_server.code_server import (
-			process_archive_code_server_job_update,
-			process_new_code_server_job_update,
-			process_start_code_server_job_update,
-			process_stop_code_server_job_update,
-		)
-		from press.press.doctype.database_server.database_server import (
-			process_add_binlogs_to_indexer_agent_job_update,
-			process_remove_binlogs_from_indexer_agent_job_update,
-		)
-		from press.press.doctype.deploy_candidate_build.deploy_candidate_build import DeployCandidateBuild
-		from press.press.doctype.logical_replication_backup.logical_replication_backup import (
-			process_logical_replication_backup_activate_site_job_update,
-			process_logical_replication_backup_deactivate_site_job_update,
-			process_logical_replication_backup_update_database_host_job_update,
-		)
-		from press.press.doctype.mariadb_binlog.mariadb_binlog import (
-			process_upload_binlogs_to_s3_job_update,
-		)
-		from press.press.doctype.physical_backup_restoration.physical_backup_restoration import (
-			process_job_update as process_physical_backup_restoration_job_update,
-		)
-		from press.press.doctype.physical_backup_restoration.physical_backup_restoration import (
-			process_physical_backup_restoration_deactivate_site_job_update,
-		)
-		from press.press.doctype.proxy_server.proxy_server import (
-			process_update_nginx_job_update,
-		)
-		from press.press.doctype.server.server import process_new_server_job_update
-		from press.press.doctype.server_snapshot_recovery.server_snapshot_recovery import (
-			process_backup_database_from_snapshot_job_callback,
-			process_backup_files_from_snapshot_job_callback,
-			process_search_sites_in_snapshot_job_callback,
-		)
-		from press.press.doctype.site.erpnext_site import (
-			process_setup_erpnext_site_job_update,
-		)
-		from press.press.doctype.site.site import (
-			process_add_domain_job_update,
-			process_archive_site_job_update,
-			process_complete_setup_wizard_job_update,
-			process_create_user_job_update,
-			process_fetch_database_table_schema_job_update,
-			process_install_app_site_job_update,
-			process_migrate_site_job_update,
-			process_move_site_to_bench_job_update,
-			process_new_site_job_update,
-			process_reinstall_site_job_update,
-			process_rename_site_job_update,
-			process_restore_job_update,
-			process_restore_tables_job_update,
-			process_uninstall_app_site_job_update,
-		)
-		from press.press.doctype.site_backup.site_backup import process_backup_site_job_update
-		from press.press.doctype.site_backup.site_backup import (
-			process_deactivate_site_job_update as process_site_backup_deactivate_site_job_update,
-		)
-		from press.press.doctype.site_domain.site_domain import (
-			process_add_domain_to_upstream_job_update,
-			process_new_host_job_update,
-		)
-		from press.press.doctype.site_update.site_update import (
-			process_activate_site_job_update,
-			process_deactivate_site_job_update,
-			process_update_site_job_update,
-			process_update_site_recover_job_update,
-		)
 
-		site_migration = get_ongoing_migration(job.site)
-		if site_migration:
+		# Jobs of a site being migrated are handled by the migration, whatever their type
+		if job.site and (site_migration := get_ongoing_migration(job.site)):
 			process_site_migration_job_update(job, site_migration)
-		elif job.job_type == "Add Upstream to Proxy":
-			process_new_server_job_update(job)
-		elif job.job_type == "New Bench":
-			process_new_bench_job_update(job)
-		elif job.job_type == "Archive Bench":
-			process_archive_bench_job_update(job)
-		elif job.job_type == "New Site":
-			process_new_site_job_update(job)
-		elif job.job_type == "New Site from Backup":
-			process_new_site_job_update(job)
-			process_restore_job_update(job, force=True)
-		elif job.job_type == "Restore Site":
-			process_restore_job_update(job)
-		elif job.job_type == "Reinstall Site":
-			process_reinstall_site_job_update(job)
-		elif job.job_type == "Migrate Site":
-			process_migrate_site_job_update(job)
-		elif job.job_type == "Install App on Site":
-			process_install_app_site_job_update(job)
-		elif job.job_type == "Uninstall App from Site":
-			process_uninstall_app_site_job_update(job)
-		elif job.job_type == "Add Site to Upstream":
-			process_new_site_job_update(job)
-		elif job.job_type == "Add Code Server to Upstream" or job.job_type == "Setup Code Server":
-			process_new_code_server_job_update(job)
-		elif job.job_type == "Start Code Server":
-			process_start_code_server_job_update(job)
-		elif job.job_type == "Stop Code Server":
-			process_stop_code_server_job_update(job)
-		elif job.job_type == "Archive Code Server" or job.job_type == "Remove Code Server from Upstream":
-			process_archive_code_server_job_update(job)
-		elif job.job_type in ["Backup Site", "Physical Backup Database"]:
-			process_backup_site_job_update(job)
-		elif job.job_type == "Archive Site" or job.job_type == "Remove Site from Upstream":
-			process_archive_site_job_update(job)
-		elif job.job_type == "Add Host to Proxy":
-			process_new_host_job_update(job)
-		elif job.job_type == "Add Domain to Upstream":
-			process_add_domain_to_upstream_job_update(job)
-		elif job.job_type == "Update Site Migrate" or job.job_type == "Update Site Pull":
-			process_update_site_job_update(job)
-		elif (
-			job.job_type == "Recover Failed Site Migrate"
-			or job.job_type == "Recover Failed Site Pull"
-			or job.job_type == "Recover Failed Site Update"
-		):
-			process_update_site_recover_job_update(job)
-		elif job.job_type == "Rename Site" or job.job_type == "Rename Site on Upstream":
-			process_rename_site_job_update(job)
-		elif job.job_type == "Setup ERPNext":
-			process_setup_erpnext_site_job_update(job)
-		elif job.job_type == "Restore Site Tables":
-			process_restore_tables_job_update(job)
-		elif job.job_type == "Add User to Proxy":
-			process_add_ssh_user_job_update(job)
-		elif job.job_type == "Remove User from Proxy":
-			process_remove_ssh_user_job_update(job)
-		elif job.job_type == "Add User to ProxySQL" or job.job_type == "Remove User from ProxySQL":
-			if job.reference_doctype == "Site Database User":
-				SiteDatabaseUser.process_job_update(job)
-		elif job.job_type == "Reload NGINX":
-			process_update_nginx_job_update(job)
-		elif job.job_type == "Move Site to Bench":
-			process_move_site_to_bench_job_update(job)
-		elif job.job_type == "Patch App":
-			AppPatch.process_patch_app(job)
-		elif job.job_type == "Run Remote Builder":
-			DeployCandidateBuild.process_run_build(job, response_data)
-		elif job.job_type == "Create User":
-			process_create_user_job_update(job)
-		elif job.job_type == "Complete Setup Wizard":
-			process_complete_setup_wizard_job_update(job)
-		elif job.job_type == "Update Bench In Place":
-			Bench.process_update_inplace(job)
-		elif job.job_type == "Recover Update In Place":
-			Bench.process_recover_update_inplace(job)
-		elif job.job_type == "Fetch Database Table Schema":
-			process_fetch_database_table_schema_job_update(job)
-		elif job.job_type in [
-			"Create Database User",
-			"Remove Database User",
-			"Modify Database User Permissions",
-		]:
-			SiteDatabaseUser.process_job_update(job)
-		elif job.job_type == "Physical Restore Database":
-			process_physical_backup_restoration_job_update(job)
-		elif job.job_type == "Deactivate Site" and job.reference_doctype == "Site Update":
-			process_deactivate_site_job_update(job)
-		elif job.job_type == "Activate Site" and job.reference_doctype == "Site Update":
-			process_activate_site_job_update(job)
-		elif job.job_type == "Activate Site" and job.reference_doctype == "Logical Replication Backup":
-			process_logical_replication_backup_activate_site_job_update(job)
-		elif job.job_type == "Deactivate Site" and job.reference_doctype == "Site Backup":
-			process_site_backup_deactivate_site_job_update(job)
-		elif job.job_type == "Deactivate Site" and job.reference_doctype == "Physical Backup Restoration":
-			process_physical_backup_restoration_deactivate_site_job_update(job)
-		elif job.job_type == "Deactivate Site" and job.reference_doctype == "Logical Replication Backup":
-			process_logical_replication_backup_deactivate_site_job_update(job)
-		elif job.job_type == "Update Database Host" and job.reference_doctype == "Logical Replication Backup":
-			process_logical_replication_backup_update_database_host_job_update(job)
-		elif job.job_type == "Add Domain":
-			process_add_domain_job_update(job)
-		elif job.job_type == "Add Binlogs To Indexer":
-			process_add_binlogs_to_indexer_agent_job_update(job)
-		elif job.job_type == "Remove Binlogs From Indexer":
-			process_remove_binlogs_from_indexer_agent_job_update(job)
-		elif job.job_type == "Upload Binlogs To S3":
-			process_upload_binlogs_to_s3_job_update(job)
-		elif job.job_type == "Search Sites In Snapshot":
-			process_search_sites_in_snapshot_job_callback(job)
-		elif job.job_type == "Backup Database From Snapshot":
-			process_backup_database_from_snapshot_job_callback(job)
-		elif job.job_type == "Backup Files From Snapshot":
-			process_backup_files_from_snapshot_job_callback(job)
+		else:
+			run_callbacks(job, response_data, timings)
 
 		# send failure notification if job failed
 		if job.status == "Failure":
 			send_job_failure_notification(job)
 
-		log_update(job, start)
+		log_update(job, start, timings=timings)
 	except Exception as e:
 		failure_count = job.callback_failure_count + 1
 		if failure_count in set([10, 100]) or failure_count % 1000 == 0:
@@ -1156,11 +1126,11 @@ def process_job_updates(job_name: str, response_data: dict | None = None):  # no
 				reference_doctype="Agent Job",
 				reference_name=job_name,
 			)
-		log_update(job, start, e)
+		log_update(job, start, e, timings)
 		raise AgentCallbackException from e
 
 
-def log_update(job, start, exception=None):
+def log_update(job, start, exception=None, timings: dict[str, float] | None = None):
 	try:
 		data = {
 			"timestamp": start,
@@ -1172,10 +1142,11 @@ def log_update(job, start, exception=None):
 			"site": job.site,
 			"bench": job.bench,
 		}
+		if timings:
+			data["callbacks"] = timings
 		if exception:
 			data["exception"] = exception
-		serialized = json.dumps(data, sort_keys=True, default=str, separators=(",", ":"))
-		frappe.cache().rpush(AGENT_LOG_KEY, serialized)
+		AGENT_JOB_LOG.push(data)
 	except Exception:
 		traceback.print_exc()
 
@@ -1216,6 +1187,7 @@ def update_job_step_status():
 
 def on_doctype_update():
 	frappe.db.add_index("Agent Job", ["status", "server"])
+	frappe.db.add_index("Agent Job", ["dedup_key", "status"])
 	frappe.db.add_index("Agent Job", ["reference_doctype", "reference_name"])
 	# We don't need modified index, it's harmful on constantly updating tables
 	frappe.db.sql_ddl("drop index if exists modified on `tabAgent Job`")
@@ -1238,20 +1210,7 @@ def to_str(data) -> str:
 
 
 def flush():
-	log_file = os.path.join(frappe.utils.get_bench_path(), "logs", f"{AGENT_LOG_KEY}.json.log")
-	try:
-		# Fetch all entries without removing from cache
-		logs = frappe.cache().lrange(AGENT_LOG_KEY, 0, -1)
-		print("LOGS", logs)
-		if logs:
-			logs = list(map(frappe.safe_decode, logs))
-			with open(log_file, "a", os.O_NONBLOCK) as f:
-				f.write("\n".join(logs))
-				f.write("\n")
-			# Remove fetched entries from cache
-			frappe.cache().ltrim(AGENT_LOG_KEY, len(logs) - 1, -1)
-	except Exception:
-		traceback.print_exc()
+	AGENT_JOB_LOG.flush()
 
 
 def update_query_result_status_timestamps(results):
@@ -0,0 +1,94 @@
+# Copyright (c) 2026, Frappe and contributors
+# For license information, please see license.txt
+"""
+Dispatch of Agent Job updates to the callbacks declared in agent_job_callbacks
+hooks.
+
+Hooks map a job type to handler paths, or to a mapping of reference doctype to
+handler paths for job types handled differently per reference. Paths point to
+functions or to static methods of classes. Each job type and reference
+doctype pair is resolved once per process, importing only the modules of its
+handlers, and later updates reuse the resolved handlers.
+"""
+
+from __future__ import annotations
+
+import importlib
+import inspect
+import threading
+import time
+import typing
+from dataclasses import dataclass
+
+import frappe
+
+if typing.TYPE_CHECKING:
+	from collections.abc import Callable
+
+	from press.press.doctype.agent_job.agent_job import AgentJob
+
+AGENT_JOB_CALLBACKS_HOOK = "agent_job_callbacks"
+
+# Process wide, keyed by (job_type, reference_doctype)
+_callbacks: dict[tuple[str, str | None], list[Callback]] = {}
+_callbacks_lock = threading.Lock()
+
+
+@dataclass
+class Callback:
+	path: str
+	function: Callable
+	takes_response_data: bool
+
+	def __call__(self, job: AgentJob, response_data: dict | None):
+		if self.takes_response_data:
+			return self.function(job, response_data)
+		return self.function(job)
+
+
+def resolve(path: str) -> Callable:
+	"""Imports the function or class attribute at path"""
+	parts = path.split(".")
+	for index in range(len(parts) - 1, 0, -1):
+		module = ".".join(parts[:index])
+		try:
+			attribute = importlib.import_module(module)
+		except ModuleNotFoundError as e:
+			if e.name != module:
+				raise
+			continue
+		for name in parts[index:]:
+			attribute = getattr(attribute, name)
+		return attribute
+	raise ImportError(f"Cannot resolve Agent Job callback {path}")
+
+
+def get_callback_paths(job_type: str, reference_doctype: str | None) -> list[str]:
+	paths = frappe.get_hooks(AGENT_JOB_CALLBACKS_HOOK).get(job_type, [])
+	if isinstance(paths, dict):
+		return paths.get(reference_doctype, [])
+	return paths
+
+
+def get_callbacks(job_type: str, reference_doctype: str | None) -> list[Callback]:
+	key = (job_type, reference_doctype)
+	if (callbacks := _callbacks.get(key)) is not None:
+		return callbacks
+
+	callbacks = []
+	for path in get_callback_paths(job_type, reference_doctype):
+		function = resolve(path)
+		callbacks.append(Callback(path, function, "response_data" in inspect.signature(function).parameters))
+	with _callbacks_lock:
+		_callbacks[key] = callbacks
+	return callbacks
+
+
+def run_callbacks(job: AgentJob, response_data: dict | None, timings: dict[str, float]):
+	"""Calls the callbacks of job, recording time spent in each in timings"""
+	for callback in get_callbacks(job.job_type, job.reference_doctype):
+		start = time.perf_counter()
+		try:
+			callback(job, response_data)
+		finally:
+			timings[callback.path] = time.perf_counter() - start
@@ -0,0 +1,122 @@
+# Copyright (c) 2026, Frappe and contributors
+# For license information, please see license.txt
+"""
+Batched delivery of Agent Jobs.
+
+New jobs are added to a Redis set per server instead of getting an RQ job
+each. A single delivery worker per server drains the set in batches of
+DELIVERY_BATCH_SIZE, sending every job of a batch over the server's keep-alive
+agent session and recording the returned job ids in one bulk update.
+
+At most one worker runs per server, guarded by a lock key. Producers add to
+the set and then try to take the lock, enqueueing a worker if they get it. A
+worker releases the lock once the set is empty and checks the set again, so a
+job added while it was finishing is never left behind.
+
+Failed deliveries go through AgentJob.set_status_and_next_retry_at as before
+and are retried by retry_undelivered_jobs.
+"""
+
+from __future__ import annotations
+
+import typing
+from functools import partial
+
+import frappe
+
+from press.agent import Agent
+from press.utils import chunk, log_error
+
+if typing.TYPE_CHECKING:
+	from press.press.doctype.agent_job.agent_job import AgentJob
+
+DELIVERY_QUEUE_KEY = "agent_job_delivery_queue"
+DELIVERY_LOCK_KEY = "agent_job_delivery_lock"
+DELIVERY_BATCH_SIZE = 20
+DELIVERY_TIMEOUT = 30 * 60  # seconds, also the lifetime of a lock left behind by a dead worker
+
+
+def get_queue_key(server_type: str, server: str) -> str:
+	return f"{DELIVERY_QUEUE_KEY}:{server_type}:{server}"
+
+
+def get_lock_key(server_type: str, server: str) -> str:
+	return f"{DELIVERY_LOCK_KEY}:{server_type}:{server}"
+
+
+def acquire_lock(server_type: str, server: str) -> bool:
+	key = frappe.cache.make_key(get_lock_key(server_type, server))
+	return bool(frappe.cache.set(key, 1, nx=True, ex=DELIVERY_TIMEOUT))
+
+
+def queue_delivery(job: AgentJob):
+	"""Queues job for delivery once the current transaction commits"""
+	frappe.db.after_commit.add(partial(_queue_delivery, job.server_type, job.server, job.name))
+
+
+def _queue_delivery(server_type: str, server: str, job: str):
+	frappe.cache.sadd(get_queue_key(server_type, server), job)
+	start_worker(server_type, server)
+
+
+def start_worker(server_type: str, server: str):
+	if acquire_lock(server_type, server):
+		frappe.enqueue(
+			"press.press.doctype.agent_job.delivery.deliver",
+			queue="short",
+			timeout=DELIVERY_TIMEOUT,
+			server_type=server_type,
+			server=server,
+		)
+
+
+def get_queued_jobs(server_type: str, server: str) -> set[str]:
+	"""Returns jobs of server waiting for delivery"""
+	return {name.decode() for name in frappe.cache.smembers(get_queue_key(server_type, server))}
+
+
+def resume_delivery(server_type: str, server: str):
+	"""Starts a worker for jobs left queued by a worker that died"""
+	if frappe.cache.exists(get_queue_key(server_type, server)):
+		start_worker(server_type, server)
+
+
+def deliver(server_type: str, server: str):
+	"""Delivers queued jobs of server until there are none left, must hold the server's lock"""
+	queue_key = get_queue_key(server_type, server)
+	lock_key = get_lock_key(server_type, server)
+	agent = Agent(server, server_type=server_type)
+	while True:
+		while names := list(get_queued_jobs(server_type, server)):
+			# Agent runs jobs in the order it receives them
+			jobs = frappe.get_all(
+				"Agent Job", {"name": ("in", names), "job_id": 0}, pluck="name", order_by="creation asc"
+			)
+			if delivered := set(names) - set(jobs):
+				frappe.cache.srem(queue_key, *delivered)
+			for batch in chunk(jobs, DELIVERY_BATCH_SIZE):
+				# Taken off before delivery, jobs queued again meanwhile (e.g. by retry_in_place) stay queued
+				frappe.cache.srem(queue_key, *batch)
+				try:
+					deliver_batch(agent, batch)
+				except Exception:
+					frappe.db.rollback()
+					log_error("Agent Job Delivery Error", server=server, jobs=batch)
+				frappe.cache.expire(frappe.cache.make_key(lock_key), DELIVERY_TIMEOUT)
+
+		frappe.cache.delete_value(lock_key)
+		# Jobs queued after the last batch found the lock taken, pick them up unless another worker did
+		if not frappe.cache.exists(queue_key) or not acquire_lock(server_type, server):
+			return
+
+
+def deliver_batch(agent: Agent, names: list[str]):
+	delivered = {}
+	for name in names:
+		job: AgentJob = frappe.get_doc("Agent Job", name)
+		if job_id := job.deliver(agent):
+			delivered[name] = {"job_id": job_id, "status": "Pending"}
+
+	if delivered:
+		frappe.db.bulk_update("Agent Job", delivered)
+	frappe.db.commit()
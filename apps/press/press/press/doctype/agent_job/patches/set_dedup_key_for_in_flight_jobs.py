@@ -0,0 +1,43 @@
+import frappe
+
+from press.agent import IN_FLIGHT_AGENT_JOB_STATUSES, get_dedup_key
+
+
+def execute():
+	jobs = frappe.get_all(
+		"Agent Job",
+		{"status": ("in", IN_FLIGHT_AGENT_JOB_STATUSES), "dedup_key": ("is", "not set")},
+		[
+			"name",
+			"server_type",
+			"server",
+			"job_type",
+			"request_method",
+			"request_path",
+			"bench",
+			"site",
+			"code_server",
+			"upstream",
+			"host",
+		],
+	)
+	frappe.db.bulk_update(
+		"Agent Job",
+		{
+			job.name: {
+				"dedup_key": get_dedup_key(
+					job.server_type,
+					job.server,
+					job.job_type,
+					job.request_method,
+					job.request_path,
+					job.bench,
+					job.site,
+					job.code_server,
+					job.upstream,
+					job.host,
+				)
+			}
+			for job in jobs
+		},
+	)
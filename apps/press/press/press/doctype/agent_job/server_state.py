@@ -0,0 +1,103 @@
+# Copyright (c) 2026, Frappe and contributors
+# For license information, please see license.txt
+"""
+Snapshot of the state of servers that agent jobs are polled from.
+
+Poll cycles read status, halt flag and request failure count of every server
+from a single Redis hash instead of querying each server doctype. Entries are
+refreshed from doc hooks after commit, and the whole snapshot is rebuilt from
+the database every SERVER_STATE_TTL seconds to pick up changes made without
+hooks (e.g. frappe.db.set_value).
+"""
+
+from __future__ import annotations
+
+from functools import partial
+
+import frappe
+
+SERVER_STATE_KEY = "agent_server_state"
+SERVER_STATE_BUILT_KEY = "agent_server_state_built"
+SERVER_STATE_TTL = 60
+
+SERVER_DOCTYPES = ("Server", "Database Server", "Proxy Server")
+HALTABLE_SERVER_DOCTYPES = ("Server", "Database Server", "Proxy Server")
+
+
+def get_server_states() -> dict[str, frappe._dict]:
+	if not frappe.cache.exists(SERVER_STATE_BUILT_KEY):
+		rebuild_server_states()
+	# hgetall returns field names as bytes
+	return {frappe.safe_decode(k): v for k, v in frappe.cache.hgetall(SERVER_STATE_KEY).items()}
+
+
+def get_server_state(server_type: str, server: str, states: dict | None = None) -> frappe._dict | None:
+	state = states.get(server) if states is not None else frappe.cache.hget(SERVER_STATE_KEY, server)
+	if state is None:
+		# Archived servers and doctypes outside SERVER_DOCTYPES are fetched on demand
+		state = fetch_server_state(server_type, server)
+		if state:
+			frappe.cache.hset(SERVER_STATE_KEY, server, state)
+	return state
+
+
+def is_pollable(state: frappe._dict | None) -> bool:
+	return bool(state and state.status == "Active" and not state.halt_agent_jobs and not state.failure_count)
+
+
+def rebuild_server_states():
+	failures = dict(frappe.get_all("Agent Request Failure", fields=["server", "failure_count"], as_list=True))
+
+	states = {}
+	for server_type in SERVER_DOCTYPES:
+		fields = ["name", "status"]
+		if server_type in HALTABLE_SERVER_DOCTYPES:
+			fields.append("halt_agent_jobs")
+		for server in frappe.get_all(server_type, fields=fields, filters={"status": ("!=", "Archived")}):
+			states[server.name] = frappe._dict(
+				server_type=server_type,
+				status=server.status,
+				halt_agent_jobs=server.get("halt_agent_jobs", 0),
+				failure_count=failures.get(server.name, 0),
+			)
+
+	for server, state in states.items():
+		frappe.cache.hset(SERVER_STATE_KEY, server, state)
+	frappe.cache.set_value(SERVER_STATE_BUILT_KEY, True, expires_in_sec=SERVER_STATE_TTL)
+
+
+def fetch_server_state(server_type: str, server: str) -> frappe._dict | None:
+	fields = ["status"]
+	if server_type in HALTABLE_SERVER_DOCTYPES:
+		fields.append("halt_agent_jobs")
+
+	values = frappe.db.get_value(server_type, server, fields, as_dict=True)
+	if not values:
+		return None
+
+	return frappe._dict(
+		server_type=server_type,
+		status=values.status,
+		halt_agent_jobs=values.get("halt_agent_jobs", 0),
+		failure_count=frappe.db.get_value("Agent Request Failure", {"server": server}, "failure_count") or 0,
+	)
+
+
+def refresh_server_state(server_type: str, server: str):
+	"""Refresh the snapshot entry of a server once the current transaction is committed"""
+	frappe.db.after_commit.add(partial(_refresh_server_state, server_type, server))
+
+
+def _refresh_server_state(server_type: str, server: str):
+	if state := fetch_server_state(server_type, server):
+		frappe.cache.hset(SERVER_STATE_KEY, server, state)
+	else:
+		frappe.cache.hdel(SERVER_STATE_KEY, server)
+
+
+def on_server_change(doc, method=None):
+	refresh_server_state(doc.doctype, doc.name)
+
+
+def on_request_failure_change(doc, method=None):
+	refresh_server_state(doc.server_type, doc.server)
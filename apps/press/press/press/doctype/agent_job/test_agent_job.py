@@ -14,7 +14,24 @@ from frappe.model.naming import make_autoname
 from frappe.tests.utils import FrappeTestCase
 
 from press.agent import Agent
-from press.press.doctype.agent_job.agent_job import AgentJob, lock_doc_updated_by_job
+from press.api.callbacks import job_updates
+from press.press.doctype.agent_job.agent_job import (
+	POLL_BATCH_SIZE,
+	AgentJob,
+	get_job_types_to_skip_polling,
+	get_poll_batches,
+	get_steps_of_jobs,
+	lock_doc_updated_by_job,
+	poll_pending_jobs,
+	process_pushed_job_updates,
+	queue_pushed_job_updates,
+	retry_undelivered_jobs,
+	update_steps,
+)
+from press.press.doctype.agent_job.callbacks import get_callbacks
+from press.press.doctype.agent_job.delivery import deliver, deliver_batch, get_queue_key
+from press.press.doctype.agent_job.server_state import get_server_state, is_pollable
+from press.press.doctype.server.test_server import create_test_server
 from press.press.doctype.site.test_site import create_test_site
 from press.press.doctype.team.test_team import create_test_press_admin_team
 from press.utils.test import foreground_enqueue, foreground_enqueue_doc
@@ -31,8 +48,9 @@ def fn_appender(before_insert: Callable, prepare_agent_responses: Callable):
 	return new_before_insert
 
 
-def before_insert(self):
-	return None
+# Faked requests are prepared after the original before_insert, fake_agent_job patches it
+original_before_insert = AgentJob.before_insert
+before_insert = original_before_insert
 
 
 def fake_agent_job_req(  # noqa: C901
@@ -169,6 +187,11 @@ def fake_agent_job_req(  # noqa: C901
 	return before_insert
 
 
+def foreground_queue_delivery(job: AgentJob):
+	"""Delivers job right away, use for monkey patching queue_delivery in tests"""
+	frappe.get_doc(job.doctype, job.name).create_http_request()
+
+
 @contextmanager
 def fake_agent_job(
 	job_type: str,
@@ -188,6 +211,10 @@ def fake_agent_job(
 			fake_agent_job_req(job_type, status, data, steps),
 			create=True,
 		),
+		patch(
+			"press.press.doctype.agent_job.agent_job.queue_delivery",
+			new=foreground_queue_delivery,
+		),
 		patch(
 			"press.press.doctype.agent_job.agent_job.frappe.enqueue_doc",
 			new=foreground_enqueue_doc,
@@ -202,7 +229,30 @@ def fake_agent_job(
 		frappe.local.role_permissions = {}  # due to bug in FF related to only_if_creator docperm
 		yield
 		global before_insert
-		before_insert = lambda self: None  # noqa
+		before_insert = original_before_insert
+
+
+class FakeAgent:
+	"""Reports job state changes to press the way agent does, serves the states when polled"""
+
+	def __init__(self, server: str):
+		self.server = server
+		self.jobs = {}
+
+	def push(self, job_id: int, status: str):
+		self.jobs[job_id] = {
+			"id": job_id,
+			"status": status,
+			"start": "2023-08-20 18:24:28.009786",
+			"end": "2023-08-20 18:24:41.506067" if status in ("Success", "Failure") else None,
+			"duration": "00:00:13.496281" if status in ("Success", "Failure") else None,
+			"data": {},
+			"steps": [],
+		}
+		queue_pushed_job_updates(self.server, [job_id])
+
+	def get_jobs_status(self, agent, ids):
+		return [self.jobs[job_id] for job_id in ids if job_id in self.jobs]
 
 
 @patch.object(AgentJob, "enqueue_http_request", new=Mock())
@@ -285,3 +335,238 @@ class TestAgentJob(FrappeTestCase):
 		self.assertEqual(in_execution_job.name, job.name)
 
 		frappe.db.set_single_value("Press Settings", "disable_agent_job_deduplication", True)
+
+	def test_similar_in_execution_job_treats_missing_bench_as_a_value(self):
+		site = create_test_site()
+		agent = Agent(site.server)
+		path = f"benches/{site.bench}/sites/{site.name}/dedup"
+		with_bench = agent.create_agent_job(
+			"Update Site Configuration", path, bench=site.bench, site=site.name
+		)
+		without_bench = agent.create_agent_job("Update Site Configuration", f"{path}/site", site=site.name)
+
+		# A lookup without bench no longer matches a job with one, nor the other way around
+		self.assertFalse(
+			agent.get_similar_in_execution_job("Update Site Configuration", path, site=site.name)
+		)
+		self.assertFalse(
+			agent.get_similar_in_execution_job(
+				"Update Site Configuration", f"{path}/site", bench=site.bench, site=site.name
+			)
+		)
+
+		self.assertEqual(
+			agent.get_similar_in_execution_job(
+				"Update Site Configuration", path, bench=site.bench, site=site.name
+			).name,
+			with_bench.name,
+		)
+		self.assertEqual(
+			agent.get_similar_in_execution_job(
+				"Update Site Configuration", f"{path}/site", site=site.name
+			).name,
+			without_bench.name,
+		)
+
+	def test_finished_job_is_not_similar_in_execution_job(self):
+		site = create_test_site()
+		site.update_site_config({"maintenance_mode": "1"})
+		job = frappe.get_last_doc("Agent Job", {"job_type": "Update Site Configuration"})
+		job.db_set("status", "Success")
+
+		agent = Agent(site.server)
+		self.assertFalse(
+			agent.get_similar_in_execution_job(
+				job_type="Update Site Configuration",
+				path=f"benches/{site.bench}/sites/{site.name}/config",
+				bench=site.bench,
+				site=site.name,
+			)
+		)
+		self.assertFalse(
+			agent.get_similar_in_execution_job(
+				job_type="Update Site Configuration",
+				path=f"benches/{site.bench}/sites/{site.name}/config",
+				site=site.name,
+			)
+		)
+
+	def test_poll_batches_cover_every_pending_job(self):
+		now = frappe.utils.now_datetime()
+		pending_jobs = [
+			frappe._dict(job_id=i, job_type="Update Site Configuration", creation=now)
+			for i in range(1, 2 * POLL_BATCH_SIZE + 11)
+		]
+		pending_jobs.append(
+			frappe._dict(job_id=0, job_type="Backup Site", creation=frappe.utils.add_to_date(now, minutes=-1))
+		)
+
+		batches = get_poll_batches(pending_jobs)
+
+		self.assertEqual(len(batches), 3)
+		self.assertTrue(all(len(batch) <= POLL_BATCH_SIZE for batch in batches))
+		polled_ids = [job.job_id for batch in batches for job in batch]
+		self.assertCountEqual(polled_ids, [job.job_id for job in pending_jobs])
+		# Backup started a minute ago but is expected to take much longer
+		self.assertEqual(polled_ids[-1], 0)
+
+	def test_backup_jobs_are_polled_once_every_few_cycles(self):
+		cycles = [get_job_types_to_skip_polling(cycle) for cycle in range(1, 21)]
+		self.assertEqual(sum("Backup Site" not in skip for skip in cycles), 2)
+
+	@patch("press.press.doctype.agent_job.agent_job.frappe.db.commit", new=Mock())
+	@patch("press.press.doctype.agent_job.agent_job.frappe.enqueue", new=Mock())
+	@patch("press.press.doctype.agent_job.agent_job.publish_update", new=Mock())
+	@patch("press.press.doctype.agent_job.agent_job.process_job_updates")
+	def test_pushed_updates_are_coalesced_per_job(self, process_job_updates):
+		create_test_site()
+		job = frappe.get_last_doc("Agent Job", {"job_type": "New Site"})
+		job.db_set({"job_id": 1001, "status": "Pending"})
+
+		agent = FakeAgent(job.server)
+		agent.push(1001, "Running")
+		agent.push(1001, "Success")
+
+		with patch(
+			"press.press.doctype.agent_job.agent_job.poll_jobs", side_effect=agent.get_jobs_status
+		) as poll_jobs:
+			process_pushed_job_updates(job.server)
+
+			poll_jobs.assert_called_once()
+			self.assertEqual(poll_jobs.call_args.args[1], [1001])
+			self.assertEqual(frappe.db.get_value("Agent Job", job.name, "status"), "Success")
+			process_job_updates.assert_called_once()
+
+			# Nothing left to process
+			process_pushed_job_updates(job.server)
+			poll_jobs.assert_called_once()
+
+	def test_job_updates_are_rejected_when_push_updates_are_disabled(self):
+		frappe.db.set_single_value("Press Settings", "use_agent_job_push_updates", 0)
+		with patch("press.press.doctype.agent_job.agent_job.frappe.enqueue") as enqueue:
+			self.assertRaises(frappe.ValidationError, job_updates, [1001])
+		enqueue.assert_not_called()
+
+	def test_update_steps_only_writes_changed_steps(self):
+		create_test_site()
+		job = frappe.get_last_doc("Agent Job", {"job_type": "New Site"})
+		steps = get_steps_of_jobs([job.name])[job.name]
+		first, second, *rest = steps
+
+		polled_step = {"data": {}, "start": None, "end": None, "duration": None}
+		polled_job = {
+			"steps": [
+				{**polled_step, "name": first, "status": "Success"},
+				{**polled_step, "name": second, "status": "Running"},
+				*({**polled_step, "name": step, "status": "Pending"} for step in rest),
+			]
+		}
+
+		with patch.object(frappe.db, "bulk_update", wraps=frappe.db.bulk_update) as bulk_update:
+			update_steps(job.name, polled_job, steps)
+
+		bulk_update.assert_called_once()
+		self.assertEqual(set(bulk_update.call_args.args[1]), {steps[first].name, steps[second].name})
+		steps = get_steps_of_jobs([job.name])[job.name]
+		self.assertEqual(steps[first].status, "Success")
+		self.assertEqual(steps[second].status, "Running")
+
+	@patch("press.press.doctype.agent_job.delivery.frappe.db.commit", new=Mock())
+	def test_delivery_records_job_ids_of_a_batch_at_once(self):
+		site = create_test_site()
+		jobs = frappe.get_all("Agent Job", {"server": site.server, "job_id": 0}, pluck="name")
+		job_ids = iter(range(1001, 1001 + len(jobs)))
+
+		with (
+			patch.object(Agent, "request", side_effect=lambda *args, **kwargs: {"job": next(job_ids)}),
+			patch.object(frappe.db, "bulk_update", wraps=frappe.db.bulk_update) as bulk_update,
+		):
+			deliver_batch(Agent(site.server), jobs)
+
+		bulk_update.assert_called_once()
+		delivered = frappe.get_all("Agent Job", {"name": ("in", jobs)}, ["status", "job_id"])
+		self.assertTrue(all(job.status == "Pending" for job in delivered))
+		self.assertCountEqual([job.job_id for job in delivered], range(1001, 1001 + len(jobs)))
+
+	def test_job_queued_again_during_delivery_is_delivered_again(self):
+		site = create_test_site()
+		job = frappe.get_last_doc("Agent Job", {"server": site.server})
+		job.db_set("job_id", 0)
+		queue_key = get_queue_key(job.server_type, job.server)
+		frappe.cache.sadd(queue_key, job.name)
+		delivered = []
+
+		def fake_deliver_batch(agent, names):
+			delivered.extend(names)
+			if len(delivered) == 1:
+				# Like retry_in_place after a failed delivery
+				frappe.cache.sadd(queue_key, job.name)
+
+		with patch("press.press.doctype.agent_job.delivery.deliver_batch", side_effect=fake_deliver_batch):
+			deliver(job.server_type, job.server)
+
+		self.assertEqual(delivered, [job.name, job.name])
+		self.assertFalse(frappe.cache.exists(queue_key))
+
+	@patch("press.press.doctype.agent_job.agent_job.frappe.db.commit", new=Mock())
+	@patch("press.press.doctype.agent_job.agent_job.get_jobs_delivered_to_server", new=Mock(return_value=[]))
+	def test_retry_skips_jobs_queued_for_delivery(self):
+		site = create_test_site()
+		job = frappe.get_last_doc("Agent Job", {"job_type": "Update Site Configuration"})
+		frappe.db.set_value("Agent Job Type", job.job_type, "max_retry_count", 3)
+		job.db_set({"status": "Undelivered", "job_id": 0, "retry_count": 1, "next_retry_at": None})
+		server = frappe._dict(server=site.server, server_type="Server")
+
+		with patch("press.press.doctype.agent_job.agent_job.get_queued_jobs", return_value={job.name}):
+			retry_undelivered_jobs(server)
+		self.assertIsNone(frappe.db.get_value("Agent Job", job.name, "next_retry_at"))
+
+		with patch("press.press.doctype.agent_job.agent_job.get_queued_jobs", return_value=set()):
+			retry_undelivered_jobs(server)
+		self.assertIsNotNone(frappe.db.get_value("Agent Job", job.name, "next_retry_at"))
+
+	def test_every_agent_job_callback_resolves(self):
+		for job_type, callbacks in frappe.get_hooks("agent_job_callbacks").items():
+			for reference_doctype in callbacks if isinstance(callbacks, dict) else [None]:
+				self.assertTrue(get_callbacks(job_type, reference_doctype), job_type)
+
+		self.assertFalse(get_callbacks("Deactivate Site", "Site"))
+		self.assertEqual(len(get_callbacks("New Site from Backup", None)), 2)
+		self.assertTrue(get_callbacks("Run Remote Builder", None)[0].takes_response_data)
+
+	def test_server_state_tracks_halt_and_request_failures(self):
+		server = create_test_server()
+		self.assertTrue(is_pollable(get_server_state("Server", server.name)))
+
+		server.db_set("halt_agent_jobs", True)
+		frappe.db.after_commit.run()
+		self.assertFalse(is_pollable(get_server_state("Server", server.name)))
+
+		server.db_set("halt_agent_jobs", False)
+		frappe.new_doc(
+			"Agent Request Failure",
+			server_type="Server",
+			server=server.name,
+			traceback="Traceback",
+			error="Error",
+			failure_count=1,
+		).insert(ignore_permissions=True)
+		frappe.db.after_commit.run()
+
+		state = get_server_state("Server", server.name)
+		self.assertEqual(state.failure_count, 1)
+		self.assertTrue(Agent(server.name, server_state=state).should_skip_requests())
+
+	@patch("press.press.doctype.agent_job.agent_job.frappe.enqueue")
+	def test_poll_reads_server_states_without_per_server_queries(self, enqueue):
+		servers = [create_test_server().name for _ in range(3)]
+		for server in servers:
+			Agent(server).create_agent_job("Update Site Configuration", "ping")
+
+		poll_pending_jobs()  # builds the server state snapshot
+		enqueue.reset_mock()
+		with self.assertQueryCount(1):  # servers with jobs to poll
+			poll_pending_jobs()
+
+		polled = {call.kwargs["server"].server for call in enqueue.call_args_list}
+		self.assertTrue(set(servers) <= polled)
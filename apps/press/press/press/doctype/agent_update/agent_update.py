@@ -13,6 +13,7 @@ import requests
 from frappe.model.document import Document
 
 from press.agent import Agent
+from press.press.doctype.agent_job.server_state import refresh_server_state
 from press.runner import Ansible
 
 
@@ -541,6 +542,7 @@ class AgentUpdate(Document):
 			True,
 			update_modified=False,
 		)
+		refresh_server_state(agent_update_server.server_type, agent_update_server.server)
 
 	def _resume_agent_jobs(self, agent_update_server: AgentUpdateServer):
 		frappe.db.set_value(
@@ -550,6 +552,7 @@ class AgentUpdate(Document):
 			False,
 			update_modified=False,
 		)
+		refresh_server_state(agent_update_server.server_type, agent_update_server.server)
 
 	def _update_agent_on_server(self):
 		current_agent_update_to_process = self.current_agent_update_to_process
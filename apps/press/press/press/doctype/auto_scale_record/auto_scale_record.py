@@ -14,6 +14,7 @@ from requests.exceptions import ConnectionError, HTTPError, JSONDecodeError
 
 from press.agent import Agent
 from press.api.client import dashboard_whitelist
+from press.press.doctype.agent_job.server_state import refresh_server_state
 from press.press.doctype.communication_info.communication_info import get_communication_info
 from press.runner import Ansible, Status, StepHandler
 from press.utils import log_error
@@ -342,6 +343,8 @@ class AutoScaleRecord(Document, AutoScaleStepFailureHandler, StepHandler):
 		frappe.db.set_value(
 			"Server", self.secondary_server, {"status": "Active", "is_monitoring_disabled": False}
 		)
+		refresh_server_state("Server", self.primary_server)
+		refresh_server_state("Server", self.secondary_server)
 
 		duration = frappe.utils.now_datetime() - frappe.db.get_value(
 			"Auto Scale Record", self.name, "start_time"
@@ -491,6 +494,8 @@ class AutoScaleRecord(Document, AutoScaleStepFailureHandler, StepHandler):
 		frappe.db.set_value(
 			"Server", self.secondary_server, {"halt_agent_jobs": False, "is_monitoring_disabled": True}
 		)
+		refresh_server_state("Server", self.primary_server)
+		refresh_server_state("Server", self.secondary_server)
 
 		frappe.set_user(current_user)
 
@@ -570,6 +575,7 @@ class AutoScaleRecord(Document, AutoScaleStepFailureHandler, StepHandler):
 		step.save()
 
 		frappe.db.set_value("Server", self.primary_server, "halt_agent_jobs", True)
+		refresh_server_state("Server", self.primary_server)
 		frappe.db.commit()  # Need immediate effect
 
 		primary_server: "Server" = frappe.get_doc("Server", self.primary_server)
@@ -592,6 +598,7 @@ class AutoScaleRecord(Document, AutoScaleStepFailureHandler, StepHandler):
 		step.save()
 
 		frappe.db.set_value("Server", self.secondary_server, "halt_agent_jobs", True)
+		refresh_server_state("Server", self.secondary_server)
 		frappe.db.commit()  # Need immediate effect
 
 		secondary_server: "Server" = frappe.get_doc("Server", self.secondary_server)
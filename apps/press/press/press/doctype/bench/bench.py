@@ -26,6 +26,7 @@ from press.press.doctype.bench_shell_log.bench_shell_log import (
 	create_bench_shell_log,
 )
 from press.press.doctype.site.site import Site
+from press.press.doctype.site_update.upgrade_graph import refresh_bench
 from press.runner import Ansible
 from press.utils import (
 	SupervisorProcess,
@@ -770,13 +771,19 @@ class Bench(Document):
 		set_memory_limits=False,
 		gunicorn_memory=150,
 		bg_memory=3 * 80,
+		shares: tuple[float, float] | None = None,
 	):
 		"""
 		Mostly makes sense when called from Server's auto_scale_workers
 
-		Allocates workers and memory if required
+		Allocates workers and memory if required. shares are the fractions of the
+		server's gunicorn and background workers to give this bench, proportional
+		to its workload if not given.
 		"""
 		try:
+			if shares is None:
+				shares = (self.workload / server_workload,) * 2
+			gunicorn_share, background_share = shares
 			max_gn, min_gn, max_bg, min_bg = frappe.db.get_values(
 				"Release Group",
 				self.group,
@@ -791,7 +798,7 @@ class Bench(Document):
 				max_gn or MAX_GUNICORN_WORKERS,
 				max(
 					min_gn or MIN_GUNICORN_WORKERS,
-					round(self.workload / server_workload * max_gunicorn_workers),
+					round(gunicorn_share * max_gunicorn_workers),
 				),  # min 2 max 36
 			)
 			if self.gunicorn_threads_per_worker:
@@ -810,7 +817,7 @@ class Bench(Document):
 			self.background_workers = min(
 				max_bg or MAX_BACKGROUND_WORKERS,
 				max(
-					min_bg or MIN_BACKGROUND_WORKERS, round(self.workload / server_workload * max_bg_workers)
+					min_bg or MIN_BACKGROUND_WORKERS, round(background_share * max_bg_workers)
 				),  # min 1 max 8
 			)
 		except ZeroDivisionError:  # when total_workload is 0
@@ -1205,6 +1212,7 @@ def process_new_bench_job_update(job):
 		return
 
 	frappe.db.set_value("Bench", job.bench, "status", updated_status)
+	refresh_bench(bench.candidate, bench.server)
 	if bench.team != "Administrator":
 		bench.status = updated_status  # just to ensure the status got changed in webhook payload, reload_doc is costly here
 		create_webhook_event("Bench Status Update", bench, bench.team)
@@ -1269,6 +1277,7 @@ def process_archive_bench_job_update(job):
 
 	if updated_status != bench.status:
 		frappe.db.set_value("Bench", job.bench, "status", updated_status)
+		refresh_bench(bench.candidate, bench.server)
 		is_ssh_proxy_setup = frappe.db.get_value("Bench", job.bench, "is_ssh_proxy_setup")
 		if updated_status == "Archived" and is_ssh_proxy_setup:
 			Bench("Bench", job.bench).remove_ssh_user()
@@ -0,0 +1,155 @@
+# Copyright (c) 2026, Frappe and contributors
+# For license information, please see license.txt
+"""
+Layered packaging of build contexts.
+
+The build context is a single gzipped tarball, assembled from independently
+compressed gzip members. Each app directory is a layer, a tar fragment without
+the end of archive marker compressed on its own and kept in LAYERS_DIRECTORY
+under a key derived from the App Release hash. The rest of the build directory
+(Dockerfile, config files, keys) is packed fresh on every build.
+
+Layers of unchanged apps are reused as they are, changed layers are compressed
+in parallel. Concatenated gzip members decompress as one stream and
+concatenated tar fragments read as one archive, so the builder receives the
+same format as before.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import os
+import shutil
+import tarfile
+import tempfile
+import time
+import typing
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import frappe
+
+if typing.TYPE_CHECKING:
+	from collections.abc import Callable
+
+LAYERS_DIRECTORY = ".layers"
+LAYER_TTL = 3 * 24 * 60 * 60  # seconds since a layer was last used
+MAX_PACKING_THREADS = 4
+COMPRESS_LEVEL = 5
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+@dataclass
+class Layer:
+	arcname: str  # path of the layer in the build context, e.g. ./apps/frappe
+	path: str  # directory in the build directory
+	release_hash: str  # commit hash of the App Release in the directory
+
+	def key(self, fix_permissions: bool) -> str:
+		return hashlib.sha256(
+			f"{self.arcname}:{self.release_hash}:{int(fix_permissions)}".encode()
+		).hexdigest()
+
+
+def get_layers_directory() -> str:
+	build_directory = frappe.get_value("Press Settings", None, "build_directory")
+	layers_directory = os.path.join(build_directory, LAYERS_DIRECTORY)
+	os.makedirs(layers_directory, exist_ok=True)
+	return layers_directory
+
+
+def fix_content_permission(tarinfo: tarfile.TarInfo) -> tarfile.TarInfo:
+	tarinfo.uid = 1000
+	tarinfo.gid = 1000
+	return tarinfo
+
+
+def write_fragment(
+	destination: str,
+	path: str,
+	arcname: str,
+	filter: Callable[[tarfile.TarInfo], tarfile.TarInfo | None] | None = None,
+):
+	"""Writes path as a gzipped tar fragment, an archive without the end of archive marker"""
+	with tempfile.TemporaryFile(dir=os.path.dirname(destination)) as raw:
+		with tarfile.open(fileobj=raw, mode="w", format=tarfile.PAX_FORMAT) as tar:
+			tar.add(path, arcname=arcname, filter=filter)
+			end = tar.offset
+		raw.truncate(end)
+		raw.seek(0)
+		with (
+			open(destination, "wb") as file,
+			gzip.GzipFile(fileobj=file, mode="wb", compresslevel=COMPRESS_LEVEL, mtime=0) as compressed,
+		):
+			shutil.copyfileobj(raw, compressed, COPY_BUFFER_SIZE)
+
+
+def pack_layer(layer: Layer, layers_directory: str, fix_permissions: bool, reuse: bool) -> tuple[str, bool]:
+	"""Returns path of the packed layer and whether it was reused, runs on packing threads so no frappe calls"""
+	path = os.path.join(layers_directory, f"{layer.key(fix_permissions)}.tar.gz")
+	if reuse and os.path.exists(path):
+		os.utime(path)
+		return path, True
+
+	# Pack next to the layer and move it in place, so concurrent builds never read a partial layer
+	fd, partial = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".partial")
+	os.close(fd)
+	try:
+		write_fragment(
+			partial, layer.path, layer.arcname, fix_content_permission if fix_permissions else None
+		)
+		os.replace(partial, path)
+	finally:
+		if os.path.exists(partial):
+			os.remove(partial)
+	return path, False
+
+
+def package_build_context(
+	build_directory: str, layers: list[Layer], fix_permissions: bool = False, reuse: bool = True
+) -> tuple[str, int]:
+	"""Returns path of the packed build context and number of layers reused"""
+	layer_names = {layer.arcname for layer in layers}
+
+	def base_filter(tarinfo: tarfile.TarInfo) -> tarfile.TarInfo | None:
+		if tarinfo.name in layer_names:
+			return None
+		return fix_content_permission(tarinfo) if fix_permissions else tarinfo
+
+	# frappe.local is empty on the packing threads
+	layers_directory = get_layers_directory()
+	fd, context = tempfile.mkstemp(suffix=".tar.gz")
+	os.close(fd)
+	base = f"{context}.base"
+	try:
+		with ThreadPoolExecutor(max_workers=MAX_PACKING_THREADS) as executor:
+			packed = executor.map(
+				lambda layer: pack_layer(layer, layers_directory, fix_permissions, reuse), layers
+			)
+			write_fragment(base, build_directory, ".", base_filter)
+			packed = list(packed)
+
+		with open(context, "wb") as file:
+			for path in (base, *(path for path, _ in packed)):
+				with open(path, "rb") as member:
+					shutil.copyfileobj(member, file, COPY_BUFFER_SIZE)
+			file.write(gzip.compress(tarfile.NUL * tarfile.BLOCKSIZE * 2, mtime=0))
+	except Exception:
+		os.remove(context)
+		raise
+	finally:
+		if os.path.exists(base):
+			os.remove(base)
+
+	return context, sum(1 for _, reused in packed if reused)
+
+
+def cleanup_layers():
+	"""Removes layers not used by a build in the last LAYER_TTL seconds"""
+	layers_directory = get_layers_directory()
+	expired = time.time() - LAYER_TTL
+	for file in os.listdir(layers_directory):
+		path = os.path.join(layers_directory, file)
+		if os.stat(path).st_mtime < expired:
+			os.remove(path)
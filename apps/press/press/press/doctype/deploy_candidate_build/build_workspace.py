@@ -0,0 +1,139 @@
+# Copyright (c) 2026, Frappe and contributors
+# For license information, please see license.txt
+"""
+Build directories assembled from links to immutable release snapshots.
+
+The first build that uses an App Release copies its clone directory into
+SNAPSHOTS_DIRECTORY, using reflinks where the filesystem supports them. Build
+directories then hardlink the files of that snapshot instead of copying them.
+Nothing writes into a snapshot or into the apps of a build directory, so
+sharing inodes between builds is safe. Clone directories are not linked
+directly, since re-cloning a release rewrites them.
+
+Each build holds a reference on the snapshots it links, kept as a file in the
+snapshot's refs directory and dropped when its build directory is cleaned up.
+Snapshots without references are removed SNAPSHOT_TTL seconds after their last
+use.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import fcntl
+import os
+import shutil
+import tempfile
+import time
+
+import frappe
+
+SNAPSHOTS_DIRECTORY = ".snapshots"
+SNAPSHOT_TTL = 24 * 60 * 60  # seconds since the snapshot was last referenced
+FICLONE = 0x40049409  # ioctl to reflink a file on btrfs and xfs
+
+
+def get_snapshots_directory() -> str:
+	build_directory = frappe.get_value("Press Settings", None, "build_directory")
+	snapshots_directory = os.path.join(build_directory, SNAPSHOTS_DIRECTORY)
+	os.makedirs(snapshots_directory, exist_ok=True)
+	return snapshots_directory
+
+
+def reflink_or_copy(source: str, destination: str):
+	try:
+		with open(source, "rb") as src, open(destination, "wb") as dst:
+			fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+		shutil.copystat(source, destination)
+	except OSError:
+		shutil.copy2(source, destination)
+
+
+def link_or_copy(source: str, destination: str):
+	try:
+		os.link(source, destination)
+	except OSError:
+		# Snapshot on another filesystem or link count exhausted
+		reflink_or_copy(source, destination)
+
+
+def link_tree(source: str, destination: str):
+	"""Recreates the tree at source in destination with files hardlinked, symlinks are recreated as they are"""
+	os.makedirs(destination)
+	for directory, subdirectories, files in os.walk(source):
+		target = os.path.join(destination, os.path.relpath(directory, source))
+		for name in subdirectories + files:
+			path = os.path.join(directory, name)
+			if os.path.islink(path):
+				os.symlink(os.readlink(path), os.path.join(target, name))
+			elif name in files:
+				link_or_copy(path, os.path.join(target, name))
+			else:
+				os.mkdir(os.path.join(target, name))
+		shutil.copystat(directory, target)
+
+
+def get_snapshot(release: str, clone_directory: str) -> str:
+	"""Returns the snapshot of release, taking it from clone_directory if there isn't one yet"""
+	snapshot = os.path.join(get_snapshots_directory(), release)
+	if os.path.exists(snapshot):
+		return snapshot
+
+	# Copy next to the snapshot and move it in place, so concurrent builds never link a partial one
+	partial = tempfile.mkdtemp(dir=os.path.dirname(snapshot), prefix=f"{release}.", suffix=".partial")
+	try:
+		shutil.copytree(
+			clone_directory,
+			os.path.join(partial, "tree"),
+			symlinks=True,
+			copy_function=reflink_or_copy,
+		)
+		try:
+			os.rename(os.path.join(partial, "tree"), snapshot)
+		except OSError:
+			# Another build moved its copy in first, anything else leaves no snapshot to link
+			if not os.path.isdir(snapshot):
+				raise
+	finally:
+		shutil.rmtree(partial, ignore_errors=True)
+	return snapshot
+
+
+def get_references_directory(snapshot: str) -> str:
+	return f"{snapshot}.refs"
+
+
+def link_release(release: str, clone_directory: str, destination: str, build: str):
+	"""Links the snapshot of release into destination on behalf of build"""
+	snapshot = get_snapshot(release, clone_directory)
+	references = get_references_directory(snapshot)
+	os.makedirs(references, exist_ok=True)
+	open(os.path.join(references, build), "w").close()
+	os.utime(snapshot)
+	link_tree(snapshot, destination)
+
+
+def drop_references(build: str):
+	"""Releases every snapshot referenced by build"""
+	snapshots_directory = get_snapshots_directory()
+	for name in os.listdir(snapshots_directory):
+		if name.endswith(".refs"):
+			with contextlib.suppress(FileNotFoundError):
+				os.remove(os.path.join(snapshots_directory, name, build))
+
+
+def collect_garbage():
+	"""Removes snapshots no build references and no build used in the last SNAPSHOT_TTL seconds"""
+	snapshots_directory = get_snapshots_directory()
+	expired = time.time() - SNAPSHOT_TTL
+	for name in os.listdir(snapshots_directory):
+		path = os.path.join(snapshots_directory, name)
+		if name.endswith(".refs") or os.stat(path).st_mtime >= expired:
+			continue
+
+		references = get_references_directory(path)
+		if os.path.isdir(references) and os.listdir(references):
+			continue
+
+		# Partial copies left behind by crashed builds are removed the same way
+		shutil.rmtree(path, ignore_errors=True)
+		shutil.rmtree(references, ignore_errors=True)
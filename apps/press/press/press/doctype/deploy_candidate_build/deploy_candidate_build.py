@@ -9,7 +9,6 @@ import json
 import os
 import re
 import shutil
-import tarfile
 import tempfile
 import typing
 import warnings
@@ -48,6 +47,16 @@ from press.press.doctype.deploy_candidate.utils import (
 	load_pyproject,
 )
 from press.press.doctype.deploy_candidate.validations import PreBuildValidations
+from press.press.doctype.deploy_candidate_build.build_context import (
+	Layer,
+	cleanup_layers,
+	package_build_context,
+)
+from press.press.doctype.deploy_candidate_build.build_workspace import (
+	collect_garbage,
+	drop_references,
+	link_release,
+)
 from press.utils import get_current_team, log_error
 from press.utils.jobs import get_background_jobs, stop_background_job
 from press.utils.webhook import create_webhook_event
@@ -458,13 +467,13 @@ class DeployCandidateBuild(Document):
 			source = self._clone_release_and_update_step(app.release, step)
 
 		target = os.path.join(self.build_directory, "apps", app.app)
-		shutil.copytree(source, target, symlinks=True)
+		link_release(app.release, source, target, self.name)
 
 		if app.pullable_release:
 			source = frappe.get_value("App Release", app.pullable_release, "clone_directory")
 			target = os.path.join(self.build_directory, "app_updates", app.app)
 			# don't know why
-			shutil.copytree(source, target, symlinks=True)
+			link_release(app.pullable_release, source, target, self.name)
 
 		return target
 
@@ -944,24 +953,47 @@ class DeployCandidateBuild(Document):
 		start_time = now()
 		self.save(ignore_version=True)
 
-		def fix_content_permission(tarinfo):
-			tarinfo.uid = 1000
-			tarinfo.gid = 1000
-			return tarinfo
-
-		tmp_file_path = tempfile.mkstemp(suffix=".tar.gz")[1]
-		with tarfile.open(tmp_file_path, "w:gz", compresslevel=5) as tar:
-			if frappe.conf.developer_mode:
-				tar.add(self.build_directory, arcname=".", filter=fix_content_permission)
-			else:
-				tar.add(self.build_directory, arcname=".")
+		layers = self._get_build_context_layers()
+		tmp_file_path, reused = package_build_context(
+			self.build_directory,
+			layers,
+			fix_permissions=bool(frappe.conf.developer_mode),
+			reuse=not self.no_cache,
+		)
 
+		step.output = f"Reused {reused} of {len(layers)} app layers"
 		step.status = "Success"
 		step.duration = get_duration(start_time)
 		self.save(ignore_version=True)
 
 		return tmp_file_path
 
+	def _get_build_context_layers(self) -> list[Layer]:
+		releases = [app.release for app in self.candidate.apps]
+		releases += [app.pullable_release for app in self.candidate.apps if app.pullable_release]
+		hashes = dict(
+			frappe.get_all("App Release", {"name": ("in", releases)}, ["name", "hash"], as_list=True)
+		)
+
+		layers = []
+		for app in self.candidate.apps:
+			layers.append(
+				Layer(
+					f"./apps/{app.app}",
+					os.path.join(self.build_directory, "apps", app.app),
+					hashes[app.release],
+				)
+			)
+			if app.pullable_release:
+				layers.append(
+					Layer(
+						f"./app_updates/{app.app}",
+						os.path.join(self.build_directory, "app_updates", app.app),
+						hashes[app.pullable_release],
+					)
+				)
+		return layers
+
 	def _package_and_upload_context(self):
 		context_filepath = self._package_build_context()
 		context_filename = self._upload_build_context(
@@ -1263,6 +1295,7 @@ class DeployCandidateBuild(Document):
 
 		if os.path.exists(self.build_directory):
 			shutil.rmtree(self.build_directory)
+		drop_references(self.name)
 
 		self.build_directory = None
 		self.save()
@@ -1554,6 +1587,12 @@ def cleanup_build_directories():
 			frappe.db.rollback()
 			log_error(title="Deploy Candidate Build Cleanup Error", exception=e, doc=doc)
 
+	try:
+		cleanup_layers()
+		collect_garbage()
+	except Exception as e:
+		log_error(title="Build Cache Cleanup Error", exception=e)
+
 	# Delete all temporary files created by the build process
 	glob_path = os.path.join(tempfile.gettempdir(), f"{tempfile.gettempprefix()}*.tar.gz")
 	six_hours_ago = frappe.utils.add_to_date(None, hours=-6)
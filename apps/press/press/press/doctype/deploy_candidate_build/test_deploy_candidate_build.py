@@ -2,6 +2,9 @@
 # See license.txt
 
 
+import os
+import tarfile
+import tempfile
 import typing
 from unittest.mock import Mock, patch
 
@@ -16,6 +19,8 @@ from press.press.doctype.deploy_candidate.test_deploy_candidate import (
 	create_test_deploy_candidate_build,
 	create_test_press_admin_team,
 )
+from press.press.doctype.deploy_candidate_build import build_workspace
+from press.press.doctype.deploy_candidate_build.build_context import Layer, package_build_context
 from press.press.doctype.deploy_candidate_build.deploy_candidate_build import DeployCandidateBuild
 from press.press.doctype.release_group.test_release_group import (
 	create_test_release_group,
@@ -179,3 +184,91 @@ class TestDeployCandidateBuild(FrappeTestCase):
 				self.assertEqual(newly_created_build.name, build)
 			else:
 				self.assertEqual(deploy_candidate_build.name, build)
+
+	def test_build_context_reuses_unchanged_app_layers(self):
+		root = tempfile.mkdtemp()
+		frappe.db.set_single_value("Press Settings", "build_directory", root)
+		build_directory = os.path.join(root, "group", "build")
+		for app in ("frappe", "erpnext"):
+			os.makedirs(os.path.join(build_directory, "apps", app))
+			with open(os.path.join(build_directory, "apps", app, "hooks.py"), "w") as f:
+				f.write(f"app_name = '{app}'")
+		with open(os.path.join(build_directory, "Dockerfile"), "w") as f:
+			f.write("FROM ubuntu")
+
+		layers = [
+			Layer("./apps/frappe", os.path.join(build_directory, "apps", "frappe"), "a" * 40),
+			Layer("./apps/erpnext", os.path.join(build_directory, "apps", "erpnext"), "b" * 40),
+		]
+		first, reused = package_build_context(build_directory, layers)
+		self.assertEqual(reused, 0)
+
+		layers[1].release_hash = "c" * 40
+		second, reused = package_build_context(build_directory, layers)
+		self.assertEqual(reused, 1)
+
+		for context in (first, second):
+			with tarfile.open(context, "r:gz") as tar:
+				self.assertEqual(
+					sorted(tar.getnames()),
+					[
+						".",
+						"./Dockerfile",
+						"./apps",
+						"./apps/erpnext",
+						"./apps/erpnext/hooks.py",
+						"./apps/frappe",
+						"./apps/frappe/hooks.py",
+					],
+				)
+				self.assertEqual(tar.extractfile("./apps/erpnext/hooks.py").read(), b"app_name = 'erpnext'")
+			os.remove(context)
+
+	def test_build_workspace_links_release_snapshots(self):
+		root = tempfile.mkdtemp()
+		frappe.db.set_single_value("Press Settings", "build_directory", root)
+		clone_directory = tempfile.mkdtemp()
+		with open(os.path.join(clone_directory, "hooks.py"), "w") as f:
+			f.write("app_name = 'frappe'")
+
+		first = os.path.join(root, "group", "first", "apps", "frappe")
+		second = os.path.join(root, "group", "second", "apps", "frappe")
+		build_workspace.link_release("release", clone_directory, first, "first")
+		build_workspace.link_release("release", clone_directory, second, "second")
+		self.assertEqual(
+			os.stat(os.path.join(first, "hooks.py")).st_ino, os.stat(os.path.join(second, "hooks.py")).st_ino
+		)
+		self.assertNotEqual(
+			os.stat(os.path.join(first, "hooks.py")).st_ino,
+			os.stat(os.path.join(clone_directory, "hooks.py")).st_ino,
+		)
+
+		snapshot = os.path.join(root, build_workspace.SNAPSHOTS_DIRECTORY, "release")
+		with patch.object(build_workspace, "SNAPSHOT_TTL", -1):
+			build_workspace.drop_references("first")
+			build_workspace.collect_garbage()
+			self.assertTrue(os.path.exists(snapshot))
+
+			build_workspace.drop_references("second")
+			build_workspace.collect_garbage()
+			self.assertFalse(os.path.exists(snapshot))
+
+	def test_snapshot_rename_failure_is_raised_unless_another_build_won(self):
+		root = tempfile.mkdtemp()
+		frappe.db.set_single_value("Press Settings", "build_directory", root)
+		clone_directory = tempfile.mkdtemp()
+		with open(os.path.join(clone_directory, "hooks.py"), "w") as f:
+			f.write("app_name = 'frappe'")
+		snapshot = os.path.join(build_workspace.get_snapshots_directory(), "release")
+
+		with patch.object(build_workspace.os, "rename", side_effect=OSError(28, "No space left on device")):
+			self.assertRaises(OSError, build_workspace.get_snapshot, "release", clone_directory)
+		self.assertFalse(os.path.exists(snapshot))
+
+		def lose_race(source, destination):
+			# Another build's copy lands first
+			os.mkdir(destination)
+			raise FileExistsError(17, "File exists")
+
+		with patch.object(build_workspace.os, "rename", side_effect=lose_race):
+			self.assertEqual(build_workspace.get_snapshot("release", clone_directory), snapshot)
@@ -621,49 +621,64 @@ class Invoice(Document):
 		return round(scale_duration.total_seconds() / 3600, 2)
 
 	def add_usage_record(self, usage_record):
+		self.add_usage_records([usage_record])
+
+	def add_usage_records(self, usage_records: list[UsageRecord]):  # noqa: C901
+		"""Add all usage records to invoice items with a single save"""
 		if self.type != "Subscription":
 			return
-		# return if this usage_record is already accounted for in an invoice
-		if usage_record.invoice:
-			return
 
-		# return if this usage_record does not fall inside period of invoice
-		usage_record_date = getdate(usage_record.date)
 		start = getdate(self.period_start)
 		end = getdate(self.period_end)
-		if not (start <= usage_record_date <= end):
-			return
+		item_index = self.get_invoice_item_index()
+		added = []
+		for usage_record in usage_records:
+			# skip if this usage_record is already accounted for in an invoice
+			if usage_record.invoice:
+				continue
+
+			# skip if this usage_record does not fall inside period of invoice
+			if not (start <= getdate(usage_record.date) <= end):
+				continue
+
+			key = get_invoice_item_key(usage_record)
+			invoice_item = item_index.get(key)
+			# if not found, create a new invoice item
+			if not invoice_item:
+				invoice_item = self.append(
+					"items",
+					{
+						"document_type": usage_record.document_type,
+						"document_name": usage_record.document_name,
+						"plan": usage_record.plan,
+						"quantity": 0,
+						"rate": usage_record.amount,
+						"site": usage_record.site,
+					},
+				)
+				item_index[key] = invoice_item
 
-		invoice_item = self.get_invoice_item_for_usage_record(usage_record)
-		# if not found, create a new invoice item
-		if not invoice_item:
-			invoice_item = self.append(
-				"items",
-				{
-					"document_type": usage_record.document_type,
-					"document_name": usage_record.document_name,
-					"plan": usage_record.plan,
-					"quantity": 0,
-					"rate": usage_record.amount,
-					"site": usage_record.site,
-				},
-			)
+			if self.is_auto_scale_invoice_item(usage_record):
+				invoice_item.quantity = (invoice_item.quantity or 0) + self.get_auto_scale_quantity(
+					usage_record
+				)
+			else:
+				invoice_item.quantity = (invoice_item.quantity or 0) + 1
 
-		if self.is_auto_scale_invoice_item(usage_record):
-			invoice_item.quantity = (
-				self.get_auto_scale_quantity(usage_record)
-				if not invoice_item.quantity
-				else invoice_item.quantity + self.get_auto_scale_quantity(usage_record)
-			)
+			if usage_record.payout:
+				self.payout += usage_record.payout
 
-		else:
-			invoice_item.quantity = (invoice_item.quantity or 0) + 1
+			added.append(usage_record)
 
-		if usage_record.payout:
-			self.payout += usage_record.payout
+		if not added:
+			return
 
 		self.save()
-		usage_record.db_set("invoice", self.name)
+		frappe.db.set_value(
+			"Usage Record", {"name": ("in", [record.name for record in added])}, "invoice", self.name
+		)
+		for usage_record in added:
+			usage_record.invoice = self.name
 
 	def remove_usage_record(self, usage_record):
 		if self.type != "Subscription":
@@ -688,19 +703,11 @@ class Invoice(Document):
 		usage_record.db_set("invoice", None)
 
 	def get_invoice_item_for_usage_record(self, usage_record):
-		invoice_item = None
-		for row in self.items:
-			conditions = (
-				row.document_type == usage_record.document_type
-				and row.document_name == usage_record.document_name
-				and row.plan == usage_record.plan
-				and row.rate == usage_record.amount
-			)
-			if row.document_type == "Marketplace App":
-				conditions = conditions and row.site == usage_record.site
-			if conditions:
-				invoice_item = row
-		return invoice_item
+		return self.get_invoice_item_index().get(get_invoice_item_key(usage_record))
+
+	def get_invoice_item_index(self) -> dict:
+		# Later rows win, same as a linear scan picking the last match
+		return {get_invoice_item_key(row, rate=row.rate): row for row in self.items}
 
 	def validate_items(self):
 		items_to_remove = []
@@ -1081,6 +1088,13 @@ class Invoice(Document):
 		return stripe.Invoice.retrieve(self.stripe_invoice_id)
 
 
+def get_invoice_item_key(row, rate=None) -> tuple:
+	"""Invoice items are unique per document, plan and rate (and site for marketplace apps)"""
+	rate = row.amount if rate is None else rate
+	site = row.site if row.document_type == "Marketplace App" else None
+	return (row.document_type, row.document_name, row.plan, rate, site)
+
+
 def finalize_draft_invoices():
 	"""
 	- Runs every hour
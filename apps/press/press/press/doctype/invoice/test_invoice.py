@@ -9,6 +9,7 @@ from frappe.tests.utils import FrappeTestCase
 from frappe.utils.data import add_days, today
 
 from press.press.doctype.team.test_team import create_test_team
+from press.press.doctype.usage_record.usage_record import defer_invoice_updates, update_usage_in_invoices
 
 from .invoice import Invoice
 
@@ -74,6 +75,35 @@ class TestInvoice(FrappeTestCase):
 		self.assertEqual(invoice.total, 90)
 		self.assertEqual(usage_records[0].invoice, None)
 
+	def test_deferred_usage_records_are_added_with_single_save(self):
+		invoice = frappe.get_doc(
+			doctype="Invoice",
+			team=self.team.name,
+			period_start=today(),
+			period_end=add_days(today(), 10),
+		).insert()
+
+		usage_records = []
+		with defer_invoice_updates():
+			for amount in [10, 10, 20]:
+				usage_record = frappe.get_doc(doctype="Usage Record", team=self.team.name, amount=amount)
+				usage_record.insert()
+				usage_record.submit()
+				usage_records.append(usage_record)
+
+		invoice.reload()
+		self.assertEqual(len(invoice.items), 0)
+
+		with patch.object(Invoice, "save", autospec=True, side_effect=Invoice.save) as save:
+			update_usage_in_invoices(usage_records)
+		self.assertEqual(save.call_count, 1)
+
+		invoice.reload()
+		self.assertEqual(sorted((item.rate, item.quantity) for item in invoice.items), [(10, 2), (20, 1)])
+		self.assertEqual(invoice.total, 40)
+		for usage_record in usage_records:
+			self.assertEqual(frappe.db.get_value("Usage Record", usage_record.name, "invoice"), invoice.name)
+
 	def test_invoice_with_credits_less_than_total(self):
 		invoice = frappe.get_doc(
 			doctype="Invoice",
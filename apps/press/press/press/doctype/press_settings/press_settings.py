@@ -111,6 +111,8 @@ class PressSettings(Document):
 		log_server: DF.Link | None
 		mailgun_api_key: DF.Data | None
 		max_allowed_screenshots: DF.Int
+		max_backup_size_in_flight_per_server: DF.Int
+		max_concurrent_backups_per_server: DF.Int
 		max_concurrent_physical_restorations: DF.Int
 		max_failed_backup_attempts_in_a_day: DF.Int
 		micro_debit_charge_inr: DF.Currency
@@ -181,7 +183,9 @@ class PressSettings(Document):
 		usage_record_creation_batch_size: DF.Int
 		usd_rate: DF.Float
 		use_agent_job_callbacks: DF.Check
+		use_agent_job_push_updates: DF.Check
 		use_app_cache: DF.Check
+		use_capacity_aware_backup_scheduling: DF.Check
 		use_delta_builds: DF.Check
 		use_staging_ca: DF.Check
 		verify_cards_with_micro_charge: DF.Literal["No", "Only INR", "Only USD", "Both INR and USD"]
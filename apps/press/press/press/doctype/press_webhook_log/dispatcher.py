@@ -0,0 +1,361 @@
+# Copyright (c) 2026, Frappe and contributors
+# For license information, please see license.txt
+"""
+Concurrent delivery of Press Webhook Logs.
+
+A single dispatcher job sends every due log of a batch. HTTP calls run on a
+bounded thread pool with a keep-alive session per endpoint origin. Deliveries
+are queued per origin and only MAX_CONCURRENCY_PER_ENDPOINT of an origin are
+handed to the pool at a time, the next one once one of them completes, so a
+slow endpoint occupies at most that many threads. Origins that fail CIRCUIT_FAILURE_THRESHOLD
+batches in a row are skipped for CIRCUIT_OPEN_FOR seconds. Deliveries to them
+are deferred without using up a retry.
+
+Nothing is written until every delivery of a batch finishes, so a batch is
+capped to finish well within the queue timeout: at most
+MAX_DELIVERIES_PER_ORIGIN deliveries per origin and MAX_DELIVERIES_PER_BATCH in
+total. Logs over either cap are deferred to the next run, also without using
+up a retry. Logs of a dispatcher that died anyway stay Queued and are picked up
+again by process once the queue timeout has passed.
+
+Only the HTTP calls run in threads. Reading logs and webhooks, and writing
+attempts and statuses back, happen in bulk on the dispatcher's own thread.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+
+import frappe
+import requests
+from frappe.utils import add_to_date, now
+from frappe.utils.background_jobs import get_queues_timeout
+from requests.adapters import HTTPAdapter
+
+from press.utils import log_error
+
+WEBHOOK_QUEUE = "webhooks"  # falls back to short when no worker is configured for it
+WEBHOOK_TIMEOUT = 5  # seconds
+MAX_DELIVERY_THREADS = 16
+MAX_CONCURRENCY_PER_ENDPOINT = 2
+MAX_ENDPOINT_SESSIONS = 256
+# Each delivery takes at most 2 * WEBHOOK_TIMEOUT (connect and read), so a batch takes at most
+# 2 * WEBHOOK_TIMEOUT * max(MAX_DELIVERIES_PER_ORIGIN / MAX_CONCURRENCY_PER_ENDPOINT,
+# MAX_DELIVERIES_PER_BATCH / MAX_DELIVERY_THREADS), 100 seconds
+MAX_DELIVERIES_PER_ORIGIN = 20
+MAX_DELIVERIES_PER_BATCH = 128
+
+CIRCUIT_FAILURES_KEY = "press_webhook_circuit_failures"
+CIRCUIT_OPEN_KEY = "press_webhook_circuit_open"
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_OPEN_FOR = 5 * 60  # seconds
+
+# Process wide, shared by every dispatch in this worker
+_endpoint_sessions: dict[str, requests.Session] = {}
+_endpoint_lock = threading.Lock()
+
+
+def get_dispatch_queue() -> str:
+	return WEBHOOK_QUEUE if WEBHOOK_QUEUE in get_queues_timeout() else "short"
+
+
+def get_dispatch_timeout() -> int:
+	"""Seconds after which a dispatcher job is killed"""
+	return get_queues_timeout()[get_dispatch_queue()]
+
+
+def get_origin(url: str) -> str:
+	url = urlparse(url)
+	return f"{url.scheme}://{url.netloc}"
+
+
+def get_endpoint_session(origin: str) -> requests.Session:
+	with _endpoint_lock:
+		if session := _endpoint_sessions.get(origin):
+			return session
+
+		if len(_endpoint_sessions) >= MAX_ENDPOINT_SESSIONS:
+			oldest = next(iter(_endpoint_sessions))
+			_endpoint_sessions.pop(oldest).close()
+
+		session = requests.Session()
+		adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MAX_CONCURRENCY_PER_ENDPOINT)
+		session.mount("http://", adapter)
+		session.mount("https://", adapter)
+		_endpoint_sessions[origin] = session
+		return session
+
+
+def post(url: str, payload: dict, secret: str) -> tuple[int, str]:
+	"""Returns response status code and body, 0 and an explanation if the endpoint couldn't be reached"""
+	session = get_endpoint_session(get_origin(url))
+	try:
+		response = session.post(
+			url, json=payload, headers={"X-Webhook-Secret": secret}, timeout=WEBHOOK_TIMEOUT
+		)
+		return response.status_code, response.text or ""
+	except requests.exceptions.SSLError:
+		return 0, "SSL Error. Please check if SSL the certificate of the webhook is valid."
+	except (requests.exceptions.Timeout, requests.exceptions.ConnectTimeout):
+		return 0, "Request Timeout. Please check if the webhook is reachable."
+	except requests.exceptions.ConnectionError:
+		return 0, "Failed to connect to the webhook endpoint"
+	except Exception as e:
+		return 0, str(e)
+
+
+def post_all(deliveries: list[tuple[frappe._dict, frappe._dict]]) -> list[tuple[int, str]]:
+	"""Posts (log, webhook) deliveries, at most MAX_CONCURRENCY_PER_ENDPOINT at a time per origin"""
+	queues = defaultdict(deque)
+	for index, (_, webhook) in enumerate(deliveries):
+		queues[get_origin(webhook.endpoint)].append(index)
+
+	responses = [None] * len(deliveries)
+	with ThreadPoolExecutor(max_workers=MAX_DELIVERY_THREADS) as executor:
+		running = {}
+
+		def submit(origin: str):
+			index = queues[origin].popleft()
+			log, webhook = deliveries[index]
+			running[executor.submit(post, webhook.endpoint, log.payload, webhook.secret)] = (origin, index)
+
+		for origin, queue in queues.items():
+			for _ in range(min(MAX_CONCURRENCY_PER_ENDPOINT, len(queue))):
+				submit(origin)
+
+		while running:
+			done, _ = wait(running, return_when=FIRST_COMPLETED)
+			for future in done:
+				origin, index = running.pop(future)
+				responses[index] = future.result()
+				if queues[origin]:
+					submit(origin)
+	return responses
+
+
+def is_circuit_open(origin: str) -> bool:
+	return bool(frappe.cache.get_value(f"{CIRCUIT_OPEN_KEY}:{origin}"))
+
+
+def update_circuits(results: dict[str, list[bool]]):
+	"""Counts consecutive batches in which every delivery to an origin failed"""
+	for origin, sent in results.items():
+		if any(sent):
+			frappe.cache.hdel(CIRCUIT_FAILURES_KEY, origin)
+			continue
+
+		failures = (frappe.cache.hget(CIRCUIT_FAILURES_KEY, origin) or 0) + 1
+		if failures >= CIRCUIT_FAILURE_THRESHOLD:
+			frappe.cache.set_value(f"{CIRCUIT_OPEN_KEY}:{origin}", True, expires_in_sec=CIRCUIT_OPEN_FOR)
+			frappe.cache.hdel(CIRCUIT_FAILURES_KEY, origin)
+		else:
+			frappe.cache.hset(CIRCUIT_FAILURES_KEY, origin, failures)
+
+
+def get_webhooks(logs: list[frappe._dict]) -> dict[tuple[str, str], list[frappe._dict]]:
+	"""Enabled webhooks of the teams of logs, by (team, event)"""
+	PressWebhookSelectedEvent = frappe.qb.DocType("Press Webhook Selected Event")
+	PressWebhook = frappe.qb.DocType("Press Webhook")
+	rows = (
+		frappe.qb.from_(PressWebhookSelectedEvent)
+		.select(
+			PressWebhook.name,
+			PressWebhook.endpoint,
+			PressWebhook.secret,
+			PressWebhook.team,
+			PressWebhookSelectedEvent.event,
+		)
+		.left_join(PressWebhook)
+		.on(PressWebhookSelectedEvent.parent == PressWebhook.name)
+		.where(PressWebhook.team.isin(list({log.team for log in logs})))
+		.where(PressWebhook.enabled == 1)
+		.run(as_dict=True)
+	)
+	webhooks = defaultdict(list)
+	for row in rows:
+		webhooks[(row.team, row.event)].append(row)
+	return webhooks
+
+
+def get_attempts(names: list[str]) -> tuple[dict[str, dict[str, str]], dict[str, int]]:
+	"""Returns {log: {webhook: Sent if any attempt was sent else Failed}} and number of attempts of each log"""
+	statuses = defaultdict(dict)
+	counts = defaultdict(int)
+	for attempt in frappe.get_all(
+		"Press Webhook Attempt",
+		{"parenttype": "Press Webhook Log", "parent": ("in", names)},
+		["parent", "webhook", "status"],
+	):
+		counts[attempt.parent] += 1
+		if statuses[attempt.parent].get(attempt.webhook) != "Sent":
+			statuses[attempt.parent][attempt.webhook] = attempt.status
+	return statuses, counts
+
+
+def dispatch(names: list[str]):  # noqa: C901
+	logs = frappe.get_all(
+		"Press Webhook Log",
+		{"name": ("in", names)},
+		["name", "event", "team", "request_payload", "retries"],
+	)
+	if not logs:
+		return
+
+	webhooks = get_webhooks(logs)
+	attempts, attempt_counts = get_attempts(names)
+
+	deliveries = []
+	pending = {}
+	failed = {}
+	deferred = {}
+	open_circuits = {}
+	origin_deliveries = defaultdict(int)
+	for log in logs:
+		try:
+			log.payload = json.loads(log.request_payload)
+			previous = attempts.get(log.name)
+			# First delivery goes to every webhook, retries only to the ones that failed
+			pending[log.name] = [
+				webhook
+				for webhook in webhooks.get((log.team, log.event), [])
+				if not previous or previous.get(webhook.name) == "Failed"
+			]
+			for webhook in pending[log.name]:
+				origin = get_origin(webhook.endpoint)
+				if origin not in open_circuits:
+					open_circuits[origin] = is_circuit_open(origin)
+		except Exception:
+			log_error("Press Webhook Dispatch Error", log=log.name)
+			pending.pop(log.name, None)
+			failed[log.name] = get_failed_log_update(log)
+			continue
+
+		log_deliveries = [
+			(log, webhook) for webhook in pending[log.name] if not open_circuits[get_origin(webhook.endpoint)]
+		]
+		origins = [get_origin(webhook.endpoint) for _, webhook in log_deliveries]
+		# The first log always goes, however many deliveries it has
+		if deliveries and (
+			len(deliveries) + len(log_deliveries) > MAX_DELIVERIES_PER_BATCH
+			or any(
+				origin_deliveries[origin] + origins.count(origin) > MAX_DELIVERIES_PER_ORIGIN
+				for origin in origins
+			)
+		):
+			pending.pop(log.name)
+			deferred[log.name] = get_deferred_log_update(previous, now())
+			continue
+
+		deliveries.extend(log_deliveries)
+		for origin in origins:
+			origin_deliveries[origin] += 1
+
+	responses = post_all(deliveries)
+
+	timestamp = now()
+	attempt_rows = []
+	sent = defaultdict(set)
+	attempted = defaultdict(set)
+	circuit_results = defaultdict(list)
+	for (log, webhook), (status_code, body) in zip(deliveries, responses, strict=True):
+		is_sent = 200 <= status_code < 300
+		attempted[log.name].add(webhook.name)
+		if is_sent:
+			sent[log.name].add(webhook.name)
+		circuit_results[get_origin(webhook.endpoint)].append(is_sent)
+		attempt_counts[log.name] += 1
+		attempt_rows.append(
+			(
+				frappe.generate_hash(length=10),
+				log.name,
+				"Press Webhook Log",
+				"attempts",
+				attempt_counts[log.name],
+				timestamp,
+				timestamp,
+				frappe.session.user,
+				frappe.session.user,
+				webhook.name,
+				webhook.endpoint,
+				"Sent" if is_sent else "Failed",
+				body,
+				status_code,
+				timestamp,
+			)
+		)
+
+	updates = {
+		log.name: get_log_update(
+			log, pending[log.name], sent[log.name], attempted[log.name], attempts.get(log.name)
+		)
+		for log in logs
+		if log.name in pending
+	}
+	updates.update(failed)
+	updates.update(deferred)
+
+	if attempt_rows:
+		frappe.db.bulk_insert(
+			"Press Webhook Attempt",
+			[
+				"name",
+				"parent",
+				"parenttype",
+				"parentfield",
+				"idx",
+				"creation",
+				"modified",
+				"owner",
+				"modified_by",
+				"webhook",
+				"endpoint",
+				"status",
+				"response_body",
+				"response_status_code",
+				"timestamp",
+			],
+			attempt_rows,
+		)
+	frappe.db.bulk_update("Press Webhook Log", updates)
+	update_circuits(circuit_results)
+
+
+def get_log_update(
+	log: frappe._dict,
+	pending: list[frappe._dict],
+	sent: set[str],
+	attempted: set[str],
+	previous: dict[str, str] | None,
+) -> dict:
+	unsent = [webhook.name for webhook in pending if webhook.name not in sent]
+	if not unsent:
+		return {"status": "Sent"}
+
+	if not attempted:
+		# Every delivery was deferred by an open circuit, wait for it without using up a retry
+		return get_deferred_log_update(previous, add_to_date(now(), seconds=CIRCUIT_OPEN_FOR))
+
+	status = "Partially Sent" if sent or "Sent" in (previous or {}).values() else "Failed"
+	return {"status": status, **get_retry(log)}
+
+
+def get_deferred_log_update(previous: dict[str, str] | None, next_retry_at: str) -> dict:
+	"""Puts a log back in the state it was queued from, to be retried at next_retry_at"""
+	if not previous:
+		status = "Pending"
+	else:
+		status = "Partially Sent" if "Sent" in previous.values() else "Failed"
+	return {"status": status, "next_retry_at": next_retry_at}
+
+
+def get_failed_log_update(log: frappe._dict) -> dict:
+	return {"status": "Failed", **get_retry(log)}
+
+
+def get_retry(log: frappe._dict) -> dict:
+	retries = log.retries + 1
+	return {"retries": retries, "next_retry_at": add_to_date(now(), minutes=2**retries)}
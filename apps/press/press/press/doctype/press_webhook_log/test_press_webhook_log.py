@@ -1,9 +1,200 @@
 # Copyright (c) 2024, Frappe and Contributors
 # See license.txt
 
-# import frappe
+import json
+import threading
+from unittest.mock import patch
+
+import frappe
 from frappe.tests.utils import FrappeTestCase
 
+from press.press.doctype.press_webhook_log.dispatcher import (
+	CIRCUIT_FAILURE_THRESHOLD,
+	CIRCUIT_FAILURES_KEY,
+	CIRCUIT_OPEN_KEY,
+	MAX_CONCURRENCY_PER_ENDPOINT,
+	dispatch,
+	is_circuit_open,
+	post_all,
+	update_circuits,
+)
+from press.press.doctype.press_webhook_log.press_webhook_log import process
+from press.press.doctype.team.test_team import create_test_team
+
+
+def create_test_press_webhook(team: str, event: str, endpoint: str):
+	if not frappe.db.exists("Press Webhook Event", event):
+		frappe.get_doc(
+			{"doctype": "Press Webhook Event", "title": event, "description": event, "enabled": 1}
+		).insert(ignore_permissions=True)
+	webhook = frappe.get_doc(
+		{
+			"doctype": "Press Webhook",
+			"team": team,
+			"endpoint": endpoint,
+			"secret": frappe.generate_hash(),
+			"events": [{"event": event}],
+		}
+	).insert(ignore_permissions=True)
+	webhook.db_set("enabled", 1)
+	return webhook
+
+
+def create_test_press_webhook_log(team: str, event: str):
+	return frappe.get_doc(
+		{
+			"doctype": "Press Webhook Log",
+			"team": team,
+			"event": event,
+			"status": "Queued",
+			"request_payload": json.dumps({"event": event, "data": {}}),
+		}
+	).insert(ignore_permissions=True)
+
 
 class TestPressWebhookLog(FrappeTestCase):
-	pass
+	def setUp(self):
+		self.clear_circuits()
+		self.addCleanup(self.clear_circuits)
+
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def clear_circuits(self):
+		frappe.cache.delete_value(CIRCUIT_FAILURES_KEY)
+		frappe.cache.delete_keys(CIRCUIT_OPEN_KEY)
+
+	def test_dispatch_retries_only_failed_webhooks(self):
+		team = create_test_team().name
+		up = create_test_press_webhook(team, "Site Status Update", "https://up.example.com/hook")
+		down = create_test_press_webhook(team, "Site Status Update", "https://down.example.com/hook")
+		log = create_test_press_webhook_log(team, "Site Status Update")
+
+		def fake_post(url, payload, secret):
+			return (200, "ok") if url == up.endpoint else (0, "Failed to connect to the webhook endpoint")
+
+		with patch("press.press.doctype.press_webhook_log.dispatcher.post", side_effect=fake_post) as post:
+			dispatch([log.name])
+			log.reload()
+			self.assertEqual(log.status, "Partially Sent")
+			self.assertEqual(log.retries, 1)
+			self.assertEqual(
+				{(a.webhook, a.status) for a in log.attempts}, {(up.name, "Sent"), (down.name, "Failed")}
+			)
+
+			post.reset_mock()
+			post.side_effect = None
+			post.return_value = (200, "ok")
+			dispatch([log.name])
+			post.assert_called_once()
+			self.assertEqual(post.call_args.args[0], down.endpoint)
+
+		log.reload()
+		self.assertEqual(log.status, "Sent")
+		self.assertEqual(len(log.attempts), 3)
+
+	def test_slow_endpoint_does_not_hold_up_others(self):
+		slow = [
+			(frappe._dict(payload={}), frappe._dict(endpoint="https://slow.example.com/hook", secret=""))
+			for _ in range(20)
+		]
+		fast = [
+			(frappe._dict(payload={}), frappe._dict(endpoint="https://fast.example.com/hook", secret=""))
+			for _ in range(20)
+		]
+		fast_done = threading.Event()
+		lock = threading.Lock()
+		counts = {"fast": 0, "slow_in_flight": 0, "slow_max": 0}
+
+		def fake_post(url, payload, secret):
+			with lock:
+				if "fast" in url:
+					counts["fast"] += 1
+					if counts["fast"] == len(fast):
+						fast_done.set()
+					return 200, "ok"
+				counts["slow_in_flight"] += 1
+				counts["slow_max"] = max(counts["slow_max"], counts["slow_in_flight"])
+			# Slow deliveries wait for every fast one, which never happens if they hog the pool
+			sent = fast_done.wait(timeout=5)
+			with lock:
+				counts["slow_in_flight"] -= 1
+			return (200, "ok") if sent else (0, "Timed out")
+
+		with patch("press.press.doctype.press_webhook_log.dispatcher.post", side_effect=fake_post):
+			responses = post_all(slow + fast)
+
+		self.assertTrue(all(status == 200 for status, _ in responses))
+		self.assertLessEqual(counts["slow_max"], MAX_CONCURRENCY_PER_ENDPOINT)
+
+	def test_malformed_payload_fails_only_its_log(self):
+		team = create_test_team().name
+		create_test_press_webhook(team, "Site Status Update", "https://up.example.com/hook")
+		good = create_test_press_webhook_log(team, "Site Status Update")
+		bad = create_test_press_webhook_log(team, "Site Status Update")
+		frappe.db.set_value("Press Webhook Log", bad.name, "request_payload", "{not json")
+
+		with patch("press.press.doctype.press_webhook_log.dispatcher.post", return_value=(200, "ok")):
+			dispatch([good.name, bad.name])
+
+		self.assertEqual(frappe.db.get_value("Press Webhook Log", good.name, "status"), "Sent")
+		self.assertEqual(
+			frappe.db.get_value("Press Webhook Log", bad.name, ["status", "retries"]), ("Failed", 1)
+		)
+
+	def test_circuit_opens_after_consecutive_failed_batches(self):
+		team = create_test_team().name
+		create_test_press_webhook(team, "Site Status Update", "https://down.example.com/hook")
+		origin = "https://down.example.com"
+
+		for _ in range(CIRCUIT_FAILURE_THRESHOLD - 1):
+			update_circuits({origin: [False, False]})
+		# A batch with any delivery sent starts the count over
+		update_circuits({origin: [False, True]})
+		for _ in range(CIRCUIT_FAILURE_THRESHOLD - 1):
+			update_circuits({origin: [False]})
+		self.assertFalse(is_circuit_open(origin))
+		update_circuits({origin: [False]})
+		self.assertTrue(is_circuit_open(origin))
+
+		log = create_test_press_webhook_log(team, "Site Status Update")
+		with patch("press.press.doctype.press_webhook_log.dispatcher.post") as post:
+			dispatch([log.name])
+		post.assert_not_called()
+
+		# Deferred without using up a retry
+		log.reload()
+		self.assertEqual((log.status, log.retries), ("Pending", 0))
+		self.assertGreater(log.next_retry_at, frappe.utils.now_datetime())
+
+	@patch("press.press.doctype.press_webhook_log.dispatcher.MAX_DELIVERIES_PER_ORIGIN", new=1)
+	def test_deliveries_over_origin_cap_are_deferred(self):
+		team = create_test_team().name
+		create_test_press_webhook(team, "Site Status Update", "https://up.example.com/hook")
+		first = create_test_press_webhook_log(team, "Site Status Update")
+		second = create_test_press_webhook_log(team, "Site Status Update")
+
+		with patch("press.press.doctype.press_webhook_log.dispatcher.post", return_value=(200, "ok")) as post:
+			dispatch([first.name, second.name])
+		post.assert_called_once()
+
+		logs = frappe.get_all(
+			"Press Webhook Log", {"name": ("in", [first.name, second.name])}, ["status", "retries"]
+		)
+		self.assertEqual(sorted((log.status, log.retries) for log in logs), [("Pending", 0), ("Sent", 0)])
+
+	def test_process_picks_up_logs_left_queued_by_a_dead_dispatcher(self):
+		team = create_test_team().name
+		stuck = create_test_press_webhook_log(team, "Site Status Update")
+		queued = create_test_press_webhook_log(team, "Site Status Update")
+		frappe.db.set_value("Press Webhook Log", queued.name, "status", "Queued")
+		stuck.db_set(
+			{"status": "Queued", "modified": frappe.utils.add_to_date(None, hours=-1)}, update_modified=False
+		)
+
+		with patch("press.press.doctype.press_webhook_log.press_webhook_log.frappe.enqueue") as enqueue:
+			process()
+
+		names = enqueue.call_args.kwargs["names"]
+		self.assertIn(stuck.name, names)
+		self.assertNotIn(queued.name, names)
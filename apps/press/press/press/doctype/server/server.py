@@ -2270,6 +2270,7 @@ class Server(BaseServer):
 		use_for_new_benches: DF.Check
 		use_for_new_sites: DF.Check
 		virtual_machine: DF.Link | None
+		worker_allocation_policy: DF.Literal["Plan", "Load"]
 	# end: auto-generated types
 
 	GUNICORN_MEMORY = 150  # avg ram usage of 1 gunicorn worker
@@ -2927,17 +2928,10 @@ class Server(BaseServer):
 			self._auto_scale_workers_old()
 
 	@cached_property
-	def bench_workloads(self) -> dict["Bench", int]:
-		bench_workloads = {}
-		benches = frappe.get_all(
-			"Bench",
-			filters={"server": self.name, "status": "Active", "auto_scale_workers": True},
-			pluck="name",
-		)
-		for bench_name in benches:
-			bench = frappe.get_doc("Bench", bench_name)
-			bench_workloads[bench] = bench.workload
-		return bench_workloads
+	def bench_workloads(self) -> dict[str, float]:
+		from press.press.doctype.server.worker_allocation import get_plan_workloads
+
+		return get_plan_workloads(self.name)
 
 	@cached_property
 	def workload(self) -> int:
@@ -2958,9 +2952,11 @@ class Server(BaseServer):
 		return usable_ram_for_bg / self.BACKGROUND_JOB_MEMORY
 
 	def _auto_scale_workers_new(self, commit):
-		for bench in self.bench_workloads:
+		from press.press.doctype.server.worker_allocation import get_worker_shares
+
+		for bench_name, shares in get_worker_shares(self).items():
 			try:
-				bench.reload()
+				bench: Bench = frappe.get_doc("Bench", bench_name)
 				bench.allocate_workers(
 					self.workload,
 					self.max_gunicorn_workers,
@@ -2968,6 +2964,7 @@ class Server(BaseServer):
 					self.set_bench_memory_limits,
 					self.GUNICORN_MEMORY,
 					self.BACKGROUND_JOB_MEMORY,
+					shares=shares,
 				)
 				if commit:
 					frappe.db.commit()
@@ -2976,10 +2973,29 @@ class Server(BaseServer):
 					frappe.db.rollback()
 				continue
 			except Exception:
-				log_error("Bench Auto Scale Worker Error", bench=bench, workload=self.bench_workloads[bench])
+				log_error(
+					"Bench Auto Scale Worker Error",
+					bench=bench_name,
+					workload=self.bench_workloads[bench_name],
+				)
 				if commit:
 					frappe.db.rollback()
 
+	@frappe.whitelist()
+	def simulate_worker_allocation(self, days=7, interval=15 * 60):
+		"""Compares plan and load based worker allocation against the last days of load on this server"""
+		from press.press.doctype.server.worker_allocation import (
+			MAX_SIMULATION_DAYS,
+			MIN_SIMULATION_INTERVAL,
+			simulate_worker_allocation,
+		)
+
+		frappe.only_for("System Manager")
+		days = min(max(frappe.utils.cint(days), 1), MAX_SIMULATION_DAYS)
+		interval = max(frappe.utils.cint(interval), MIN_SIMULATION_INTERVAL)
+		end = frappe.utils.now_datetime()
+		return simulate_worker_allocation(self, end - timedelta(days=days), end, interval)
+
 	def _auto_scale_workers_old(self):  # noqa: C901
 		benches = frappe.get_all(
 			"Bench",
@@ -4,6 +4,7 @@
 from __future__ import annotations
 
 import typing
+from datetime import timedelta
 from unittest.mock import Mock, patch
 
 import frappe
@@ -21,8 +22,17 @@ from press.press.doctype.press_settings.test_press_settings import (
 from press.press.doctype.proxy_server.test_proxy_server import create_test_proxy_server
 from press.press.doctype.release_group.test_release_group import create_test_release_group
 from press.press.doctype.server.server import BaseServer
+from press.press.doctype.server.worker_allocation import (
+	LOAD_WINDOW,
+	BenchLoad,
+	damp_shares,
+	get_worker_shares,
+	load_shares,
+	plan_shares,
+	simulate_worker_allocation,
+)
 from press.press.doctype.server_plan.test_server_plan import create_test_server_plan
-from press.press.doctype.site.test_site import create_test_bench
+from press.press.doctype.site.test_site import create_test_bench, create_test_site
 from press.press.doctype.team.test_team import create_test_team
 from press.press.doctype.virtual_machine.test_virtual_machine import create_test_virtual_machine
 
@@ -265,3 +275,65 @@ class TestServer(FrappeTestCase):
 		group2.reload()
 		# Assert server removed from group2
 		self.assertFalse(any(s.server == server.name for s in group2.servers))
+
+	def test_load_based_worker_allocation_follows_measured_load(self):
+		server = create_test_server(create_test_proxy_server().name, create_test_database_server().name)
+		server.worker_allocation_policy = "Load"
+		busy = create_test_bench(server=server.name)
+		idle = create_test_bench(server=server.name)
+		frappe.db.set_value("Bench", [busy.name, idle.name], "status", "Active")
+		site = create_test_site(bench=busy.name)
+
+		def fake_site_loads(server, start, end, interval=None):
+			load = frappe._dict(request_time=10 * (interval or LOAD_WINDOW), request_p95=0.5, job_time=0)
+			if not interval:
+				return {0: {site.name: load}}
+			step = interval * 1000
+			first = int(start.timestamp() * 1000) // step * step
+			return {bucket: {site.name: load} for bucket in range(first, int(end.timestamp() * 1000), step)}
+
+		# No background job load, background workers go by plan entitlement
+		planned = plan_shares(server.bench_workloads)
+		with patch("press.api.analytics.get_site_loads_on_server", new=fake_site_loads):
+			shares = get_worker_shares(server)
+			self.assertEqual(shares[busy.name], (1.0, planned[busy.name][1]))
+			self.assertEqual(shares[idle.name], (0.0, planned[idle.name][1]))
+
+			end = frappe.utils.now_datetime()
+			result = simulate_worker_allocation(server, end - timedelta(hours=2), end)
+		self.assertEqual(set(result), {"Plan", "Load"})
+		self.assertEqual(result["Load"].gunicorn_shortfall, 0)
+		self.assertGreater(result["Load"].gunicorn_idle, 0)
+
+	def test_applied_worker_shares_damp_the_next_allocation(self):
+		server = create_test_server(create_test_proxy_server().name, create_test_database_server().name)
+		server.worker_allocation_policy = "Load"
+		first = create_test_bench(server=server.name)
+		second = create_test_bench(server=server.name)
+		frappe.db.set_value("Bench", [first.name, second.name], "status", "Active")
+		sites = [create_test_site(bench=first.name).name, create_test_site(bench=second.name).name]
+
+		def site_loads(request_times):
+			return lambda server, start, end, interval=None: {
+				0: {
+					site: frappe._dict(request_time=request_time, request_p95=0.5, job_time=0)
+					for site, request_time in zip(sites, request_times, strict=True)
+				}
+			}
+
+		background = plan_shares(server.bench_workloads)[first.name][1]
+		with patch("press.api.analytics.get_site_loads_on_server", new=site_loads((10, 10))):
+			self.assertEqual(get_worker_shares(server)[first.name], (0.5, background))
+		with patch("press.api.analytics.get_site_loads_on_server", new=site_loads((11, 10))):
+			self.assertEqual(get_worker_shares(server)[first.name], (0.5, background))
+		with patch("press.api.analytics.get_site_loads_on_server", new=site_loads((30, 10))):
+			self.assertEqual(get_worker_shares(server)[first.name], (0.75, background))
+
+	def test_load_shares_fall_back_to_plan_per_dimension(self):
+		loads = {"a": BenchLoad(request_time=10), "b": BenchLoad(request_time=30)}
+		self.assertEqual(load_shares(loads, {"a": 3, "b": 1}), {"a": (0.25, 0.75), "b": (0.75, 0.25)})
+
+	def test_worker_shares_are_damped_within_hysteresis(self):
+		applied = {"bench": (0.5, 0.5)}
+		self.assertEqual(damp_shares({"bench": (0.55, 0.45)}, applied), applied)
+		self.assertEqual(damp_shares({"bench": (0.7, 0.5)}, applied), {"bench": (0.7, 0.5)})
@@ -0,0 +1,277 @@
+# Copyright (c) 2026, Frappe and contributors
+# For license information, please see license.txt
+"""
+Policies for splitting a server's gunicorn and background workers among its benches.
+
+Plan policy splits workers in proportion to the plan CPU time of sites on each
+bench. Load policy splits them in proportion to load measured from request and
+job logs over the last LOAD_WINDOW seconds: time spent serving requests for
+gunicorn workers (weighted up for benches whose p95 latency is above
+LATENCY_TARGET) and time spent running jobs for background workers. A bench's
+share only moves once the measured share is more than HYSTERESIS away from the
+last applied one, so allocations don't flap between runs.
+
+simulate_worker_allocation replays historical load of a server's benches
+against both policies.
+"""
+
+from __future__ import annotations
+
+import typing
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+import frappe
+
+from press.press.doctype.bench.bench import (
+	MAX_BACKGROUND_WORKERS,
+	MAX_GUNICORN_WORKERS,
+	MIN_BACKGROUND_WORKERS,
+	MIN_GUNICORN_WORKERS,
+)
+from press.utils import log_error
+
+if typing.TYPE_CHECKING:
+	from press.press.doctype.server.server import Server
+
+LOAD_WINDOW = 60 * 60  # seconds
+LATENCY_TARGET = 1.0  # seconds
+MAX_LATENCY_WEIGHT = 2.0
+HYSTERESIS = 0.2
+APPLIED_SHARES_KEY = "bench_worker_shares"
+# Bounds of simulate_worker_allocation, each run queries the log server for every bucket
+MAX_SIMULATION_DAYS = 7
+MIN_SIMULATION_INTERVAL = 15 * 60  # seconds
+
+Shares = tuple[float, float]  # fraction of server's gunicorn and background workers
+
+
+@dataclass
+class BenchLoad:
+	request_time: float = 0.0  # seconds spent serving requests
+	request_p95: float = 0.0  # p95 request latency of the worst site, in seconds
+	job_time: float = 0.0  # seconds spent running background jobs
+
+	def add(self, load: BenchLoad):
+		self.request_time += load.request_time
+		self.request_p95 = max(self.request_p95, load.request_p95)
+		self.job_time += load.job_time
+
+	@property
+	def gunicorn_demand(self) -> float:
+		weight = min(MAX_LATENCY_WEIGHT, max(1.0, self.request_p95 / LATENCY_TARGET))
+		return self.request_time * weight
+
+	@property
+	def background_demand(self) -> float:
+		return self.job_time
+
+
+def get_plan_workloads(server: str) -> dict[str, float]:
+	"""Sum of plan cpu time per day of sites on each auto scaled bench, same as Bench.workload"""
+	benches = frappe.get_all(
+		"Bench",
+		filters={"server": server, "status": "Active", "auto_scale_workers": True},
+		pluck="name",
+	)
+	if not benches:
+		return {}
+
+	workloads = dict.fromkeys(benches, 0)
+	workloads.update(
+		frappe.db.sql(
+			"""
+			SELECT site.bench, SUM(plan.cpu_time_per_day)
+			FROM tabSite site
+
+			JOIN tabSubscription subscription
+			ON site.name = subscription.document_name
+
+			JOIN `tabSite Plan` plan
+			ON subscription.plan = plan.name
+
+			WHERE site.bench IN %s
+			AND site.status in ("Active", "Pending", "Updating")
+			GROUP BY site.bench
+			""",
+			(tuple(benches),),
+		)
+	)
+	return {bench: workload or 0 for bench, workload in workloads.items()}
+
+
+def get_bench_loads(
+	server: str, start: datetime, end: datetime, interval: int | None = None
+) -> dict[int, dict[str, BenchLoad]]:
+	"""Load of sites on server from get_site_loads_on_server, summed up per bench"""
+	from press.api.analytics import get_site_loads_on_server
+
+	site_loads = get_site_loads_on_server(server, start, end, interval)
+	if not site_loads:
+		return {}
+
+	site_benches = dict(frappe.get_all("Site", {"server": server}, ["name", "bench"], as_list=True))
+	bench_loads = {}
+	for bucket, sites in site_loads.items():
+		loads = bench_loads[bucket] = defaultdict(BenchLoad)
+		for site, load in sites.items():
+			if bench := site_benches.get(site):
+				loads[bench].add(BenchLoad(**load))
+	return bench_loads
+
+
+def plan_shares(workloads: dict[str, float]) -> dict[str, Shares]:
+	total = sum(workloads.values())
+	return {bench: (workload / total,) * 2 if total else (0.0, 0.0) for bench, workload in workloads.items()}
+
+
+def load_shares(loads: dict[str, BenchLoad], workloads: dict[str, float]) -> dict[str, Shares]:
+	"""Shares in proportion to load, by plan entitlement for a dimension without any load"""
+	gunicorn_total = sum(loads[bench].gunicorn_demand for bench in workloads if bench in loads)
+	background_total = sum(loads[bench].background_demand for bench in workloads if bench in loads)
+	planned = plan_shares(workloads)
+
+	shares = {}
+	for bench in workloads:
+		load = loads.get(bench, BenchLoad())
+		shares[bench] = (
+			load.gunicorn_demand / gunicorn_total if gunicorn_total else planned[bench][0],
+			load.background_demand / background_total if background_total else planned[bench][1],
+		)
+	return shares
+
+
+def damp_shares(shares: dict[str, Shares], applied: dict[str, Shares]) -> dict[str, Shares]:
+	"""Keeps the last applied shares of benches whose new shares are within HYSTERESIS of them"""
+	damped = {}
+	for bench, share in shares.items():
+		last = applied.get(bench)
+		if last and all(abs(new - old) <= HYSTERESIS * old for new, old in zip(share, last, strict=True)):
+			damped[bench] = tuple(last)
+		else:
+			damped[bench] = share
+	return damped
+
+
+def get_worker_shares(server: Server) -> dict[str, Shares]:
+	workloads = server.bench_workloads
+	if server.worker_allocation_policy != "Load":
+		return plan_shares(workloads)
+
+	end = frappe.utils.now_datetime()
+	try:
+		loads = get_bench_loads(server.name, end - timedelta(seconds=LOAD_WINDOW), end).get(0)
+	except Exception:
+		log_error("Bench Load Fetch Error", server=server.name)
+		loads = None
+	if not loads:
+		# Nothing to go by, fall back to plan entitlement
+		return plan_shares(workloads)
+
+	key = f"{APPLIED_SHARES_KEY}:{server.name}"
+	# hgetall returns field names as bytes
+	applied = {frappe.safe_decode(k): v for k, v in frappe.cache.hgetall(key).items()}
+	shares = damp_shares(load_shares(loads, workloads), applied)
+	for bench, share in shares.items():
+		frappe.cache.hset(key, bench, share)
+	return shares
+
+
+def get_worker_limits(benches: list[str]) -> dict[str, tuple[int, int, int, int]]:
+	"""Returns (min gunicorn, max gunicorn, min background, max background) workers of benches"""
+	if not benches:
+		return {}
+
+	Bench = frappe.qb.DocType("Bench")
+	ReleaseGroup = frappe.qb.DocType("Release Group")
+	rows = (
+		frappe.qb.from_(Bench)
+		.join(ReleaseGroup)
+		.on(Bench.group == ReleaseGroup.name)
+		.select(
+			Bench.name,
+			ReleaseGroup.min_gunicorn_workers,
+			ReleaseGroup.max_gunicorn_workers,
+			ReleaseGroup.min_background_workers,
+			ReleaseGroup.max_background_workers,
+		)
+		.where(Bench.name.isin(benches))
+		.run(as_dict=True)
+	)
+	return {
+		row.name: (
+			row.min_gunicorn_workers or MIN_GUNICORN_WORKERS,
+			row.max_gunicorn_workers or MAX_GUNICORN_WORKERS,
+			row.min_background_workers or MIN_BACKGROUND_WORKERS,
+			row.max_background_workers or MAX_BACKGROUND_WORKERS,
+		)
+		for row in rows
+	}
+
+
+def workers_for(share: float, capacity: float, minimum: int, maximum: int) -> int:
+	return min(maximum, max(minimum, round(share * capacity)))
+
+
+def simulate_worker_allocation(  # noqa: C901
+	server: Server, start: datetime, end: datetime, interval: int = 15 * 60
+) -> dict[str, dict]:
+	"""
+	Replays load of the server's benches between start and end against both policies
+
+	Every interval, each bench's busy workers (time spent in requests or jobs divided by
+	interval) are compared with the workers a policy would have allocated to it. Shortfall
+	is busy workers above the allocation and idle is allocation above busy workers, both
+	in worker hours. Load policy is fed the LOAD_WINDOW of load preceding each interval.
+	"""
+	workloads = server.bench_workloads
+	limits = get_worker_limits(list(workloads))
+	history = get_bench_loads(server.name, start - timedelta(seconds=LOAD_WINDOW), end, interval)
+
+	interval_ms = interval * 1000
+	first = int(start.timestamp() * 1000) // interval_ms * interval_ms
+	buckets = range(first, int(end.timestamp() * 1000), interval_ms)
+	window = max(1, LOAD_WINDOW // interval)
+
+	results = {}
+	for policy in ("Plan", "Load"):
+		result = results[policy] = frappe._dict(
+			gunicorn_shortfall=0.0,
+			gunicorn_idle=0.0,
+			background_shortfall=0.0,
+			background_idle=0.0,
+			reallocations=0,
+		)
+		shares = plan_shares(workloads)
+		previous = {}
+		for bucket in buckets:
+			if policy == "Load":
+				loads = defaultdict(BenchLoad)
+				for past in range(bucket - window * interval_ms, bucket, interval_ms):
+					for bench, load in history.get(past, {}).items():
+						loads[bench].add(load)
+				if loads:
+					shares = damp_shares(load_shares(loads, workloads), shares)
+
+			for bench, (gunicorn_share, background_share) in shares.items():
+				min_gn, max_gn, min_bg, max_bg = limits[bench]
+				allocation = (
+					workers_for(gunicorn_share, server.max_gunicorn_workers, min_gn, max_gn),
+					workers_for(background_share, server.max_bg_workers, min_bg, max_bg),
+				)
+				if bench in previous and previous[bench] != allocation:
+					result.reallocations += 1
+				previous[bench] = allocation
+
+				load = history.get(bucket, {}).get(bench, BenchLoad())
+				for kind, busy, workers in (
+					("gunicorn", load.request_time / interval, allocation[0]),
+					("background", load.job_time / interval, allocation[1]),
+				):
+					result[f"{kind}_shortfall"] += max(0.0, busy - workers) * interval / 3600
+					result[f"{kind}_idle"] += max(0.0, workers - busy) * interval / 3600
+
+		for field in ("gunicorn_shortfall", "gunicorn_idle", "background_shortfall", "background_idle"):
+			result[field] = round(result[field], 2)
+	return results
@@ -4,7 +4,7 @@
 from __future__ import annotations
 
 import functools
-from collections import deque
+from collections import defaultdict, deque
 from datetime import datetime, timedelta
 from functools import wraps
 from itertools import groupby
@@ -12,11 +12,11 @@ from time import time
 
 import frappe
 import pytz
+from frappe.query_builder.functions import Max
 
 from press.press.doctype.press_settings.press_settings import PressSettings
 from press.press.doctype.remote_file.remote_file import delete_remote_backup_objects
 from press.press.doctype.site.site import Literal, Site
-from press.press.doctype.site_backup.site_backup import SiteBackup
 from press.press.doctype.subscription.subscription import Subscription
 from press.utils import log_error
 
@@ -34,6 +34,7 @@ def timing(f):
 
 
 BACKUP_TYPES = Literal["Logical", "Physical"]
+BACKUP_JOB_TYPES = ("Backup Site", "Physical Backup Database")
 
 
 class BackupRotationScheme:
@@ -256,6 +257,20 @@ class ScheduledBackupJob:
 			or 6
 		)
 
+		self.capacity_aware = frappe.get_cached_value(
+			"Press Settings", "Press Settings", "use_capacity_aware_backup_scheduling"
+		)
+		self.max_concurrent_backups_per_server = (
+			frappe.get_cached_value("Press Settings", "Press Settings", "max_concurrent_backups_per_server")
+			or 0
+		)
+		self.max_backup_size_in_flight_per_server = (
+			frappe.get_cached_value(
+				"Press Settings", "Press Settings", "max_backup_size_in_flight_per_server"
+			)
+			or 0
+		)
+
 		self.offsite_setup = PressSettings.is_offsite_setup()
 		self.server_time = datetime.now()
 		self.sites = Site.get_sites_for_backup(self.interval, backup_type=self.backup_type)
@@ -264,11 +279,106 @@ class ScheduledBackupJob:
 		else:
 			self.sites_without_offsite = []
 
+		self.failed_backup_attempts: dict[str, int] = {}
+		self.sites_with_offsite_backup: set[str] = set()
+		self.sites_with_file_backup: set[str] = set()
+		self.database_sizes: dict[str, int] = {}
+		self.server_loads: dict[str, frappe._dict] = {}
+		self.backup_servers: dict[str, str] = {}
+
+	def prefetch(self, day: datetime.date):
+		"""Fetch failed attempts and successful backups of day for all sites in grouped queries"""
+		self.failed_backup_attempts = dict(
+			frappe.get_all(
+				"Site Backup",
+				filters={
+					"status": ("in", ["Failure", "Delivery Failure"]),
+					"physical": self.backup_type == "Physical",
+					"creation": (">=", frappe.utils.add_days(None, -1)),
+				},
+				fields=["site", "count(*) as count"],
+				group_by="site",
+				as_list=True,
+			)
+		)
+		if self.backup_type != "Logical":
+			return
+
+		backups = frappe.get_all(
+			"Site Backup",
+			filters={"creation": ("between", [day, day]), "status": "Success"},
+			or_filters={"offsite": True, "with_files": True},
+			fields=["site", "offsite", "with_files"],
+		)
+		self.sites_with_offsite_backup = {backup.site for backup in backups if backup.offsite}
+		self.sites_with_file_backup = {backup.site for backup in backups if backup.with_files}
+
+	def prefetch_server_loads(self):
+		"""Fetch database sizes of candidate sites and backups already in flight on their servers"""
+		servers = list({site.server for site in self.sites})
+		self.backup_servers = {server: server for server in servers}
+		if self.backup_type == "Physical":
+			# Physical backups run on the database server of the site
+			self.backup_servers = dict(
+				frappe.get_all(
+					"Server",
+					filters={"name": ("in", servers)},
+					fields=["name", "database_server"],
+					as_list=True,
+				)
+			)
+
+		in_flight = frappe.get_all(
+			"Agent Job",
+			filters={
+				"job_type": ("in", BACKUP_JOB_TYPES),
+				"status": ("in", ["Undelivered", "Pending", "Running"]),
+				"server": ("in", list({server for server in self.backup_servers.values() if server})),
+			},
+			fields=["server", "site"],
+		)
+		self.database_sizes = get_database_sizes(
+			list({site.name for site in self.sites} | {job.site for job in in_flight if job.site})
+		)
+		self.server_loads = defaultdict(lambda: frappe._dict(backups=0, size=0))
+		for job in in_flight:
+			load = self.server_loads[job.server]
+			load.backups += 1
+			load.size += self.database_sizes.get(job.site, 0)
+
+	def get_backup_server(self, site: frappe._dict) -> str:
+		return self.backup_servers.get(site.server) or site.server
+
+	def has_capacity(self, site: frappe._dict) -> bool:
+		"""Return true if backup of site fits in the concurrency and size budget of its server"""
+		if not self.capacity_aware:
+			return True
+
+		load = self.server_loads[self.get_backup_server(site)]
+		if self.max_concurrent_backups_per_server and load.backups >= self.max_concurrent_backups_per_server:
+			return False
+
+		# A site larger than the whole budget still gets a backup once its server is idle
+		size = self.database_sizes.get(site.name, 0)
+		return not (
+			self.max_backup_size_in_flight_per_server
+			and load.backups
+			and load.size + size > self.max_backup_size_in_flight_per_server
+		)
+
+	def reserve_capacity(self, site: frappe._dict):
+		if not self.capacity_aware:
+			return
+
+		load = self.server_loads[self.get_backup_server(site)]
+		load.backups += 1
+		load.size += self.database_sizes.get(site.name, 0)
+
 	def take_offsite(self, site: frappe._dict, day: datetime.date) -> bool:
 		return (
 			self.offsite_setup
 			and site.name not in self.sites_without_offsite
-			and not SiteBackup.offsite_backup_exists(site.name, day)
+			and site.name not in self.sites_with_offsite_backup
 		)
 
 	def get_site_time(self, site: dict[str, str]) -> datetime:
@@ -278,9 +388,17 @@ class ScheduledBackupJob:
 
 	def start(self):
 		"""Schedule backups for all Active sites based on their local timezones. Also trigger offsite backups once a day."""
+		self.prefetch(frappe.utils.getdate())
+		if self.capacity_aware:
+			self.prefetch_server_loads()
+
 		sites_by_server = []
 		for server, sites in groupby(self.sites, lambda d: d.server):
-			sites_by_server.append((server, iter(list(sites))))
+			sites = list(sites)
+			if self.capacity_aware:
+				# Largest first, so that long dumps start early and smaller ones fill the remaining budget
+				sites.sort(key=lambda site: self.database_sizes.get(site.name, 0), reverse=True)
+			sites_by_server.append((server, iter(sites)))
 
 		sites_by_server_cycle = ModifiableCycle(sites_by_server)
 		self._take_backups_in_round_robin(sites_by_server_cycle)
@@ -290,11 +408,12 @@ class ScheduledBackupJob:
 		for _server, sites in sites_by_server_cycle:
 			try:
 				site = next(sites)
-				while not self.backup(site):
+				while not (self.has_capacity(site) and self.backup(site)):
 					site = next(sites)
 			except StopIteration:
 				sites_by_server_cycle.delete_prev()  # no more sites in this server
 				continue
+			self.reserve_capacity(site)
 			limit -= 1
 			if limit <= 0:
 				break
@@ -303,18 +422,7 @@ class ScheduledBackupJob:
 		"""Return true if backup was taken."""
 		try:
 			site_time = self.get_site_time(site)
-			failed_backup_attempts_in_a_day = frappe.db.count(
-				"Site Backup",
-				{
-					"site": site.name,
-					"status": ("in", ["Failure", "Delivery Failure"]),
-					"physical": self.backup_type == "Physical",
-					"creation": [
-						">=",
-						frappe.utils.add_days(None, -1),
-					],
-				},
-			)
+			failed_backup_attempts_in_a_day = self.failed_backup_attempts.get(site.name, 0)
 			if (
 				self.is_backup_hour(site_time.hour)
 				and failed_backup_attempts_in_a_day <= self.max_failed_backup_attempts_in_a_day
@@ -327,7 +435,7 @@ class ScheduledBackupJob:
 				"""
 				offsite = self.backup_type == "Logical" and self.take_offsite(site, today)
 				with_files = self.backup_type == "Logical" and (
-					offsite or not SiteBackup.file_backup_exists(site.name, today)
+					offsite or site.name not in self.sites_with_file_backup
 				)
 
 				frappe.get_doc("Site", site.name).backup(
@@ -345,6 +453,28 @@ class ScheduledBackupJob:
 			frappe.db.rollback()
 
 
+def get_database_sizes(sites: list[str]) -> dict[str, int]:
+	"""Return database size (MB) of sites from their latest Site Usage"""
+	if not sites:
+		return {}
+
+	SiteUsage = frappe.qb.DocType("Site Usage")
+	latest = (
+		frappe.qb.from_(SiteUsage)
+		.select(SiteUsage.site, Max(SiteUsage.creation).as_("creation"))
+		.where(SiteUsage.site.isin(sites))
+		.groupby(SiteUsage.site)
+	)
+	usage = (
+		frappe.qb.from_(SiteUsage)
+		.join(latest)
+		.on((SiteUsage.site == latest.site) & (SiteUsage.creation == latest.creation))
+		.select(SiteUsage.site, SiteUsage.database)
+		.run()
+	)
+	return dict(usage)
+
+
 def schedule_logical_backups_for_sites_with_backup_time():
 	"""
 	Schedule logical backups for sites with backup time.
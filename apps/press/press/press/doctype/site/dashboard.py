@@ -0,0 +1,178 @@
+# Copyright (c) 2026, Frappe and contributors
+# For license information, please see license.txt
+"""
+Payload of the site page on the dashboard.
+
+Everything specific to the site is read in one query, joining release group,
+team, server, proxy server and account request, with subqueries for the
+latest usage, activity and broken domain of the site. Reference data shared by
+every site (Frappe versions, plans and clusters) is kept in process and
+rebuilt when its version in Redis changes. The version is bumped after commit
+whenever one of those documents changes. The data also expires every
+REFERENCE_DATA_TTL seconds, to pick up changes made without hooks.
+"""
+
+from __future__ import annotations
+
+import time
+import typing
+from functools import partial
+
+import frappe
+from frappe.model import default_fields
+
+from press.access import dashboard_access_rules
+
+if typing.TYPE_CHECKING:
+	from press.press.doctype.site.site import Site
+	from press.press.doctype.site_plan.site_plan import SitePlan
+
+REFERENCE_DATA_VERSION_KEY = "site_dashboard_reference_data_version"
+REFERENCE_DATA_TTL = 10 * 60  # seconds
+
+# Process wide, shared by every request served by this worker
+_reference_data: dict[str, typing.Any] = {"key": None, "expires_at": 0, "data": None}
+
+
+def get_reference_data() -> frappe._dict:
+	# Plan prices per day depend on the length of the month, so the date is a part of the key
+	key = (frappe.cache.get_value(REFERENCE_DATA_VERSION_KEY), frappe.utils.today())
+	if _reference_data["key"] != key or _reference_data["expires_at"] < time.monotonic():
+		_reference_data.update(
+			key=key,
+			expires_at=time.monotonic() + REFERENCE_DATA_TTL,
+			data=fetch_reference_data(),
+		)
+	return _reference_data["data"]
+
+
+def fetch_reference_data() -> frappe._dict:
+	plans = {}
+	for plan in frappe.get_all("Site Plan", pluck="name"):
+		doc: SitePlan = frappe.get_doc("Site Plan", plan)
+		payload = frappe._dict({field: doc.get(field) for field in (*default_fields, *doc.dashboard_fields)})
+		plans[plan] = doc.get_doc(payload) or payload
+
+	return frappe._dict(
+		latest_frappe_version=frappe.db.get_value(
+			"Frappe Version", {"status": "Stable", "public": True}, order_by="name desc"
+		),
+		eol_versions=frappe.get_all(
+			"Frappe Version", filters={"status": "End of Life"}, order_by="name desc", pluck="name"
+		),
+		clusters={
+			cluster.name: frappe._dict(title=cluster.title, image=cluster.image)
+			for cluster in frappe.get_all("Cluster", fields=["name", "title", "image"])
+		},
+		plans=plans,
+	)
+
+
+def clear_reference_data():
+	"""Drops reference data of this process, it is fetched again on next use"""
+	_reference_data.update(key=None, expires_at=0, data=None)
+
+
+def invalidate_reference_data(doc=None, method=None):
+	frappe.db.after_commit.add(clear_reference_data)
+	frappe.db.after_commit.add(
+		partial(frappe.cache.set_value, REFERENCE_DATA_VERSION_KEY, frappe.generate_hash(length=8))
+	)
+
+
+def get_site_info(site: str) -> frappe._dict:
+	return frappe.db.sql(
+		"""
+		SELECT
+			release_group.title AS group_title,
+			release_group.version AS version,
+			release_group.team AS group_team,
+			release_group.public OR release_group.central_bench AS group_public,
+			team.user AS owner_email,
+			server.ip AS outbound_ip,
+			server.team AS server_team,
+			server.title AS server_title,
+			server.public AS server_public,
+			IF(server.is_standalone, server.ip, proxy_server.ip) AS inbound_ip,
+			account_request.email AS signup_by,
+			EXISTS(
+				SELECT 1 FROM `tabSite Update` site_update
+				WHERE site_update.site = site.name AND site_update.status = 'Scheduled'
+			) AS has_scheduled_updates,
+			(
+				SELECT MAX(activity.creation) FROM `tabSite Activity` activity
+				WHERE activity.site = site.name AND activity.action = 'Update'
+			) AS last_updated,
+			(
+				SELECT activity.reason FROM `tabSite Activity` activity
+				WHERE activity.site = site.name AND activity.action = 'Suspend Site'
+				ORDER BY activity.creation DESC LIMIT 1
+			) AS suspension_reason,
+			site_usage.`database` AS database_usage,
+			site_usage.public AS public_usage,
+			site_usage.private AS private_usage,
+			tls_certificate.name AS broken_domain_tls_certificate,
+			tls_certificate.error AS broken_domain_error,
+			tls_certificate.retry_count AS tls_cert_retry_count
+		FROM tabSite site
+		LEFT JOIN `tabRelease Group` release_group ON release_group.name = site.group
+		LEFT JOIN tabTeam team ON team.name = site.team
+		LEFT JOIN tabServer server ON server.name = site.server
+		LEFT JOIN `tabProxy Server` proxy_server ON proxy_server.name = server.proxy_server
+		LEFT JOIN `tabAccount Request` account_request ON account_request.name = site.account_request
+		LEFT JOIN `tabSite Usage` site_usage ON site_usage.name = (
+			SELECT latest_usage.name FROM `tabSite Usage` latest_usage
+			WHERE latest_usage.site = site.name
+			ORDER BY latest_usage.creation DESC LIMIT 1
+		)
+		LEFT JOIN `tabTLS Certificate` tls_certificate ON tls_certificate.name = (
+			SELECT domain.tls_certificate FROM `tabSite Domain` domain
+			WHERE domain.site = site.name AND domain.status = 'Broken'
+			LIMIT 1
+		)
+		WHERE site.name = %s
+		""",
+		(site,),
+		as_dict=True,
+	)[0]
+
+
+def get_dashboard_payload(site: Site, doc: frappe._dict) -> frappe._dict:
+	reference = get_reference_data()
+	info = get_site_info(site.name)
+
+	doc.group_title = info.group_title
+	doc.version = info.version
+	doc.group_team = info.group_team
+	doc.group_public = info.group_public
+	doc.latest_frappe_version = reference.latest_frappe_version
+	doc.eol_versions = reference.eol_versions
+	doc.owner_email = info.owner_email
+	doc.current_usage = site.get_current_usage(info.database_usage, info.public_usage, info.private_usage)
+	doc.current_plan = (
+		dashboard_access_rules(frappe._dict(reference.plans[site.plan]))
+		if site.plan in reference.plans
+		else None
+	)
+	doc.last_updated = info.last_updated
+	doc.has_scheduled_updates = bool(info.has_scheduled_updates)
+	doc.update_information = site.get_update_information()
+	doc.actions = site.get_actions()
+	doc.cluster = reference.clusters.get(site.cluster)
+	doc.outbound_ip = info.outbound_ip
+	doc.server_team = info.server_team
+	doc.server_title = info.server_title
+	doc.inbound_ip = info.inbound_ip
+	doc.is_dedicated_server = not info.server_public
+	doc.suspension_reason = info.suspension_reason if site.status == "Suspended" else None
+	doc.communication_infos = site.get_communication_infos()
+	if doc.owner == "Administrator":
+		doc.signup_by = info.signup_by
+
+	if info.broken_domain_tls_certificate:
+		doc.broken_domain_error, doc.tls_cert_retry_count = (
+			info.broken_domain_error,
+			info.tls_cert_retry_count,
+		)
+
+	return doc
@@ -28,12 +28,12 @@ class SaasSitePool:
 
 	def create(self):
 		if self.saas_settings.enable_pooling:
-			if self.site_count < self.saas_settings.standby_pool_size:
-				sites_created = 0
-				while sites_created < self.saas_settings.standby_queue_size:
-					self.create_one()
-					frappe.db.commit()
-					sites_created += 1
+			sites_to_create = min(
+				self.saas_settings.standby_pool_size - self.site_count, self.saas_settings.standby_queue_size
+			)
+			for _i in range(sites_to_create):
+				self.create_one()
+				frappe.db.commit()
 
 			if frappe.db.get_value("Saas Settings", self.app, "enable_hybrid_pools"):
 				self.create_hybrid_pool_sites()
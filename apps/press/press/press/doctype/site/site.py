@@ -73,7 +73,6 @@ from press.press.doctype.marketplace_app.marketplace_app import (
 	marketplace_app_hook,
 )
 from press.press.doctype.resource_tag.tag_helpers import TagHelpers
-from press.press.doctype.server.server import is_dedicated_server
 from press.press.doctype.site_activity.site_activity import log_site_activity
 from press.press.doctype.site_analytics.site_analytics import create_site_analytics
 from press.press.doctype.site_plan.site_plan import UNLIMITED_PLANS, get_plan_config
@@ -300,61 +299,9 @@ class Site(Document, TagHelpers):
 		return Agent(self.database_server_name, server_type="Database Server")
 
 	def get_doc(self, doc):
-		from press.api.client import get
+		from press.press.doctype.site.dashboard import get_dashboard_payload
 
-		group = frappe.db.get_value(
-			"Release Group",
-			self.group,
-			["title", "public", "team", "central_bench", "version"],
-			as_dict=1,
-		)
-		doc.group_title = group.title
-		doc.version = group.version
-		doc.group_team = group.team
-		doc.group_public = group.public or group.central_bench
-		doc.latest_frappe_version = frappe.db.get_value(
-			"Frappe Version", {"status": "Stable", "public": True}, order_by="name desc"
-		)
-		doc.eol_versions = frappe.db.get_all(
-			"Frappe Version",
-			filters={"status": "End of Life"},
-			fields=["name"],
-			order_by="name desc",
-			pluck="name",
-		)
-		doc.owner_email = frappe.db.get_value("Team", self.team, "user")
-		doc.current_usage = self.current_usage
-		doc.current_plan = get("Site Plan", self.plan) if self.plan else None
-		doc.last_updated = self.last_updated
-		doc.has_scheduled_updates = bool(
-			frappe.db.exists("Site Update", {"site": self.name, "status": "Scheduled"})
-		)
-		doc.update_information = self.get_update_information()
-		doc.actions = self.get_actions()
-		server = frappe.get_value("Server", self.server, ["ip", "proxy_server", "team", "title"], as_dict=1)
-		doc.cluster = frappe.db.get_value("Cluster", self.cluster, ["title", "image"], as_dict=1)
-		doc.outbound_ip = server.ip
-		doc.server_team = server.team
-		doc.server_title = server.title
-		doc.inbound_ip = self.inbound_ip
-		doc.is_dedicated_server = is_dedicated_server(self.server)
-		doc.suspension_reason = (
-			frappe.db.get_value("Site Activity", {"site": self.name, "action": "Suspend Site"}, "reason")
-			if self.status == "Suspended"
-			else None
-		)
-		doc.communication_infos = self.get_communication_infos()
-		if doc.owner == "Administrator":
-			doc.signup_by = frappe.db.get_value("Account Request", doc.account_request, "email")
-
-		if broken_domain_tls_certificate := frappe.db.get_value(
-			"Site Domain", {"site": self.name, "status": "Broken"}, "tls_certificate"
-		):
-			doc.broken_domain_error, doc.tls_cert_retry_count = frappe.db.get_values(
-				"TLS Certificate", broken_domain_tls_certificate, ("error", "retry_count")
-			)[0]
-
-		return doc
+		return get_dashboard_payload(self, doc)
 
 	def site_action(allowed_status: list[str], disallowed_message: str | dict[str, str] | None = None):
 		def outer_wrapper(func):
@@ -3025,8 +2972,6 @@ class Site(Document, TagHelpers):
 
 	@property
 	def current_usage(self):
-		from press.api.analytics import get_current_cpu_usage
-
 		result = frappe.db.get_all(
 			"Site Usage",
 			fields=["database", "public", "private"],
@@ -3035,6 +2980,10 @@ class Site(Document, TagHelpers):
 			limit=1,
 		)
 		usage = result[0] if result else {}
+		return self.get_current_usage(usage.get("database"), usage.get("public"), usage.get("private"))
+
+	def get_current_usage(self, database, public, private):
+		from press.api.analytics import get_current_cpu_usage
 
 		# number of hours until cpu usage resets
 		now = frappe.utils.now_datetime()
@@ -3043,8 +2992,8 @@ class Site(Document, TagHelpers):
 
 		return {
 			"cpu": flt(get_current_cpu_usage(self.name) / (3.6 * (10**9)), 5),
-			"storage": usage.get("public", 0) + usage.get("private", 0),
-			"database": usage.get("database", 0),
+			"storage": (public or 0) + (private or 0),
+			"database": database or 0,
 			"hours_until_cpu_usage_resets": hours_left_today,
 		}
 
@@ -4172,6 +4121,10 @@ def process_marketplace_hooks_for_backup_restore(apps_from_backup: set[str], sit
 			marketplace_app_hook(app=app, site=site, op="uninstall")
 
 
+def process_restore_from_backup_job_update(job):
+	process_restore_job_update(job, force=True)
+
+
 def process_restore_job_update(job, force=False):
 	"""
 	force: force updates apps table sync
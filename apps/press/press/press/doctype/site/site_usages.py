@@ -1,16 +1,26 @@
 import functools
+import json
+import time
 from typing import TYPE_CHECKING
 
 import frappe
 import rq
 
-from press.api.analytics import get_current_cpu_usage_for_sites_on_server
+from press.api.analytics import get_cpu_usage_counters_for_sites_on_server
 from press.press.doctype.site_plan.site_plan import get_plan_config
-from press.utils import log_error
+from press.utils import chunk, log_error
 
 if TYPE_CHECKING:
 	from press.press.doctype.site.site import Site
 
+CPU_USAGE_COUNTERS_KEY = "site_cpu_usage_counters"
+CPU_USAGE_WATERMARK_KEY = "site_cpu_usage_watermark"
+# Usage is the latest counter logged in the last day
+CPU_USAGE_WINDOW = 24 * 60 * 60 * 1000
+# Logs reach the log server late, so every run re-reads this much before the watermark
+CPU_USAGE_LOG_LAG = 10 * 60 * 1000
+DISK_USAGE_CHUNK_SIZE = 500
+
 
 @functools.lru_cache(maxsize=128)
 def get_cpu_limit(plan):
@@ -46,32 +56,93 @@ def update_cpu_usages():
 
 
 def update_cpu_usage_server(server):
-	usage = get_current_cpu_usage_for_sites_on_server(server)
+	"""
+	Update Site.current_cpu_usage of sites on server from request logs
+
+	Latest request counter of each site is kept in Redis along with its log timestamp, so only
+	logs after the stored watermark are read on every run. Counters older than a day are
+	dropped, same as the one day window the usage is computed over.
+	"""
+	now = int(time.time() * 1000)
+	window_start = now - CPU_USAGE_WINDOW
+	watermark = frappe.cache.get_value(f"{CPU_USAGE_WATERMARK_KEY}:{server}")
+	since = max(watermark - CPU_USAGE_LOG_LAG, window_start) if watermark else window_start
+
+	try:
+		fetched = get_cpu_usage_counters_for_sites_on_server(server, since)
+	except Exception:
+		log_error("Site CPU Usage Fetch Error", server=server)
+		return
+
+	counters = get_cpu_usage_counters(server)
+	changed = {
+		site: counter
+		for site, counter in fetched.items()
+		if site not in counters or counter[0] > counters[site][0]
+	}
+	counters.update(changed)
+	expired = [site for site, (timestamp, _) in counters.items() if timestamp < window_start]
+	usage = {site: counter for site, (timestamp, counter) in counters.items() if timestamp >= window_start}
+
+	try:
+		apply_cpu_usages(server, usage)
+	except rq.timeouts.JobTimeoutException:
+		frappe.db.rollback()
+		return
+	except Exception:
+		log_error("Site CPU Usage Update Error", server=server)
+		frappe.db.rollback()
+		return
+
+	save_cpu_usage_counters(server, changed, expired, watermark=now)
+
+
+def get_cpu_usage_counters(server: str) -> dict[str, tuple[int, int]]:
+	# Values are json, read them through a raw pipeline instead of frappe.cache.hgetall which unpickles
+	key = frappe.cache.make_key(f"{CPU_USAGE_COUNTERS_KEY}:{server}")
+	pipe = frappe.cache.pipeline()
+	pipe.hgetall(key)
+	(counters,) = pipe.execute()
+	return {site.decode(): tuple(json.loads(counter)) for site, counter in counters.items()}
+
+
+def save_cpu_usage_counters(server: str, changed: dict, expired: list[str], watermark: int):
+	key = frappe.cache.make_key(f"{CPU_USAGE_COUNTERS_KEY}:{server}")
+	pipe = frappe.cache.pipeline()
+	if changed:
+		pipe.hset(key, mapping={site: json.dumps(counter) for site, counter in changed.items()})
+	if expired:
+		pipe.hdel(key, *expired)
+	pipe.execute()
+	frappe.cache.set_value(f"{CPU_USAGE_WATERMARK_KEY}:{server}", watermark)
+
+
+def apply_cpu_usages(server: str, usage: dict[str, int]):
+	"""Write changed usage percentages of sites on server with a single bulk update"""
 	sites = frappe.get_all(
 		"Site",
 		filters={"status": "Active", "server": server},
 		fields=["name", "plan", "current_cpu_usage"],
 	)
 
+	updates = {}
 	for site in sites:
 		if site.name not in usage:
 			continue
+		cpu_usage = usage[site.name]
 		try:
-			cpu_usage = usage[site.name]
 			cpu_limit = get_cpu_limits(site.plan)
 			latest_cpu_usage = int((cpu_usage / cpu_limit) * 100)
-
-			if site.current_cpu_usage != latest_cpu_usage:
-				site_doc = frappe.get_doc("Site", site.name)
-				site_doc.current_cpu_usage = latest_cpu_usage
-				site_doc.save()
-				frappe.db.commit()
-		except rq.timeouts.JobTimeoutException:
-			frappe.db.rollback()
-			return
 		except Exception:
-			log_error("Site CPU Usage Update Error", site=site, cpu_usage=cpu_usage, cpu_limit=cpu_limit)
-			frappe.db.rollback()
+			log_error("Site CPU Usage Update Error", site=site, cpu_usage=cpu_usage)
+			continue
+
+		if site.current_cpu_usage != latest_cpu_usage:
+			updates[site.name] = {"current_cpu_usage": latest_cpu_usage}
+
+	if updates:
+		frappe.db.bulk_update("Site", updates, chunk_size=len(updates))
+		frappe.db.commit()
 
 
 def update_disk_usages():
@@ -94,6 +165,11 @@ def update_disk_usages():
 				u.site,
 				site.current_database_usage,
 				site.current_disk_usage,
+				site.status,
+				site.status_before_update,
+				site.site_usage_exceeded,
+				site.free OR IFNULL(team.free_account, 0) OR site.disable_site_usage_exceed_check
+					OR NOT IFNULL(server.public, 0) AS skip_exceeded_check,
 				CAST(u.database / plan.max_database_usage * 100 AS INTEGER) AS latest_database_usage,
 				CAST(u.disk / plan.max_storage_usage * 100 AS INTEGER) AS latest_disk_usage
 			FROM
@@ -110,15 +186,21 @@ def update_disk_usages():
 				`tabSite Plan` plan
 			ON
 				s.plan = plan.name
+			LEFT JOIN
+				`tabTeam` team
+			ON
+				site.team = team.name
+			LEFT JOIN
+				`tabServer` server
+			ON
+				site.server = server.name
 			WHERE
 				`rank` = 1 AND
 				s.`document_type` = 'Site' AND
 				site.`status` != "Archived"
 		)
 		SELECT
-			j.site,
-			j.latest_database_usage,
-			j.latest_disk_usage
+			j.*
 		FROM
 			joined j
 		WHERE
@@ -129,16 +211,68 @@ def update_disk_usages():
 		as_dict=True,
 	)
 
-	for usage in latest_disk_usages:
+	for usages in chunk(latest_disk_usages, DISK_USAGE_CHUNK_SIZE):
 		try:
-			site: Site = frappe.get_doc("Site", usage.site, for_update=True)
-			site.current_database_usage = usage.latest_database_usage
-			site.current_disk_usage = usage.latest_disk_usage
-			site.check_if_disk_usage_exceeded(save=False)
-			site.save()
+			sites_to_unsuspend = apply_disk_usages(usages)
 			frappe.db.commit()
-		except frappe.DoesNotExistError:
+		except rq.timeouts.JobTimeoutException:
 			frappe.db.rollback()
+			return
 		except Exception:
-			log_error("Site Disk Usage Update Error", usage=usage)
+			log_error("Site Disk Usage Update Error", usages=usages)
 			frappe.db.rollback()
+			continue
+
+		# Only sites that went back under the limit while suspended need the full document
+		for name in sites_to_unsuspend:
+			try:
+				site: Site = frappe.get_doc("Site", name, for_update=True)
+				site.reset_disk_usage_exceeded_status()
+				frappe.db.commit()
+			except Exception:
+				log_error("Site Disk Usage Update Error", site=name)
+				frappe.db.rollback()
+
+
+def apply_disk_usages(usages: list[dict]) -> list[str]:
+	"""
+	Write latest usages and disk usage exceeded flags of sites with a single bulk update
+
+	Evaluates the same rule as Site.check_if_disk_usage_exceeded over all rows. Returns
+	sites that are suspended and no longer exceed their limits.
+	"""
+	now = frappe.utils.now_datetime()
+	updates = {}
+	sites_to_unsuspend = []
+	for usage in usages:
+		update = updates[usage.site] = {
+			"current_database_usage": usage.latest_database_usage,
+			"current_disk_usage": usage.latest_disk_usage,
+		}
+		if usage.skip_exceeded_check:
+			continue
+
+		exceeded = usage.latest_database_usage > 120 or usage.latest_disk_usage > 120
+		if exceeded and usage.site_usage_exceeded:
+			update["site_usage_exceeded_last_checked_on"] = now
+		elif exceeded:
+			update.update(
+				site_usage_exceeded=True,
+				site_usage_exceeded_on=now,
+				site_usage_exceeded_last_checked_on=now,
+			)
+		elif usage.site_usage_exceeded and usage.status == "Suspended":
+			# Unsuspending needs the document, reset_disk_usage_exceeded_status does the rest
+			sites_to_unsuspend.append(usage.site)
+		elif usage.site_usage_exceeded:
+			update.update(
+				site_usage_exceeded=False,
+				site_usage_exceeded_on=None,
+				site_usage_exceeded_last_checked_on=None,
+				last_site_usage_warning_mail_sent_on=None,
+			)
+			if usage.status_before_update == "Suspended":
+				update["status_before_update"] = "Active"
+
+	frappe.db.bulk_update("Site", updates, chunk_size=len(updates))
+	return sites_to_unsuspend
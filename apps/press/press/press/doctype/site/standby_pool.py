@@ -0,0 +1,115 @@
+# Copyright (c) 2026, Frappe and contributors
+# For license information, please see license.txt
+"""
+Sizing of standby site pools from forecast signups.
+
+Signups of the last FORECAST_DAYS days are folded into an hourly profile per
+pool (e.g. per cluster of a product), an exponentially weighted average of
+signups in each hour of the day with recent days weighing more. The signups
+expected while a new standby site is being built are read off the profile, and
+the pool is sized so that, with signups arriving as a Poisson process, the
+expected share of them served from standby meets the target rate.
+"""
+
+from __future__ import annotations
+
+import math
+import typing
+from collections import defaultdict
+from statistics import median, quantiles
+
+import frappe
+
+if typing.TYPE_CHECKING:
+	from datetime import datetime
+
+FORECAST_DAYS = 28
+FORECAST_DECAY = 0.85  # weight of a day relative to the day after it
+DEFAULT_LEAD_TIME = 60 * 60  # seconds to build a standby site, when there is no history to go by
+MIN_LEAD_TIME = 10 * 60
+MAX_LEAD_TIME = 6 * 60 * 60
+
+
+def get_hourly_profiles(rows: list[tuple]) -> dict[str | None, list[float]]:
+	"""
+	Returns {pool: expected signups in each hour of the day}
+
+	rows are (pool, days ago, hour of day, signups)
+	"""
+	total_weight = sum(FORECAST_DECAY**day for day in range(FORECAST_DAYS))
+	profiles = defaultdict(lambda: [0.0] * 24)
+	for pool, days_ago, hour, signups in rows:
+		profiles[pool][int(hour)] += signups * FORECAST_DECAY ** int(days_ago) / total_weight
+	return profiles
+
+
+def get_signup_history(doctype: str, filters: dict, pool_field: str | None = None) -> list[tuple]:
+	"""Signups (documents of doctype) of the last FORECAST_DAYS days by pool, days ago and hour of day"""
+	Signup = frappe.qb.DocType(doctype)
+	now = frappe.utils.now_datetime()
+	days_ago = frappe.qb.functions("DATEDIFF", now, Signup.creation)
+	hour = frappe.qb.functions("HOUR", Signup.creation)
+	pool = Signup[pool_field] if pool_field else frappe.qb.terms.ValueWrapper(None)
+	query = (
+		frappe.qb.from_(Signup)
+		.select(pool, days_ago, hour, frappe.qb.functions("COUNT", "*"))
+		.where(Signup.creation >= frappe.utils.add_days(now, -FORECAST_DAYS))
+		.groupby(pool, days_ago, hour)
+	)
+	for field, value in filters.items():
+		query = query.where(Signup[field] == value)
+	return query.run()
+
+
+def expected_signups(profile: list[float], start: datetime, seconds: float) -> float:
+	"""Signups expected in the seconds after start"""
+	hours = seconds / 3600
+	expected = 0.0
+	for offset in range(math.ceil(hours)):
+		share = min(1.0, hours - offset)
+		expected += profile[(start.hour + offset) % 24] * share
+	return expected
+
+
+def served_from_standby_rate(pool_size: int, expected: float) -> float:
+	"""Expected share of Poisson(expected) signups served by pool_size standby sites, E[min(N, n)] / E[N]"""
+	if expected <= 0:
+		return 1.0
+
+	served = 0.0
+	probability = math.exp(-expected)  # P(N = 0)
+	at_most = probability  # P(N <= k)
+	for k in range(pool_size):
+		served += 1 - at_most  # P(N > k)
+		probability *= expected / (k + 1)
+		at_most += probability
+	return served / expected
+
+
+def get_pool_size(expected: float, target_rate: float, max_size: int) -> int:
+	"""Smallest pool size that serves target_rate of expected signups, capped at max_size"""
+	size = 0
+	while size < max_size and served_from_standby_rate(size, expected) < target_rate:
+		size += 1
+	return size
+
+
+def get_lead_time(durations: list[float]) -> float:
+	"""Seconds a new standby site takes to be ready, from durations of recent site builds"""
+	if not durations:
+		return DEFAULT_LEAD_TIME
+	return min(MAX_LEAD_TIME, max(MIN_LEAD_TIME, sum(durations) / len(durations)))
+
+
+def summarize_durations(durations: list[float]) -> dict[str, float | None]:
+	"""Average, median and p95 of durations in seconds"""
+	if not durations:
+		return {"avg": None, "p50": None, "p95": None}
+	if len(durations) == 1:
+		return dict.fromkeys(("avg", "p50", "p95"), round(durations[0], 1))
+	percentiles = quantiles(durations, n=100, method="inclusive")
+	return {
+		"avg": round(sum(durations) / len(durations), 1),
+		"p50": round(median(durations), 1),
+		"p95": round(percentiles[94], 1),
+	}
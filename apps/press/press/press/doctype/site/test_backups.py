@@ -117,6 +117,74 @@ class TestScheduledBackupJob(FrappeTestCase):
 		self.assertLess(sites_num_new, sites_num_old)
 		self.assertEqual(sites_num_old - sites_num_new, limit)
 
+	@patch.object(
+		ScheduledBackupJob,
+		"is_backup_hour",
+		new=lambda self, x: True,  # always backup hour
+	)
+	def test_sites_with_too_many_failed_backups_are_skipped(self):
+		site = self._create_site_requiring_backup()
+		healthy_site = self._create_site_requiring_backup()
+		job = ScheduledBackupJob(backup_type="Logical")
+		for _i in range(job.max_failed_backup_attempts_in_a_day + 1):
+			create_test_site_backup(site.name, offsite=False, status="Failure")
+
+		job.start()
+
+		self.assertEqual(job.failed_backup_attempts[site.name], job.max_failed_backup_attempts_in_a_day + 1)
+		self.assertFalse(frappe.db.exists("Site Backup", {"site": site.name, "status": "Pending"}))
+		self.assertTrue(frappe.db.exists("Site Backup", {"site": healthy_site.name, "status": "Pending"}))
+
+	@patch.object(
+		ScheduledBackupJob,
+		"is_backup_hour",
+		new=lambda self, x: True,  # always backup hour
+	)
+	def test_capacity_aware_scheduling_limits_backups_per_server(self):
+		self._create_x_sites_on_1_bench(3)
+		frappe.db.set_single_value(
+			"Press Settings",
+			{"use_capacity_aware_backup_scheduling": True, "max_concurrent_backups_per_server": 2},
+		)
+
+		job = ScheduledBackupJob(backup_type="Logical")
+		sites = [site.name for site in job.sites]
+		self.assertEqual(len(sites), 3)
+		job.start()
+
+		self.assertEqual(frappe.db.count("Site Backup", {"site": ("in", sites), "status": "Pending"}), 2)
+
+		# backups scheduled above are still in flight
+		job = ScheduledBackupJob(backup_type="Logical")
+		job.start()
+		self.assertEqual(frappe.db.count("Site Backup", {"site": ("in", sites), "status": "Pending"}), 2)
+
+	def test_capacity_aware_scheduling_counts_physical_backups_on_database_server(self):
+		site = self._create_site_requiring_backup()
+		site.db_set("skip_scheduled_physical_backups", False)
+		database_server = frappe.db.get_value("Server", site.server, "database_server")
+		frappe.db.set_single_value(
+			"Press Settings",
+			{"use_capacity_aware_backup_scheduling": True, "max_concurrent_backups_per_server": 1},
+		)
+		frappe.get_doc(
+			{
+				"doctype": "Agent Job",
+				"job_type": "Physical Backup Database",
+				"status": "Running",
+				"server_type": "Database Server",
+				"server": database_server,
+				"request_path": "fake/physical-backup/path",
+			}
+		).insert()
+
+		job = ScheduledBackupJob(backup_type="Physical")
+		job.prefetch_server_loads()
+
+		site = next(candidate for candidate in job.sites if candidate.name == site.name)
+		self.assertEqual(job.get_backup_server(site), database_server)
+		self.assertFalse(job.has_capacity(site))
+
 	def test_sites_considered_for_backup(self):
 		"""Ensure sites with succesful or pending backups in past interval are skipped."""
 		sites = Site.get_sites_for_backup(self.interval)
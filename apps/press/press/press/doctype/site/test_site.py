@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 import json
+import time
 import typing
 from unittest.mock import Mock, patch
 
@@ -28,6 +29,7 @@ from press.press.doctype.remote_file.test_remote_file import (
 	create_test_remote_file,
 )
 from press.press.doctype.server.server import BaseServer, Server
+from press.press.doctype.site.dashboard import clear_reference_data
 from press.press.doctype.site.site import (
 	ARCHIVE_AFTER_SUSPEND_DAYS,
 	Site,
@@ -35,6 +37,14 @@ from press.press.doctype.site.site import (
 	process_rename_site_job_update,
 	suspend_sites_exceeding_disk_usage_for_last_14_days,
 )
+from press.press.doctype.site.site_usages import (
+	CPU_USAGE_COUNTERS_KEY,
+	CPU_USAGE_LOG_LAG,
+	CPU_USAGE_WATERMARK_KEY,
+	get_cpu_limits,
+	update_cpu_usage_server,
+	update_disk_usages,
+)
 from press.press.doctype.site_activity.test_site_activity import create_test_site_activity
 from press.press.doctype.site_plan.test_site_plan import create_test_plan
 from press.press.doctype.team.test_team import create_test_team
@@ -42,6 +52,8 @@ from press.press.doctype.telegram_message.telegram_message import TelegramMessag
 from press.saas.doctype.saas_settings.test_saas_settings import create_test_saas_settings
 from press.utils import get_current_team
 
+SITE_DASHBOARD_QUERY_BUDGET = 10
+
 if typing.TYPE_CHECKING:
 	from datetime import datetime
 
@@ -688,6 +700,49 @@ class TestSite(FrappeTestCase):
 		self.assertFalse(site.site_usage_exceeded)
 		self.assertIsNone(site.site_usage_exceeded_on)
 
+	@patch("press.press.doctype.site.site_usages.frappe.db.commit", new=Mock())
+	def test_update_disk_usages_flags_sites_exceeding_limits(self):
+		team = create_test_team()
+		plan = create_test_plan("Site", plan_name="USD 10", max_database_usage=1000, max_storage_usage=1000)
+		exceeding_site: Site = create_test_site(plan=plan.name, public_server=True, team=team.name)
+		exceeding_site.create_subscription(plan=plan.name)
+		normal_site: Site = create_test_site(plan=plan.name, public_server=True, team=team.name)
+		normal_site.create_subscription(plan=plan.name)
+
+		for site, database in ((exceeding_site, 1500), (normal_site, 500)):
+			frappe.get_doc(
+				doctype="Site Usage", site=site.name, database=database, public=0, private=0, backups=0
+			).insert()
+
+		update_disk_usages()
+		exceeding_site.reload()
+		normal_site.reload()
+
+		self.assertEqual(exceeding_site.current_database_usage, 150)
+		self.assertTrue(exceeding_site.site_usage_exceeded)
+		self.assertIsNotNone(exceeding_site.site_usage_exceeded_on)
+		self.assertEqual(normal_site.current_database_usage, 50)
+		self.assertFalse(normal_site.site_usage_exceeded)
+
+	@patch("press.press.doctype.site.site_usages.frappe.db.commit", new=Mock())
+	@patch("press.press.doctype.site.site_usages.get_cpu_usage_counters_for_sites_on_server")
+	def test_cpu_usage_counters_are_kept_between_runs(self, get_counters):
+		site: Site = create_test_site()
+		now = int(time.time() * 1000)
+		get_counters.return_value = {site.name: (now, get_cpu_limits(site.plan) // 2)}
+		self.addCleanup(frappe.cache.delete_value, f"{CPU_USAGE_COUNTERS_KEY}:{site.server}")
+		self.addCleanup(frappe.cache.delete_value, f"{CPU_USAGE_WATERMARK_KEY}:{site.server}")
+
+		update_cpu_usage_server(site.server)
+		self.assertEqual(frappe.db.get_value("Site", site.name, "current_cpu_usage"), 50)
+
+		# next run only reads logs after the watermark, stored counter is used for the site
+		get_counters.return_value = {}
+		frappe.db.set_value("Site", site.name, "current_cpu_usage", 0)
+		update_cpu_usage_server(site.server)
+		self.assertGreaterEqual(get_counters.call_args.args[1], now - CPU_USAGE_LOG_LAG)
+		self.assertEqual(frappe.db.get_value("Site", site.name, "current_cpu_usage"), 50)
+
 	@patch("frappe.sendmail", new=Mock())
 	def test_suspend_site_on_exceeding_site_usage_for_consecutive_14_days(self):
 		frappe.db.set_single_value("Press Settings", "enforce_storage_limits", 1)
@@ -721,3 +776,17 @@ class TestSite(FrappeTestCase):
 		suspend_sites_exceeding_disk_usage_for_last_14_days()
 		site.reload()
 		self.assertEqual(site.status, "Suspended")
+
+	@patch("press.api.analytics.get_current_cpu_usage", new=Mock(return_value=0))
+	def test_site_dashboard_payload_stays_within_query_budget(self):
+		site = create_test_site(plan=create_test_plan("Site").name)
+		clear_reference_data()
+		site.get_doc(frappe._dict(site.as_dict()))  # warm up shared reference data
+
+		with self.assertQueryCount(SITE_DASHBOARD_QUERY_BUDGET):
+			doc = site.get_doc(frappe._dict(site.as_dict()))
+
+		self.assertEqual(doc.current_plan.name, site.plan)
+		self.assertEqual(doc.group_title, frappe.db.get_value("Release Group", site.group, "title"))
+		self.assertEqual(doc.outbound_ip, frappe.db.get_value("Server", site.server, "ip"))
+		self.assertFalse(doc.has_scheduled_updates)
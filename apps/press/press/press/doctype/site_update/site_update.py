@@ -5,6 +5,7 @@ from __future__ import annotations
 
 import json
 import random
+from collections import defaultdict
 from datetime import datetime
 from typing import TYPE_CHECKING, ClassVar
 
@@ -26,6 +27,7 @@ from press.press.doctype.logical_replication_backup.logical_replication_backup i
 from press.press.doctype.physical_backup_restoration.physical_backup_restoration import (
 	get_physical_backup_restoration_steps,
 )
+from press.press.doctype.site_update.upgrade_graph import get_upgrade_graph
 from press.utils import log_error
 
 if TYPE_CHECKING:
@@ -859,7 +861,7 @@ def schedule_updates_server(server):
 	if pending_update_count > queue_size:
 		return
 
-	sites = sites_with_available_update(server)
+	sites = sites_to_try_update(server)
 	sites = list(filter(is_site_in_deploy_hours, sites))
 
 	# If a site can't be updated for some reason, then we shouldn't get stuck
@@ -873,14 +875,6 @@ def schedule_updates_server(server):
 			continue
 		if update_triggered_count > queue_size:
 			break
-		if not should_try_update(site) or frappe.db.exists(
-			"Site Update",
-			{
-				"site": site.name,
-				"status": ("in", ("Pending", "Running", "Failure", "Scheduled")),
-			},
-		):
-			continue
 
 		try:
 			site = frappe.get_doc("Site", site.name)
@@ -895,45 +889,64 @@ def schedule_updates_server(server):
 			frappe.db.rollback()
 
 
-def should_try_update(site):
-	source = frappe.db.get_value("Bench", site.bench, "candidate")
-	candidates = frappe.get_all(
-		"Deploy Candidate Difference", filters={"source": source}, pluck="destination"
-	)
-
-	source_apps = [app.app for app in frappe.get_cached_doc("Site", site.name).apps]
-	dest_apps = []
-	destinations = frappe.get_all(
-		"Bench",
-		["name", "candidate"],
-		{
-			"candidate": ("in", candidates),
-			"status": "Active",
-			"server": site.server,
-		},
-		limit=1,
-		ignore_ifnull=True,
-		order_by="creation DESC",
+def sites_to_try_update(server: str) -> list[frappe._dict]:
+	"""
+	Sites on the server with an update available in the upgrade graph, whose apps
+	are all on the destination bench and that have no ongoing or unresolved update
+	to it
+	"""
+	graph = get_upgrade_graph(server)
+	if not graph:
+		return []
+
+	Site = frappe.qb.DocType("Site")
+	Bench = frappe.qb.DocType("Bench")
+	sites = (
+		frappe.qb.from_(Site)
+		.join(Bench)
+		.on(Site.bench == Bench.name)
+		.select(Site.name, Site.timezone, Site.bench, Site.server, Site.status, Bench.candidate)
+		.where(Site.server == server)
+		.where(Site.status.isin(("Active", "Inactive", "Suspended")))
+		.where(Site.only_update_at_specified_time == 0)  # will be taken care of by another scheduled job
+		.where(Site.skip_auto_updates == 0)
+		.where(Bench.status.isin(("Active", "Broken")))
+		.where(Bench.candidate.isin(list(graph)))
+		.run(as_dict=True)
 	)
-	# Most recent active bench is the destination bench
-	if not destinations:
-		return False
+	if not sites:
+		return []
 
-	destination_bench = frappe.get_cached_doc("Bench", destinations[0].name)
-	dest_apps = [app.app for app in destination_bench.apps]
+	names = [site.name for site in sites]
+	site_apps = defaultdict(set)
+	for app in frappe.get_all("Site App", {"parenttype": "Site", "parent": ("in", names)}, ["parent", "app"]):
+		site_apps[app.parent].add(app.app)
 
-	if set(source_apps) - set(dest_apps):
-		return False
-
-	return not frappe.db.exists(
-		"Site Update",
-		{
-			"site": site.name,
-			"source_candidate": source,
-			"destination_candidate": destination_bench.candidate,
-			"cause_of_failure_is_resolved": False,
-		},
+	ongoing = set(
+		frappe.get_all(
+			"Site Update",
+			{"site": ("in", names), "status": ("in", ("Pending", "Running", "Failure", "Scheduled"))},
+			pluck="site",
+		)
 	)
+	unresolved = {
+		(update.site, update.source_candidate, update.destination_candidate)
+		for update in frappe.get_all(
+			"Site Update",
+			{"site": ("in", names), "cause_of_failure_is_resolved": False},
+			["site", "source_candidate", "destination_candidate"],
+		)
+	}
+
+	eligible = []
+	for site in sites:
+		destination = graph[site.candidate]
+		if site.name in ongoing or site_apps[site.name] - destination.apps:
+			continue
+		if (site.name, site.candidate, destination.candidate) in unresolved:
+			continue
+		eligible.append(site)
+	return eligible
 
 
 def is_site_in_deploy_hours(site):
@@ -21,7 +21,8 @@ from press.press.doctype.release_group.test_release_group import (
 )
 from press.press.doctype.site.test_site import create_test_bench, create_test_site
 from press.press.doctype.site_plan.test_site_plan import create_test_plan
-from press.press.doctype.site_update.site_update import SiteUpdate
+from press.press.doctype.site_update.site_update import SiteUpdate, sites_to_try_update
+from press.press.doctype.site_update.upgrade_graph import get_upgrade_graph, rebuild_upgrade_graph
 from press.press.doctype.subscription.test_subscription import create_test_subscription
 
 
@@ -108,6 +109,28 @@ class TestSiteUpdate(FrappeTestCase):
 			site.schedule_update,
 		)
 
+	def test_sites_to_try_update_uses_upgrade_graph(self):
+		app1 = create_test_app()  # frappe
+		app2 = create_test_app("app2", "App 2")
+
+		group = create_test_release_group([app1, app2])
+		bench1 = create_test_bench(group=group)
+		bench2 = create_test_bench(group=group, server=bench1.server)
+		create_test_deploy_candidate_differences(bench2.candidate)  # for site update to be available
+
+		site = create_test_site(bench=bench1.name)
+		rebuild_upgrade_graph()
+
+		graph = get_upgrade_graph(bench1.server)
+		self.assertEqual(graph[bench1.candidate].bench, bench2.name)
+		self.assertEqual(graph[bench1.candidate].apps, {app1.name, app2.name})
+		self.assertIn(site.name, [s.name for s in sites_to_try_update(bench1.server)])
+
+		bench2.apps.pop()
+		bench2.save()
+		rebuild_upgrade_graph()
+		self.assertNotIn(site.name, [s.name for s in sites_to_try_update(bench1.server)])
+
 	@patch("press.press.doctype.server.server.frappe.db.commit", new=MagicMock)
 	def test_site_update_callback_reallocates_workers_after_disable_maintenance_mode_job(
 		self,
@@ -0,0 +1,130 @@
+# Copyright (c) 2026, Frappe and contributors
+# For license information, please see license.txt
+"""
+Index of the benches sites can be auto updated to.
+
+For every server, maps a source deploy candidate to the most recent Active
+bench on that server whose candidate is a destination of the source in Deploy
+Candidate Difference, along with the apps installed on that bench. The index
+is kept in one Redis hash per server. Entries are refreshed from doc hooks
+after commit, and the whole index is rebuilt from the database every
+UPGRADE_GRAPH_TTL seconds to pick up changes made without hooks.
+"""
+
+from __future__ import annotations
+
+import pickle
+from collections import defaultdict
+from functools import partial
+
+import frappe
+
+UPGRADE_GRAPH_KEY = "bench_upgrade_graph"
+UPGRADE_GRAPH_BUILT_KEY = "bench_upgrade_graph_built"
+UPGRADE_GRAPH_TTL = 10 * 60
+
+
+def get_upgrade_graph(server: str) -> dict[str, frappe._dict]:
+	"""Returns {source candidate: {bench, candidate, apps}} for the server"""
+	if not frappe.cache.exists(UPGRADE_GRAPH_BUILT_KEY):
+		rebuild_upgrade_graph()
+	# hgetall returns field names as bytes
+	return {frappe.safe_decode(k): v for k, v in frappe.cache.hgetall(get_graph_key(server)).items()}
+
+
+def get_graph_key(server: str) -> str:
+	return f"{UPGRADE_GRAPH_KEY}:{server}"
+
+
+def fetch_upgrade_edges(
+	sources: list[str] | None = None, server: str | None = None
+) -> dict[tuple[str, str], frappe._dict]:
+	Bench = frappe.qb.DocType("Bench")
+	Difference = frappe.qb.DocType("Deploy Candidate Difference")
+	query = (
+		frappe.qb.from_(Difference)
+		.join(Bench)
+		.on(Bench.candidate == Difference.destination)
+		.select(Difference.source, Bench.server, Bench.name, Bench.candidate, Bench.creation)
+		.where(Bench.status == "Active")
+	)
+	if sources is not None:
+		query = query.where(Difference.source.isin(sources))
+	if server:
+		query = query.where(Bench.server == server)
+
+	# Most recent active bench is the destination bench
+	latest = {}
+	for bench in query.run(as_dict=True):
+		key = (bench.source, bench.server)
+		if key not in latest or bench.creation > latest[key].creation:
+			latest[key] = bench
+
+	apps = defaultdict(set)
+	if latest:
+		for app in frappe.get_all(
+			"Bench App",
+			{"parenttype": "Bench", "parent": ("in", list({bench.name for bench in latest.values()}))},
+			["parent", "app"],
+		):
+			apps[app.parent].add(app.app)
+
+	return {
+		key: frappe._dict(bench=bench.name, candidate=bench.candidate, apps=apps[bench.name])
+		for key, bench in latest.items()
+	}
+
+
+def rebuild_upgrade_graph():
+	graph = defaultdict(dict)
+	for (source, server), edge in fetch_upgrade_edges().items():
+		graph[server][source] = pickle.dumps(edge)
+
+	# Replace all server hashes in one transaction, so readers never see a partial index
+	pipe = frappe.cache.pipeline()
+	for key in frappe.cache.get_keys(f"{UPGRADE_GRAPH_KEY}:"):
+		pipe.delete(key)
+	for server, edges in graph.items():
+		pipe.hset(frappe.cache.make_key(get_graph_key(server)), mapping=edges)
+	pipe.execute()
+	frappe.cache.set_value(UPGRADE_GRAPH_BUILT_KEY, True, expires_in_sec=UPGRADE_GRAPH_TTL)
+
+
+def refresh_upgrade_graph(sources: list[str], server: str | None = None):
+	"""Recompute entries of the source candidates on a server (every server if not given) after commit"""
+	frappe.db.after_commit.add(partial(_refresh_upgrade_graph, sources, server))
+
+
+def _refresh_upgrade_graph(sources: list[str], server: str | None = None):
+	if not sources or not frappe.cache.exists(UPGRADE_GRAPH_BUILT_KEY):
+		# Index will be rebuilt on next read
+		return
+
+	edges = fetch_upgrade_edges(sources, server)
+	if server:
+		keys = [frappe.cache.make_key(get_graph_key(server))]
+	else:
+		keys = frappe.cache.get_keys(f"{UPGRADE_GRAPH_KEY}:")
+
+	pipe = frappe.cache.pipeline()
+	for key in keys:
+		pipe.hdel(key, *sources)
+	for (source, edge_server), edge in edges.items():
+		pipe.hset(frappe.cache.make_key(get_graph_key(edge_server)), source, pickle.dumps(edge))
+	pipe.execute()
+
+
+def refresh_bench(candidate: str, server: str):
+	"""Refresh the entries a bench can be the destination of"""
+	sources = frappe.get_all("Deploy Candidate Difference", {"destination": candidate}, pluck="source")
+	if sources:
+		refresh_upgrade_graph(sources, server)
+
+
+def on_bench_change(doc, method=None):
+	if doc.candidate and doc.server:
+		refresh_bench(doc.candidate, doc.server)
+
+
+def on_deploy_candidate_difference_change(doc, method=None):
+	refresh_upgrade_graph([doc.source])
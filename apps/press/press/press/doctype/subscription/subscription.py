@@ -8,12 +8,17 @@ from typing import TYPE_CHECKING
 import frappe
 import rq
 from frappe.model.document import Document
+from frappe.model.naming import make_autoname
 from frappe.query_builder.functions import Coalesce, Count
 from frappe.utils import cint, flt
 
 from press.overrides import get_permission_query_conditions_for_doctype
 from press.press.doctype.site_plan.site_plan import SitePlan
-from press.utils import log_error
+from press.press.doctype.usage_record.usage_record import (
+	add_usage_records_to_invoice,
+	group_by_billing_team,
+)
+from press.utils import chunk, log_error
 from press.utils.jobs import has_job_timeout_exceeded
 
 if TYPE_CHECKING:
@@ -142,12 +147,31 @@ class Subscription(Document):
 		return False
 
 	@frappe.whitelist()
-	def create_usage_record(self, date: DF.Date | None = None):  # noqa: C901
+	def create_usage_record(self, date: DF.Date | None = None):
+		values = self.get_usage_record_values(date)
+		if not values:
+			return None
+
+		usage_record = frappe.get_doc(doctype="Usage Record", **values)
+		usage_record.insert()
+		usage_record.submit()
+		return usage_record
+
+	def get_usage_record_values(  # noqa: C901
+		self,
+		date: DF.Date | None = None,
+		check_existing: bool = True,
+		invoiced_teams: set[str] | None = None,
+	) -> dict | None:
+		"""Returns field values of the usage record to charge for this subscription on date
+
+		Teams in invoiced_teams are known to have an upcoming invoice, teams found to have one are added to it.
+		"""
 		cannot_charge = not self.can_charge_for_subscription()
 		if cannot_charge:
 			return None
 
-		if self.is_usage_record_created(date):
+		if check_existing and self.is_usage_record_created(date):
 			return None
 
 		if not self.is_valid_subscription(date):
@@ -161,8 +185,11 @@ class Subscription(Document):
 		if team.billing_team and team.payment_mode == "Paid By Partner":
 			team = frappe.get_cached_doc("Team", team.billing_team)
 
-		if not team.get_upcoming_invoice():
-			team.create_upcoming_invoice()
+		if invoiced_teams is None or team.name not in invoiced_teams:
+			if not team.get_upcoming_invoice():
+				team.create_upcoming_invoice()
+			if invoiced_teams is not None:
+				invoiced_teams.add(team.name)
 
 		plan = frappe.get_cached_doc(self.plan_type, self.plan)
 
@@ -189,27 +216,24 @@ class Subscription(Document):
 			if not is_primary:
 				return None  # If the server is a secondary application server don't create a usage record
 
-		usage_record = frappe.get_doc(
-			doctype="Usage Record",
-			team=team.name,
-			document_type=self.document_type,
-			document_name=self.document_name,
-			plan_type=self.plan_type,
-			plan=plan.name,
-			amount=amount,
-			date=date,
-			subscription=self.name,
-			interval=self.interval,
-			site=(
+		return {
+			"team": team.name,
+			"currency": team.currency,
+			"document_type": self.document_type,
+			"document_name": self.document_name,
+			"plan_type": self.plan_type,
+			"plan": plan.name,
+			"amount": amount,
+			"date": date,
+			"subscription": self.name,
+			"interval": self.interval,
+			"site": (
 				self.site
 				or frappe.get_value("Marketplace App Subscription", self.marketplace_app_subscription, "site")
 			)
 			if self.document_type == "Marketplace App"
 			else None,
-		)
-		usage_record.insert()
-		usage_record.submit()
-		return usage_record
+		}
 
 	def can_charge_for_subscription(self):
 		doc = self.get_subscribed_document()
@@ -293,30 +317,21 @@ def create_usage_records_of_date(
 	Creates daily usage records for paid Subscriptions
 
 	If no date is provided, it defaults to today.
-	If usage_record_creation_batch_size is not provided, it will fetch from `Press Settings` or default to 500.
+	Subscriptions are charged in chunks of usage_record_creation_batch_size (from `Press Settings`,
+	defaulting to 500). Usage records of a chunk are inserted in bulk, committed and then added to invoices.
 	"""
-	free_sites = sites_with_free_hosting()
-	settings = frappe.get_single("Press Settings")
-	subscriptions = frappe.db.get_all(
-		"Subscription",
-		filters={
-			"enabled": True,
-			"plan": ("in", paid_plans()),
-			"name": ("not in", created_usage_records(free_sites, date=date)),
-			"document_name": ("not in", free_sites),
-		},
-		pluck="name",
-		order_by=None,
-		limit=usage_record_creation_batch_size or settings.usage_record_creation_batch_size or 500,
-		ignore_ifnull=True,
-		debug=True,
+	date = frappe.utils.getdate(date)
+	chunk_size = (
+		usage_record_creation_batch_size
+		or frappe.db.get_single_value("Press Settings", "usage_record_creation_batch_size")
+		or 500
 	)
-	for name in subscriptions:
+	for subscriptions in chunk(get_subscriptions_to_charge(date), chunk_size):
 		if has_job_timeout_exceeded():
+			# Remaining subscriptions are picked up in the next run
 			return
-		subscription = frappe.get_cached_doc("Subscription", name)
 		try:
-			subscription.create_usage_record(date=date)
+			usage_records = insert_usage_records(subscriptions, date)
 			frappe.db.commit()
 		except rq.timeouts.JobTimeoutException:
 			# This job took too long to execute
@@ -326,7 +341,122 @@ def create_usage_records_of_date(
 			return
 		except Exception:
 			frappe.db.rollback()
+			log_error(title="Create Usage Record Error", subscriptions=subscriptions)
+			continue
+
+		# Unlinked usage records are picked up by link_unlinked_usage_records
+		link_usage_records_to_invoices(usage_records)
+
+
+def get_subscriptions_to_charge(date) -> list[str]:
+	"""Enabled subscriptions on paid plans without a usage record for date, excluding sites with free hosting"""
+	Subscription = frappe.qb.DocType("Subscription")
+	plans = paid_plans()
+	if not plans:
+		return []
+
+	UsageRecord = frappe.qb.DocType("Usage Record")
+	Site = frappe.qb.DocType("Site")
+	Team = frappe.qb.DocType("Team")
+
+	free_sites = (
+		frappe.qb.from_(Site)
+		.left_join(Team)
+		.on(Team.name == Site.team)
+		.select(Site.name)
+		.where(Site.status.notin(("Archived", "Suspended")))
+		.where((Site.free == 1) | ((Team.free_account == 1) & (Team.enabled == 1)))
+	)
+
+	return (
+		frappe.qb.from_(Subscription)
+		.left_join(UsageRecord)
+		.on((UsageRecord.subscription == Subscription.name) & (UsageRecord.date == date))
+		.select(Subscription.name)
+		.where(Subscription.enabled == 1)
+		.where(Subscription.plan.isin(plans))
+		.where(Subscription.document_name.notin(free_sites))
+		.where(UsageRecord.name.isnull())
+		.run(pluck=True)
+	)
+
+
+def insert_usage_records(subscriptions: list[str], date) -> list[frappe._dict]:
+	"""Inserts submitted usage records of subscriptions for date in bulk
+
+	(subscription, date) is the idempotency key, subscriptions already charged for
+	date by the time of insert are skipped.
+	"""
+	charged = set(
+		frappe.get_all(
+			"Usage Record",
+			filters={"subscription": ("in", subscriptions), "date": date},
+			pluck="subscription",
+		)
+	)
+	# Subscription has no child tables, all of its fields come in one query
+	rows = frappe.get_all("Subscription", filters={"name": ("in", subscriptions)}, fields=["*"])
+	docs = {row.name: frappe.get_doc({"doctype": "Subscription", **row}) for row in rows}
+
+	usage_records = []
+	invoiced_teams = set()
+	for name in subscriptions:
+		if name in charged or name not in docs:
+			continue
+		subscription = docs[name]
+		try:
+			# Daily subscriptions are already filtered by date, others need the interval check
+			values = subscription.get_usage_record_values(
+				date, check_existing=subscription.interval != "Daily", invoiced_teams=invoiced_teams
+			)
+		except Exception:
 			log_error(title="Create Usage Record Error", name=name)
+			continue
+		if values:
+			usage_records.append(frappe._dict(values))
+
+	if not usage_records:
+		return []
+
+	series = frappe.get_meta("Usage Record").autoname
+	now = frappe.utils.now_datetime()
+	time = frappe.utils.nowtime()
+	for usage_record in usage_records:
+		usage_record.update(
+			name=make_autoname(series, "Usage Record"),
+			owner=frappe.session.user,
+			modified_by=frappe.session.user,
+			creation=now,
+			modified=now,
+			docstatus=1,
+			time=time,
+			invoice=None,
+			payout=None,
+		)
+
+	fields = list(usage_records[0].keys())
+	frappe.db.bulk_insert(
+		"Usage Record",
+		fields=fields,
+		values=[tuple(usage_record[field] for field in fields) for usage_record in usage_records],
+	)
+	return usage_records
+
+
+def link_usage_records_to_invoices(usage_records):
+	"""Link all usage records of a team to its invoice with a single lock and save"""
+	for team, records in group_by_billing_team(usage_records).items():
+		if has_job_timeout_exceeded():
+			return
+		try:
+			add_usage_records_to_invoice(team, records)
+			frappe.db.commit()
+		except rq.timeouts.JobTimeoutException:
+			frappe.db.rollback()
+			return
+		except Exception:
+			frappe.db.rollback()
+			log_error(title="Link Usage Records to Invoice Error", team=team)
 
 
 def paid_plans():
@@ -8,7 +8,11 @@ import frappe
 from frappe.tests.utils import FrappeTestCase
 
 from press.press.doctype.site.test_site import create_test_site
-from press.press.doctype.subscription.subscription import sites_with_free_hosting
+from press.press.doctype.subscription.subscription import (
+	create_usage_records_of_date,
+	get_subscriptions_to_charge,
+	sites_with_free_hosting,
+)
 from press.press.doctype.team.test_team import create_test_team
 
 
@@ -94,6 +98,56 @@ class TestSubscription(FrappeTestCase):
 		invoice = frappe.get_doc("Invoice", {"team": self.team.name, "status": "Draft"})
 		self.assertEqual(invoice.total, desired_value)
 
+	def test_create_usage_records_of_date_in_bulk(self):
+		plan = frappe.get_doc(
+			doctype="Site Plan",
+			name="Plan-10",
+			document_type="ToDo",
+			interval="Daily",
+			price_usd=30,
+			price_inr=30,
+		).insert()
+		subscriptions = []
+		for description in ("Test todo 1", "Test todo 2", "Test todo 3"):
+			todo = frappe.get_doc(doctype="ToDo", description=description).insert()
+			subscriptions.append(
+				frappe.get_doc(
+					doctype="Subscription",
+					team=self.team.name,
+					document_type="ToDo",
+					document_name=todo.name,
+					plan_type="Site Plan",
+					plan=plan.name,
+				).insert()
+			)
+
+		today = frappe.utils.getdate()
+		self.assertEqual(
+			set(get_subscriptions_to_charge(today)) & {s.name for s in subscriptions},
+			{s.name for s in subscriptions},
+		)
+
+		frappe.set_user("Administrator")
+		with patch.object(frappe.db, "commit"):
+			create_usage_records_of_date(today, usage_record_creation_batch_size=2)
+			# running again for the same date shouldn't create duplicates
+			create_usage_records_of_date(today, usage_record_creation_batch_size=2)
+
+		usage_records = frappe.get_all(
+			"Usage Record",
+			filters={"subscription": ("in", [s.name for s in subscriptions]), "date": today},
+			fields=["docstatus", "invoice"],
+		)
+		self.assertEqual(len(usage_records), 3)
+		self.assertTrue(all(record.docstatus == 1 and record.invoice for record in usage_records))
+
+		invoice = frappe.get_doc("Invoice", {"team": self.team.name, "status": "Draft"})
+		self.assertEqual(invoice.total, plan.get_price_per_day("INR") * 3)
+
+	def test_no_subscriptions_to_charge_without_paid_plans(self):
+		with patch("press.press.doctype.subscription.subscription.paid_plans", return_value=[]):
+			self.assertEqual(get_subscriptions_to_charge(frappe.utils.getdate()), [])
+
 	def test_subscription_for_non_chargeable_document(self):
 		todo = frappe.get_doc(doctype="ToDo", description="Test todo").insert()
 		plan = frappe.get_doc(
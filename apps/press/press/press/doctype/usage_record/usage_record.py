@@ -2,6 +2,8 @@
 # For license information, please see license.txt
 from __future__ import annotations
 
+from contextlib import contextmanager
+
 import frappe
 from frappe.model.document import Document
 
@@ -44,29 +46,16 @@ class UsageRecord(Document):
 		self.validate_duplicate_usage_record()
 
 	def on_submit(self):
+		if frappe.flags.defer_invoice_updates:
+			# Caller links the batch with update_usage_in_invoices
+			return
 		self.update_usage_in_invoice()
 
 	def on_cancel(self):
 		self.remove_usage_from_invoice()
 
 	def update_usage_in_invoice(self):
-		team = frappe.get_doc("Team", self.team)
-
-		if team.parent_team:
-			team = frappe.get_doc("Team", team.parent_team)
-
-		if team.billing_team:
-			team = frappe.get_doc("Team", team.billing_team)
-
-		if team.free_account:
-			return
-		# Get a read lock on this invoice
-		# We're going to update the invoice and we don't want any other process to update it
-		invoice = team.get_upcoming_invoice(for_update=True)
-		if not invoice:
-			invoice = team.create_upcoming_invoice()
-
-		invoice.add_usage_record(self)
+		update_usage_in_invoices([self])
 
 	def remove_usage_from_invoice(self):
 		team = frappe.get_doc("Team", self.team)
@@ -123,12 +112,74 @@ def link_unlinked_usage_records():
 		ignore_ifnull=True,
 	)
 
-	for usage_record in usage_records:
+	usage_records = [frappe.get_doc("Usage Record", name) for name in usage_records]
+	for team, records in group_by_billing_team(usage_records).items():
 		try:
-			frappe.get_doc("Usage Record", usage_record).update_usage_in_invoice()
+			add_usage_records_to_invoice(team, records)
+			frappe.db.commit()
 		except Exception:
+			frappe.db.rollback()
 			frappe.log_error("Failed to Link UR to Invoice")
 
 
+@contextmanager
+def defer_invoice_updates():
+	"""Skip linking usage records to invoices on submit
+
+	Usage records submitted inside this block must be passed to
+	update_usage_in_invoices so each invoice is locked and saved once per batch.
+	"""
+	previous = frappe.flags.defer_invoice_updates
+	frappe.flags.defer_invoice_updates = True
+	try:
+		yield
+	finally:
+		frappe.flags.defer_invoice_updates = previous
+
+
+def update_usage_in_invoices(usage_records: list[UsageRecord]):
+	for team, records in group_by_billing_team(usage_records).items():
+		add_usage_records_to_invoice(team, records)
+
+
+def add_usage_records_to_invoice(team: str, usage_records: list[UsageRecord]):
+	team = frappe.get_doc("Team", team)
+	# Get a read lock on this invoice
+	# We're going to update the invoice and we don't want any other process to update it
+	invoice = team.get_upcoming_invoice(for_update=True)
+	if not invoice:
+		invoice = team.create_upcoming_invoice()
+
+	invoice.add_usage_records(usage_records)
+
+
+def group_by_billing_team(usage_records: list[UsageRecord]) -> dict[str, list[UsageRecord]]:
+	"""Group usage records by the team that is billed for them, skipping free accounts"""
+	billing_teams = {}
+	grouped = {}
+	for usage_record in usage_records:
+		if usage_record.team not in billing_teams:
+			billing_teams[usage_record.team] = get_billing_team(usage_record.team)
+
+		team = billing_teams[usage_record.team]
+		if team.free_account:
+			continue
+		grouped.setdefault(team.name, []).append(usage_record)
+	return grouped
+
+
+def get_billing_team(team: str) -> frappe._dict:
+	fields = ["name", "parent_team", "billing_team", "free_account"]
+	team = frappe.db.get_value("Team", team, fields, as_dict=True)
+
+	if team.parent_team:
+		team = frappe.db.get_value("Team", team.parent_team, fields, as_dict=True)
+
+	if team.billing_team:
+		team = frappe.db.get_value("Team", team.billing_team, fields, as_dict=True)
+
+	return team
+
+
 def on_doctype_update():
 	frappe.db.add_index("Usage Record", ["subscription", "date"])
@@ -0,0 +1,51 @@
+# Copyright (c) 2026, Frappe and contributors
+# For license information, please see license.txt
+"""
+Single pass fingerprinting of SQL queries.
+
+A fingerprint identifies the shape of a query: comments are dropped, string
+and number literals become ?, lists of literals in IN (...) collapse to a
+single ? and runs of whitespace collapse to a single space. Case is kept as is,
+unquoted identifiers are case sensitive on some servers and sqlparse only upper
+cases keywords. Queries that only differ in those respects share a
+fingerprint.
+
+The fingerprint is only used as a key, normalize_query still formats each
+distinct shape with sqlparse once and serves the rest from an LRU cache.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+
+TOKEN_PATTERN = re.compile(
+	r"""
+	(?P<comment>(?:--|\#\s)[^\r\n]*|/\*(?!\+).*?\*/)
+	|(?P<string>'(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.|"")*")
+	|(?P<identifier>`(?:[^`]|``)*`)
+	|(?P<number>(?<![\w.$@])(?:0x[0-9a-f]+|\d+(?:\.\d*)?(?:e[-+]?\d+)?|\.\d+(?:e[-+]?\d+)?)(?![\w.]))
+	|(?P<space>\s+)
+	|(?P<other>[^'"`\s\-\#/\d.]+|.)
+	""",
+	re.VERBOSE | re.IGNORECASE | re.DOTALL,
+)
+IN_LIST_PATTERN = re.compile(r"\b(IN) \(\?(?: ?, ?\?)*\)", re.IGNORECASE)
+
+
+def fingerprint(query: str) -> str:
+	parts = []
+	for match in TOKEN_PATTERN.finditer(query):
+		kind = match.lastgroup
+		if kind == "comment" or kind == "space":
+			if parts and parts[-1] != " ":
+				parts.append(" ")
+		elif kind in ("string", "number"):
+			parts.append("?")
+		else:
+			parts.append(match.group())
+	return IN_LIST_PATTERN.sub(r"\1 (?)", "".join(parts).strip())
+
+
+def fingerprint_hash(query: str) -> str:
+	return hashlib.blake2b(fingerprint(query).encode(), digest_size=16).hexdigest()
@@ -4,7 +4,8 @@
 from __future__ import annotations
 
 import re
-from collections import defaultdict
+import threading
+from collections import OrderedDict, defaultdict
 
 import frappe
 import requests
@@ -13,6 +14,14 @@ from frappe.core.doctype.access_log.access_log import make_access_log
 from frappe.utils import convert_utc_to_timezone, get_system_timezone
 from frappe.utils.password import get_decrypted_password
 
+from press.press.report.mariadb_slow_queries.fingerprint import fingerprint_hash
+
+NORMALIZED_QUERY_CACHE_SIZE = 4096
+
+# Process wide, normalized query by fingerprint hash of the query
+_normalized_queries: OrderedDict[str, str] = OrderedDict()
+_normalized_queries_lock = threading.Lock()
+
 
 def execute(filters=None):
 	frappe.only_for(["System Manager", "Site Manager", "Press Admin", "Press Member"])
@@ -143,6 +152,22 @@ def get_slow_query_logs(database, start_datetime, end_datetime, search_pattern,
 
 
 def normalize_query(query: str) -> str:
+	"""Formats each distinct shape of query (see fingerprint) once, the rest are served from an LRU cache"""
+	key = fingerprint_hash(query)
+	with _normalized_queries_lock:
+		if key in _normalized_queries:
+			_normalized_queries.move_to_end(key)
+			return _normalized_queries[key]
+
+	normalized = _normalize_query(query)
+	with _normalized_queries_lock:
+		_normalized_queries[key] = normalized
+		if len(_normalized_queries) > NORMALIZED_QUERY_CACHE_SIZE:
+			_normalized_queries.popitem(last=False)
+	return normalized
+
+
+def _normalize_query(query: str) -> str:
 	q = sqlparse.parse(query)[0]
 	for token in q.flatten():
 		token_type = str(token.ttype)
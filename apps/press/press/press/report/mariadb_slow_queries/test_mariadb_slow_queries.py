@@ -0,0 +1,120 @@
+# Copyright (c) 2026, Frappe and Contributors
+# See license.txt
+
+import random
+import time
+
+from frappe.tests.utils import FrappeTestCase
+
+from press.press.report.mariadb_slow_queries import mariadb_slow_queries
+from press.press.report.mariadb_slow_queries.fingerprint import fingerprint
+from press.press.report.mariadb_slow_queries.mariadb_slow_queries import _normalize_query, normalize_query
+
+# Shapes of queries seen in slow query logs of Frappe sites, {} are filled with literals
+FRAPPE_QUERIES = [
+	"select `name`, `owner`, `creation`, `modified` from `tabSales Invoice` where `docstatus` = {n} and `customer` = {s} order by `modified` desc limit {n}",
+	"SELECT `tabSales Invoice`.`name` FROM `tabSales Invoice` WHERE `tabSales Invoice`.`name` IN ({list}) ORDER BY `tabSales Invoice`.`posting_date` DESC",
+	"select name from `tabFile` where attached_to_doctype = {s} and attached_to_name = {s} -- file list\n",
+	"/* frappe.desk.reportview.get */ SELECT count(*) AS total_count FROM `tabGL Entry` WHERE `tabGL Entry`.`is_cancelled` = {n} AND `tabGL Entry`.`posting_date` BETWEEN {s} AND {s}",
+	"select `tabStock Ledger Entry`.`item_code`, sum(`actual_qty`) as qty from `tabStock Ledger Entry` where `warehouse` in ({list}) and `posting_date` <= {s} group by `item_code`",
+	'UPDATE `tabSingles` SET `value` = {s} WHERE `doctype` = "System Settings" AND `field` = {s}',
+	"delete from `tabVersion` where `creation` < {s} limit {n}",
+	"INSERT INTO `tabError Log` (`name`, `creation`, `modified`, `method`, `error`) VALUES ({s}, {s}, {s}, {s}, {s})",
+	"select `parent`, `role` from `tabHas Role` where `parenttype` = 'User' and `parent` = {s}",
+	"SELECT `name`, `status` FROM `tabToDo` WHERE `allocated_to` = {s} AND `status` = 'Open' AND `date` > {s} ORDER BY `date` ASC, `priority` DESC LIMIT {n}, {n}",
+	"select distinct `tabItem`.`name` from `tabItem` left join `tabItem Default` on `tabItem Default`.`parent` = `tabItem`.`name` where `tabItem`.`disabled` = {n} and (`tabItem`.`item_group` like {s} or `tabItem`.`item_name` like {s})",
+	"select sum(`base_grand_total`) from `tabSales Order` where `docstatus` = {n} and `transaction_date` between {s} and {s} and `company` = {s} and `per_billed` < {f}",
+	"SELECT * FROM `tabDeleted Document` WHERE `restored` = {n}  AND  `deleted_doctype` = {s}\n\tORDER BY `creation` DESC",
+	"select `name` from `tabCommunication` where `reference_doctype` = {s} and `reference_name` = {s} and `communication_type` in ({list}) /* comments */",
+	"SELECT `tabAccess Log`.`name` FROM `tabAccess Log` WHERE `tabAccess Log`.`creation` < DATE_SUB(NOW(), INTERVAL {n} DAY) LIMIT {n}",
+]
+
+WORDS = [
+	"ACC-SINV-2026-00042",
+	"Administrator",
+	"Stores - WP",
+	"O'Brien & Sons",
+	'it\'s \\"quoted\\"',
+	"2026-10-16",
+]
+
+
+def generate_slow_log(rows: int, seed: int = 0) -> list[str]:
+	"""Queries of FRAPPE_QUERIES with random literals, like rows of a slow query log"""
+	rng = random.Random(seed)
+
+	def string():
+		return "'{}'".format(rng.choice(WORDS).replace("'", "''"))
+
+	queries = []
+	for _ in range(rows):
+		template = rng.choice(FRAPPE_QUERIES)
+		query = template
+		while "{" in query:
+			query = (
+				query.replace("{n}", str(rng.randint(0, 10_000)), 1)
+				.replace("{f}", str(rng.random() * 100), 1)
+				.replace("{s}", string(), 1)
+				.replace("{list}", ", ".join(string() for _ in range(rng.randint(1, 20))), 1)
+			)
+		queries.append(query)
+	return queries
+
+
+def benchmark_normalize_query(rows: int = 5000) -> dict:
+	"""
+	Compares normalize_query with plain sqlparse normalization over a generated slow log
+
+	bench --site <site> execute press.press.report.mariadb_slow_queries.test_mariadb_slow_queries.benchmark_normalize_query
+	"""
+	queries = generate_slow_log(rows)
+
+	start = time.perf_counter()
+	expected = [_normalize_query(query) for query in queries]
+	sqlparse_time = time.perf_counter() - start
+
+	mariadb_slow_queries._normalized_queries.clear()
+	start = time.perf_counter()
+	normalized = [normalize_query(query) for query in queries]
+	cached_time = time.perf_counter() - start
+
+	start = time.perf_counter()
+	fingerprints = {fingerprint(query) for query in queries}
+	fingerprint_time = time.perf_counter() - start
+
+	return {
+		"rows": rows,
+		"shapes": len(set(expected)),
+		"fingerprints": len(fingerprints),
+		"mismatches": sum(1 for a, b in zip(expected, normalized, strict=True) if a != b),
+		"sqlparse_seconds": round(sqlparse_time, 3),
+		"normalize_query_seconds": round(cached_time, 3),
+		"fingerprint_seconds": round(fingerprint_time, 3),
+		"speedup": round(sqlparse_time / cached_time, 1),
+	}
+
+
+class TestMariaDBSlowQueries(FrappeTestCase):
+	def setUp(self):
+		mariadb_slow_queries._normalized_queries.clear()
+
+	def test_normalize_query_matches_sqlparse_normalization(self):
+		for query in generate_slow_log(500):
+			self.assertEqual(normalize_query(query), _normalize_query(query), query)
+
+	def test_fingerprint_strips_literals_comments_and_in_lists(self):
+		self.assertEqual(
+			fingerprint("select name from `tabUser`  where name in ('a', 'b', 3) -- x\n and age > 10.5"),
+			"select name from `tabUser` where name in (?) and age > ?",
+		)
+		self.assertEqual(
+			fingerprint("select `tab1`.x1 from t /* c */ where y = 0x1f"),
+			fingerprint("select `tab1`.x1 from t where y = 'z'"),
+		)
+		self.assertNotEqual(fingerprint("select a from `tabUser`"), fingerprint("select a from `tabuser`"))
+
+	def test_queries_differing_in_identifier_case_are_not_merged(self):
+		queries = ["select name from tabUser where x=1", "select NAME from TABUSER where x=2"]
+		self.assertNotEqual(fingerprint(queries[0]), fingerprint(queries[1]))
+		for query in queries:
+			self.assertEqual(normalize_query(query), _normalize_query(query), query)
@@ -4,6 +4,8 @@
 from __future__ import annotations
 
 import json
+from collections import defaultdict
+from functools import cached_property
 from typing import Any
 
 import frappe
@@ -11,6 +13,15 @@ import frappe.utils
 from frappe.model.document import Document
 from frappe.utils.data import get_url
 
+from press.press.doctype.site.standby_pool import (
+	FORECAST_DAYS,
+	expected_signups,
+	get_hourly_profiles,
+	get_lead_time,
+	get_pool_size,
+	get_signup_history,
+	summarize_durations,
+)
 from press.utils import log_error
 from press.utils.jobs import has_job_timeout_exceeded
 from press.utils.unique_name_generator import generate as generate_random_name
@@ -39,6 +50,7 @@ class ProductTrial(Document):
 		enable_pooling: DF.Check
 		hybrid_pool_rules: DF.Table[HybridPoolItem]
 		logo: DF.AttachImage | None
+		pool_sizing: DF.Literal["Static", "Forecast"]
 		published: DF.Check
 		redirect_to_after_login: DF.Data
 		release_group: DF.Link
@@ -46,6 +58,7 @@ class ProductTrial(Document):
 		standby_queue_size: DF.Int
 		suspension_email_content: DF.HTMLEditor | None
 		suspension_email_subject: DF.Data | None
+		target_standby_hit_rate: DF.Percent
 		title: DF.Data
 		trial_days: DF.Int
 		trial_plan: DF.Link
@@ -321,14 +334,16 @@ class ProductTrial(Document):
 		if rule and rule.preferred_cluster and rule.preferred_cluster != cluster:
 			return
 
-		standby_pool_size = rule.custom_pool_size if rule else self.standby_pool_size
+		standby_pool_size = rule.custom_pool_size if rule else self.get_target_pool_size(cluster)
 		sites_to_create = standby_pool_size - self.get_standby_sites_count(
 			cluster, rule.app if rule else None
 		)
 		if sites_to_create <= 0:
 			return
-		if sites_to_create > self.standby_queue_size:
-			sites_to_create = self.standby_queue_size
+		# Sites being built run in parallel on the servers, at most standby_queue_size at a time
+		sites_to_create = min(
+			sites_to_create, self.standby_queue_size - self.get_standby_sites_in_flight(cluster)
+		)
 
 		for _i in range(sites_to_create):
 			self.create_standby_site(cluster, rule)
@@ -367,6 +382,91 @@ class ProductTrial(Document):
 		)
 		site.insert(ignore_permissions=True)
 
+	@cached_property
+	def signup_profiles(self) -> dict[str, list[float]]:
+		"""Expected signups in each hour of the day, by cluster"""
+		return get_hourly_profiles(
+			get_signup_history("Product Trial Request", {"product_trial": self.name}, "cluster")
+		)
+
+	@cached_property
+	def standby_lead_time(self) -> float:
+		"""Seconds a new site of this product takes to be ready"""
+		return get_lead_time(self.get_time_to_site(FORECAST_DAYS, is_standby_site=False))
+
+	def get_target_pool_size(self, cluster: str) -> int:
+		if self.pool_sizing != "Forecast":
+			return self.standby_pool_size
+
+		expected = expected_signups(
+			self.signup_profiles[cluster], frappe.utils.now_datetime(), self.standby_lead_time
+		)
+		return get_pool_size(expected, self.target_standby_hit_rate / 100, self.standby_pool_size)
+
+	def get_time_to_site(self, days: int, is_standby_site: bool | None = None) -> list[float]:
+		"""Seconds from signup to site of trial requests of the last days"""
+		filters = {
+			"product_trial": self.name,
+			"creation": (">=", frappe.utils.add_days(None, -days)),
+			"site_creation_started_on": ("is", "set"),
+			"site_creation_completed_on": ("is", "set"),
+		}
+		if is_standby_site is not None:
+			filters["is_standby_site"] = is_standby_site
+		return [
+			(request.site_creation_completed_on - request.site_creation_started_on).total_seconds()
+			for request in frappe.get_all(
+				"Product Trial Request", filters, ["site_creation_started_on", "site_creation_completed_on"]
+			)
+		]
+
+	@frappe.whitelist()
+	def get_standby_pool_metrics(self, days: int = 7):
+		"""Share of trial requests served from standby and time to site in each cluster over the last days"""
+		days = int(days)
+		requests = frappe.get_all(
+			"Product Trial Request",
+			{"product_trial": self.name, "creation": (">=", frappe.utils.add_days(None, -days))},
+			["cluster", "is_standby_site", "site_creation_started_on", "site_creation_completed_on"],
+		)
+		requests_by_cluster = defaultdict(list)
+		for request in requests:
+			requests_by_cluster[request.cluster].append(request)
+
+		metrics = {}
+		for cluster in sorted(set(self.get_available_clusters()) | set(filter(None, requests_by_cluster))):
+			cluster_requests = requests_by_cluster.get(cluster, [])
+			served = sum(1 for request in cluster_requests if request.is_standby_site)
+			durations = {True: [], False: []}
+			for request in cluster_requests:
+				if request.site_creation_started_on and request.site_creation_completed_on:
+					durations[bool(request.is_standby_site)].append(
+						(
+							request.site_creation_completed_on - request.site_creation_started_on
+						).total_seconds()
+					)
+			metrics[cluster] = {
+				"requests": len(cluster_requests),
+				"served_from_standby": served,
+				"hit_rate": round(served / len(cluster_requests), 4) if cluster_requests else None,
+				"time_to_site_from_standby": summarize_durations(durations[True]),
+				"time_to_new_site": summarize_durations(durations[False]),
+				"pool_size": self.get_standby_sites_count(cluster),
+				"target_pool_size": self.get_target_pool_size(cluster),
+			}
+		return metrics
+
+	def get_standby_sites_in_flight(self, cluster: str) -> int:
+		return frappe.db.count(
+			"Site",
+			{
+				"cluster": cluster,
+				"is_standby": 1,
+				"standby_for_product": self.name,
+				"status": ("in", ["Pending", "Installing"]),
+			},
+		)
+
 	def get_standby_sites_count(self, cluster: str, hybrid_for: str | None = None):
 		one_hour_ago = frappe.utils.add_to_date(None, hours=-1)
 		Site = frappe.qb.DocType("Site")
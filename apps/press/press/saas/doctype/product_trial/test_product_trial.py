@@ -14,6 +14,7 @@ from press.press.doctype.release_group.test_release_group import (
 	create_test_release_group,
 )
 from press.press.doctype.root_domain.test_root_domain import create_test_root_domain
+from press.press.doctype.site.standby_pool import served_from_standby_rate
 from press.press.doctype.site_plan.test_site_plan import create_test_plan
 
 
@@ -49,4 +50,24 @@ def create_test_product_trial(
 
 
 class TestProductTrial(FrappeTestCase):
-	pass
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def test_forecast_pool_size_follows_expected_signups(self):
+		product_trial = create_test_product_trial(create_test_app("erpnext", "ERPNext"))
+		product_trial.pool_sizing = "Forecast"
+		product_trial.target_standby_hit_rate = 95
+		product_trial.standby_pool_size = 10
+		product_trial.standby_lead_time = 60 * 60
+
+		product_trial.signup_profiles = {"Quiet": [0.0] * 24, "Busy": [3.0] * 24, "Flooded": [100.0] * 24}
+		self.assertEqual(product_trial.get_target_pool_size("Quiet"), 0)
+		busy = product_trial.get_target_pool_size("Busy")
+		self.assertGreater(busy, 3)
+		self.assertLess(busy, 10)
+		self.assertGreaterEqual(served_from_standby_rate(busy, 3.0), 0.95)
+		self.assertLess(served_from_standby_rate(busy - 1, 3.0), 0.95)
+		self.assertEqual(product_trial.get_target_pool_size("Flooded"), 10)
+
+		product_trial.pool_sizing = "Static"
+		self.assertEqual(product_trial.get_target_pool_size("Quiet"), 10)
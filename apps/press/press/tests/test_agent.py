@@ -6,7 +6,7 @@ import requests
 import responses
 from frappe.tests.utils import FrappeTestCase
 
-from press.agent import Agent, AgentRequestSkippedException
+from press.agent import Agent, AgentRequestSkippedException, close_agent_sessions, get_agent_session_stats
 from press.press.doctype.agent_request_failure.agent_request_failure import (
 	remove_old_failures,
 )
@@ -27,6 +27,7 @@ def create_test_agent_request_failure(server, traceback="Traceback", error="Erro
 
 class TestAgent(FrappeTestCase):
 	def tearDown(self):
+		close_agent_sessions()
 		frappe.db.rollback()
 
 	@responses.activate
@@ -122,3 +123,50 @@ class TestAgent(FrappeTestCase):
 
 		responses.assert_call_count(f"https://{server.name}:443/agent/ping", 1)
 		self.assertEqual(frappe.db.count("Agent Request Failure", {"server": server.name}), 0)
+
+	@responses.activate
+	def test_session_is_reused_across_agents_for_same_server(self):
+		server = create_test_server()
+		close_agent_sessions()
+
+		responses.add(
+			responses.GET,
+			f"https://{server.name}:443/agent/ping",
+			status=200,
+			json={"message": "pong"},
+		)
+
+		Agent(server.name, server.doctype).request("GET", "ping")
+		Agent(server.name, server.doctype).request("GET", "ping")
+
+		stats = get_agent_session_stats()
+		self.assertEqual(stats["sessions"], 1)
+		self.assertEqual(stats["misses"], 1)
+		self.assertGreaterEqual(stats["hits"], 1)
+
+	@responses.activate
+	def test_cached_credentials_are_invalidated_on_server_update(self):
+		server = create_test_server()
+		agent = Agent(server.name, server.doctype)
+
+		responses.add(
+			responses.GET,
+			f"https://{server.name}:443/agent/ping",
+			status=200,
+			json={"message": "pong"},
+		)
+
+		agent.request("GET", "ping")
+		self.assertEqual(
+			responses.calls[-1].request.headers["Authorization"],
+			f"bearer {server.get_password('agent_password')}",
+		)
+
+		server.agent_password = frappe.generate_hash(length=32)
+		server.save()
+
+		agent.request("GET", "ping")
+		self.assertEqual(
+			responses.calls[-1].request.headers["Authorization"],
+			f"bearer {server.agent_password}",
+		)
@@ -0,0 +1,61 @@
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from press.utils.log_sink import LogSink, query
+
+
+class TestLogSink(FrappeTestCase):
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.sink = LogSink("test-log-sink", "test.json.log", max_entries=50, directory=self.directory)
+
+	def tearDown(self):
+		frappe.cache.delete_value(self.sink.key)
+		shutil.rmtree(self.directory)
+
+	def push_events(self, count: int):
+		for i in range(count):
+			self.sink.push(
+				{"job_type": "New Site" if i % 2 else "Backup Site", "server": f"f{i % 3}", "duration": i}
+			)
+
+	def test_drain_is_bounded_and_keeps_order(self):
+		self.push_events(60)
+		self.assertEqual(self.sink.drain(batch_size=10, max_batches=2), 20)
+		self.assertEqual(self.sink.drain(batch_size=10), 30)
+		self.assertEqual([event["duration"] for event in self.sink.read()], list(range(10, 60)))
+
+	def test_rotated_logs_are_compressed_and_queried(self):
+		self.push_events(10)
+		self.sink.drain()
+		os.utime(self.sink.path, (0, 0))  # last written long ago
+		self.push_events(10)
+		self.sink.drain()
+
+		rotated = self.sink.get_rotated_files()
+		self.assertEqual(len(rotated), 1)
+		self.assertTrue(rotated[0].endswith(".gz"))
+
+		events = list(query(self.sink, job_type="New Site", server="f1", min_duration=5))
+		self.assertEqual([event["duration"] for event in events], [7, 7])
+		self.assertEqual(len(list(query(self.sink, limit=3))), 3)
+
+	def test_failed_write_keeps_events_in_redis(self):
+		self.push_events(10)
+		with (
+			patch("press.utils.log_sink.open", create=True, side_effect=OSError("No space left on device")),
+			self.assertRaises(OSError),
+		):
+			self.sink.drain(batch_size=4)
+
+		self.assertEqual(self.sink.drain(), 10)
+		self.assertEqual([event["duration"] for event in self.sink.read()], list(range(10)))
+
+	def test_rotating_missing_file_is_a_noop(self):
+		self.sink.rotate()
+		self.assertEqual(self.sink.get_rotated_files(), [])
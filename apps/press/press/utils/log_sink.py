@@ -0,0 +1,202 @@
+"""
+Structured event logs buffered in Redis and written to rotated JSON line files.
+
+Producers push events to a Redis list, capped at max_entries. A scheduled
+drain moves at most DRAIN_BATCH_SIZE * MAX_DRAIN_BATCHES events per run into
+<bench>/logs/<file_name>, taking each batch off the list atomically and
+putting it back at the head when it cannot be written. The file is rotated
+daily and whenever it grows past MAX_FILE_SIZE; rotated files are gzipped next
+to it and removed after RETENTION_DAYS.
+
+Logs are read back line by line, from the oldest rotated file to the current
+one, so filtering never loads a whole file.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import gzip
+import json
+import os
+import shutil
+import time
+import traceback
+import typing
+from datetime import date, datetime
+
+import frappe
+
+if typing.TYPE_CHECKING:
+	from collections.abc import Iterator
+
+DRAIN_BATCH_SIZE = 5000
+MAX_DRAIN_BATCHES = 20
+MAX_FILE_SIZE = 256 * 1024 * 1024  # bytes
+RETENTION_DAYS = 30
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class LogSink:
+	def __init__(
+		self, key: str, file_name: str, max_entries: int | None = None, directory: str | None = None
+	):
+		self.key = key
+		self.file_name = file_name
+		self.max_entries = max_entries
+		self._directory = directory
+
+	@property
+	def directory(self) -> str:
+		return self._directory or os.path.join(frappe.utils.get_bench_path(), "logs")
+
+	@property
+	def path(self) -> str:
+		return os.path.join(self.directory, self.file_name)
+
+	def push(self, data: dict):
+		serialized = json.dumps(data, sort_keys=True, default=str, separators=(",", ":"))
+		key = frappe.cache.make_key(self.key)
+		pipeline = frappe.cache.pipeline(transaction=False)
+		pipeline.rpush(key, serialized)
+		if self.max_entries:
+			# Drop the oldest events when nothing drains the list
+			pipeline.ltrim(key, -self.max_entries, -1)
+		pipeline.execute()
+
+	def pop(self, count: int) -> list[str]:
+		"""Takes the oldest count events off the list"""
+		key = frappe.cache.make_key(self.key)
+		pipeline = frappe.cache.pipeline()
+		pipeline.lrange(key, 0, count - 1)
+		pipeline.ltrim(key, count, -1)
+		events, _ = pipeline.execute()
+		return [frappe.safe_decode(event) for event in events]
+
+	def unpop(self, events: list[str]):
+		"""Puts events taken off the list back at its head, in their original order"""
+		key = frappe.cache.make_key(self.key)
+		pipeline = frappe.cache.pipeline(transaction=False)
+		pipeline.lpush(key, *reversed(events))
+		pipeline.execute()
+
+	def drain(self, batch_size: int = DRAIN_BATCH_SIZE, max_batches: int = MAX_DRAIN_BATCHES) -> int:
+		"""Writes buffered events to the log file, returns number of events written"""
+		written = 0
+		for _ in range(max_batches):
+			events = self.pop(batch_size)
+			if not events:
+				break
+			try:
+				if self.should_rotate():
+					self.rotate()
+				with open(self.path, "a") as file:
+					file.write("\n".join(events))
+					file.write("\n")
+			except Exception:
+				self.unpop(events)
+				raise
+			written += len(events)
+			if len(events) < batch_size:
+				break
+		return written
+
+	def should_rotate(self) -> bool:
+		try:
+			stat = os.stat(self.path)
+		except FileNotFoundError:
+			return False
+		return stat.st_size >= MAX_FILE_SIZE or date.fromtimestamp(stat.st_mtime) < date.today()
+
+	def rotate(self):
+		"""Compresses the current log file into a timestamped gzip file next to it"""
+		rotated = f"{self.path}.{datetime.now().strftime('%Y%m%d%H%M%S')}"
+		try:
+			os.rename(self.path, rotated)
+		except FileNotFoundError:
+			# An overlapping drain rotated it first
+			return
+		with open(rotated, "rb") as source, gzip.open(f"{rotated}.gz", "wb") as destination:
+			shutil.copyfileobj(source, destination, COPY_BUFFER_SIZE)
+		os.remove(rotated)
+		self.remove_expired()
+
+	def get_rotated_files(self) -> list[str]:
+		prefix = f"{self.file_name}."
+		files = [
+			file for file in os.listdir(self.directory) if file.startswith(prefix) and file.endswith(".gz")
+		]
+		# Timestamps sort lexicographically
+		return [os.path.join(self.directory, file) for file in sorted(files)]
+
+	def remove_expired(self):
+		expired = time.time() - RETENTION_DAYS * 24 * 60 * 60
+		for path in self.get_rotated_files():
+			if os.stat(path).st_mtime < expired:
+				with contextlib.suppress(FileNotFoundError):
+					os.remove(path)
+
+	def read(self, contains: list[str] | None = None) -> Iterator[dict]:
+		"""Yields events oldest first, skipping lines that don't contain every string of contains unparsed"""
+		files = self.get_rotated_files()
+		if os.path.exists(self.path):
+			files.append(self.path)
+
+		for path in files:
+			opener = gzip.open if path.endswith(".gz") else open
+			with opener(path, "rt") as file:
+				for line in file:
+					if contains and not all(text in line for text in contains):
+						continue
+					with contextlib.suppress(ValueError):
+						yield json.loads(line)
+
+	def flush(self):
+		try:
+			self.drain()
+		except Exception:
+			traceback.print_exc()
+
+
+def get_field(event: dict, field: str):
+	"""Returns field of the event, or of the job logged in it"""
+	if field in event:
+		return event[field]
+	if isinstance(event.get("job"), dict):
+		return event["job"].get(field)
+	return None
+
+
+def query(
+	sink: LogSink,
+	job_type: str | None = None,
+	server: str | None = None,
+	min_duration: float | None = None,
+	limit: int | None = None,
+) -> Iterator[dict]:
+	"""Yields events of sink matching every given filter"""
+	filters = {"job_type": job_type, "server": server}
+	filters = {field: value for field, value in filters.items() if value}
+	contains = [json.dumps(value) for value in filters.values()]
+
+	matched = 0
+	for event in sink.read(contains):
+		if any(get_field(event, field) != value for field, value in filters.items()):
+			continue
+		if min_duration is not None and (get_duration(event) or 0) < min_duration:
+			continue
+		yield event
+		matched += 1
+		if limit and matched >= limit:
+			return
+
+
+def get_duration(event: dict) -> float | None:
+	duration = get_field(event, "duration")
+	if isinstance(duration, int | float):
+		return duration
+	if isinstance(duration, str) and duration:
+		# Agent Job durations are stored as H:MM:SS.ffffff
+		with contextlib.suppress(ValueError):
+			hours, minutes, seconds = duration.split(":")
+			return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+	return None